@@ -1,23 +1,151 @@
+import time
+import mmap
 import base64
-import requests
+import binascii
 from io import BytesIO
-from PIL import Image
-from typing import Dict, Tuple, Optional
+from typing import Callable, Dict, Tuple, Optional
 import logging
 
-logging.basicConfig(level=logging.INFO)
+from tracing import tracer
+from buffers import copy_stats
+from endpoint_pool import CONNECT_TIMEOUT, Endpoint, EndpointPool
+from http_transport import TransportError, send
+from json_codec import encode_body, extract_string, loads
+
+# PIL is imported where used, so that importing this module (and the
+# processing engine) does not slow down application startup
+
 logger = logging.getLogger(__name__)
 
 
-class DoubaoClient:
+# HTTP statuses that indicate a problem with the endpoint or key, not the request
+FAULT_STATUS_CODES = {401, 403, 408, 429}
+
+
+def is_endpoint_fault(error: TransportError) -> bool:
+    """Whether a failed request should be retried on another endpoint."""
+    if error.timed_out or error.connection_failed:
+        return True
+    if error.status_code is None:
+        return False
+    return error.status_code in FAULT_STATUS_CODES or error.status_code >= 500
+
+
+class PooledApiClient:
+    """
+    Sends requests through an EndpointPool, failing over between endpoints.
+    
+    Subclasses build the JSON fields sent with the image for a given endpoint.
+    """
+    
+    SERVICE_NAME = 'API'
+    
+    def __init__(self, pool: EndpointPool):
+        self.pool = pool
+    
+    def _post(self, image_base64: bytes, build_fields: Callable[[Endpoint], Dict], timeout: Optional[float] = None,
+              megapixels: float = 1.0, deadline: Optional[float] = None) -> Tuple[bool, Optional[str], Optional[bytes]]:
+        """
+        POST an image and decode the returned image.
+        
+        Each endpoint is tried at most once; endpoint faults move on to the
+        next best endpoint, other errors fail the request right away.
+        
+        Args:
+            image_base64: Base64 encoded image, sent as the 'image' field
+            build_fields: Creates the other JSON fields for an endpoint
+            timeout: Fixed read timeout in seconds, or None to adapt it to the
+                endpoint's observed latency and the request's megapixels
+            megapixels: Size of the image sent
+            deadline: time.monotonic() by which the task has to be done
+        """
+        tried = set()
+        error_msg = f'No {self.SERVICE_NAME} endpoint configured'
+        while True:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                return False, f'{self.SERVICE_NAME} task deadline exceeded ({error_msg})', None
+            try:
+                endpoint = self.pool.acquire(exclude=tried, deadline=deadline)
+            except TimeoutError as e:
+                return False, f'{self.SERVICE_NAME} task deadline exceeded ({str(e)})', None
+            if endpoint is None:
+                return False, error_msg, None
+            tried.add(endpoint)
+            if deadline is not None:
+                # Waiting for quota used part of it
+                remaining = deadline - time.monotonic()
+            
+            headers = {
+                'Authorization': f'Bearer {endpoint.api_key}',
+                'Content-Type': 'application/json'
+            }
+            
+            read_timeout, basis = self.pool.read_timeout(endpoint, megapixels)
+            if timeout is not None:
+                read_timeout, basis = timeout, 'fixed'
+            if remaining is not None and remaining < read_timeout:
+                read_timeout, basis = remaining, 'task deadline'
+            connect_timeout = min(CONNECT_TIMEOUT, read_timeout)
+            
+            body = encode_body(image_base64, build_fields(endpoint))
+            
+            logger.info(f"Sending request to {self.SERVICE_NAME}: {endpoint.url} "
+                        f"({megapixels:.1f} MP, timeout {connect_timeout:.0f}s connect / {read_timeout:.1f}s read, {basis})")
+            started = time.perf_counter()
+            try:
+                with tracer.span('http', url=endpoint.url):
+                    content = send(endpoint, body, headers, connect_timeout, read_timeout)
+            except TransportError as e:
+                fault = is_endpoint_fault(e)
+                self.pool.release(endpoint, False, time.perf_counter() - started, fault, megapixels, e.timed_out)
+                if e.timed_out and e.connection_failed:
+                    error_msg = f'{self.SERVICE_NAME} connect timeout after {connect_timeout:.0f}s'
+                elif e.timed_out:
+                    error_msg = f'{self.SERVICE_NAME} request timeout after {read_timeout:.1f}s ({basis})'
+                else:
+                    error_msg = f'{self.SERVICE_NAME} request failed: {str(e)}'
+                logger.error(error_msg)
+                if fault:
+                    continue
+                return False, error_msg, None
+            
+            elapsed = time.perf_counter() - started
+            self.pool.release(endpoint, True, elapsed, megapixels=megapixels)
+            logger.info(f"{self.SERVICE_NAME} answered in {elapsed:.1f}s, {elapsed / read_timeout:.0%} of its timeout")
+            
+            try:
+                with tracer.span('decode'):
+                    result_base64 = extract_string(content, 'image')
+                    if result_base64 is None:
+                        # Unusual layout (escaped characters) or an error body
+                        result = loads(content)
+                        if 'image' not in result:
+                            return False, 'API response missing image data', None
+                        result_base64 = result['image']
+                    image_bytes = binascii.a2b_base64(result_base64)
+                    return True, None, image_bytes
+            except Exception as e:
+                error_msg = f'{self.SERVICE_NAME} processing error: {str(e)}'
+                logger.error(error_msg)
+                return False, error_msg, None
+
+
+class DoubaoClient(PooledApiClient):
     """Client for Doubao (豆包) image editing API."""
     
-    def __init__(self, api_url: str, api_key: str):
+    SERVICE_NAME = 'Doubao API'
+    
+    def __init__(self, api_url: str = '', api_key: str = '', pool: Optional[EndpointPool] = None):
         self.api_url = api_url
         self.api_key = api_key
+        super().__init__(pool or EndpointPool.from_config(
+            {'doubao_api_url': api_url, 'doubao_api_key': api_key}, 'doubao'
+        ))
     
-    def edit_image(self, image_base64: str, edit_type: str, 
-                   smooth: float, whiten: float, timeout: int = 60) -> Tuple[bool, Optional[str], Optional[bytes]]:
+    def edit_image(self, image_base64: bytes, edit_type: str, 
+                   smooth: float, whiten: float, timeout: Optional[float] = None,
+                   megapixels: float = 1.0, deadline: Optional[float] = None) -> Tuple[bool, Optional[str], Optional[bytes]]:
         """
         Edit image using Doubao API.
         
@@ -26,119 +154,89 @@ class DoubaoClient:
             edit_type: 'retouch' or 'enhance'
             smooth: Smoothing strength (0-1)
             whiten: Whitening strength (0-1)
-            timeout: Request timeout in seconds
+            timeout: Fixed read timeout in seconds (default: adaptive)
+            megapixels: Size of the image, for the adaptive timeout
+            deadline: time.monotonic() by which the task has to be done
             
         Returns:
             Tuple of (success, error_message, image_bytes)
         """
-        try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            payload = {
-                'image': image_base64,
-                'edit_type': edit_type,
-                'smooth': smooth,
-                'whiten': whiten
-            }
-            
-            logger.info(f"Sending request to Doubao API: {self.api_url}")
-            response = requests.post(self.api_url, json=payload, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'image' in result:
-                result_base64 = result['image']
-                image_bytes = base64.b64decode(result_base64)
-                return True, None, image_bytes
-            else:
-                return False, 'API response missing image data', None
-                
-        except requests.exceptions.Timeout:
-            error_msg = f'Doubao API request timeout after {timeout}s'
-            logger.error(error_msg)
-            return False, error_msg, None
-        except requests.exceptions.RequestException as e:
-            error_msg = f'Doubao API request failed: {str(e)}'
-            logger.error(error_msg)
-            return False, error_msg, None
-        except Exception as e:
-            error_msg = f'Doubao processing error: {str(e)}'
-            logger.error(error_msg)
-            return False, error_msg, None
+        fields = {
+            'edit_type': edit_type,
+            'smooth': smooth,
+            'whiten': whiten
+        }
+        return self._post(image_base64, lambda endpoint: fields, timeout, megapixels, deadline)
 
 
-class BananaClient:
+class BananaClient(PooledApiClient):
     """Client for Banana style transfer API."""
     
-    def __init__(self, api_url: str, api_key: str, model_key: str):
+    SERVICE_NAME = 'Banana API'
+    
+    def __init__(self, api_url: str = '', api_key: str = '', model_key: str = '',
+                 pool: Optional[EndpointPool] = None):
         self.api_url = api_url
         self.api_key = api_key
         self.model_key = model_key
+        super().__init__(pool or EndpointPool.from_config(
+            {'banana_api_url': api_url, 'banana_api_key': api_key, 'banana_model_key': model_key}, 'banana'
+        ))
     
-    def apply_style(self, image_base64: str, prompt: str, timeout: int = 60) -> Tuple[bool, Optional[str], Optional[bytes]]:
+    def apply_style(self, image_base64: bytes, prompt: str, timeout: Optional[float] = None,
+                    megapixels: float = 1.0, deadline: Optional[float] = None) -> Tuple[bool, Optional[str], Optional[bytes]]:
         """
         Apply style to image using Banana API.
         
         Args:
             image_base64: Base64 encoded image
             prompt: Style description prompt
-            timeout: Request timeout in seconds
+            timeout: Fixed read timeout in seconds (default: adaptive)
+            megapixels: Size of the image, for the adaptive timeout
+            deadline: time.monotonic() by which the task has to be done
             
         Returns:
             Tuple of (success, error_message, image_bytes)
         """
-        try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            payload = {
-                'image': image_base64,
-                'model_key': self.model_key,
-                'prompt': prompt
-            }
-            
-            logger.info(f"Sending request to Banana API: {self.api_url}")
-            response = requests.post(self.api_url, json=payload, headers=headers, timeout=timeout)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if 'image' in result:
-                result_base64 = result['image']
-                image_bytes = base64.b64decode(result_base64)
-                return True, None, image_bytes
-            else:
-                return False, 'API response missing image data', None
-                
-        except requests.exceptions.Timeout:
-            error_msg = f'Banana API request timeout after {timeout}s'
-            logger.error(error_msg)
-            return False, error_msg, None
-        except requests.exceptions.RequestException as e:
-            error_msg = f'Banana API request failed: {str(e)}'
-            logger.error(error_msg)
-            return False, error_msg, None
-        except Exception as e:
-            error_msg = f'Banana processing error: {str(e)}'
-            logger.error(error_msg)
-            return False, error_msg, None
+        return self._post(image_base64, lambda endpoint: {
+            'model_key': endpoint.model_key,
+            'prompt': prompt
+        }, timeout, megapixels, deadline)
 
 
-def image_to_base64(image_path: str) -> str:
-    """Convert image file to base64 string (PNG format)."""
+def image_to_base64(image_path: str, image_info=None, max_dimension: int = 0) -> bytes:
+    """
+    Convert image file to base64 (PNG format), as ASCII bytes.
+    
+    When image_info (probed at import) says the file already is a PNG,
+    its bytes are sent as-is instead of being decoded and re-encoded; they
+    are encoded straight from a memory map of the file. With max_dimension
+    set, larger images are downscaled to fit it.
+    """
+    from PIL import Image
+    
     try:
+        fits = not max_dimension or (image_info is not None and
+                                     max(image_info.width, image_info.height) <= max_dimension)
+        if image_info is not None and image_info.format == 'PNG' and fits:
+            with open(image_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                payload = base64.b64encode(view)
+            copy_stats.record('encode', 'source file', 1)
+            return payload
+        
         with Image.open(image_path) as img:
+            if max_dimension and max(img.size) > max_dimension:
+                # Let the JPEG decoder skip most of the pixels, then downscale the rest
+                img.draft('RGB', (max_dimension, max_dimension))
+                img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+                img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
             # Convert to PNG format for consistency
             buffer = BytesIO()
             img.save(buffer, format='PNG')
-            image_bytes = buffer.getvalue()
-            return base64.b64encode(image_bytes).decode('utf-8')
+            with buffer.getbuffer() as view:
+                payload = base64.b64encode(view)
+            copy_stats.record('encode', 're-encoded', 2)
+            return payload
     except Exception as e:
         logger.error(f"Failed to convert image to base64: {str(e)}")
         raise
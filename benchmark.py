@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for AI Batch Image Editor
+
+Usage:
+    python benchmark.py [--runs N] [--save results.json]
+                        [--requests N] [--concurrency N] [--payload-kb N]
+
+The transport benchmark needs hypercorn and httpx[http2].
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import statistics
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Startup milestones recorded by startup.py, in order
+STARTUP_MARKS = ['imports', 'app_created', 'window_created', 'first_paint', 'interactive', 'modules_loaded']
+
+# Simulated processing time of the local echo server used by the transport benchmark
+TRANSPORT_SERVER_DELAY = 0.02
+
+
+def run_startup_once() -> Dict[str, float]:
+    """Start the application off-screen until it is interactive; return its milestones in seconds."""
+    fd, timing_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env['AIXIUTU_STARTUP_TIMING'] = timing_path
+    env['AIXIUTU_EXIT_AFTER_STARTUP'] = '1'
+    
+    try:
+        started = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(HERE, 'main.py')], cwd=HERE, env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=60, check=True)
+        wall = time.perf_counter() - started
+        with open(timing_path, 'r', encoding='utf-8') as f:
+            marks = json.load(f)
+    finally:
+        os.remove(timing_path)
+    marks['process_wall'] = wall
+    return marks
+
+
+def bench_startup(runs: int) -> Dict[str, float]:
+    """Median startup milestones over several cold process starts."""
+    samples: List[Dict[str, float]] = [run_startup_once() for _ in range(runs)]
+    names = [name for name in STARTUP_MARKS + ['process_wall'] if all(name in s for s in samples)]
+    return {name: statistics.median(s[name] for s in samples) for name in names}
+
+
+def _start_echo_server():
+    """
+    Serve an echo endpoint on localhost that speaks HTTP/1.1 and cleartext HTTP/2.
+    
+    Returns (url, set of client ports seen, stop function).
+    """
+    import socket
+    import asyncio
+    from hypercorn.config import Config
+    from hypercorn.asyncio import serve
+    
+    ports = set()
+    
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        ports.add(scope['client'][1])
+        body = b''
+        more = True
+        while more:
+            message = await receive()
+            body += message.get('body', b'')
+            more = message.get('more_body', False)
+        await asyncio.sleep(TRANSPORT_SERVER_DELAY)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': body})
+    
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(128)  # connections made before the server is up wait in the backlog
+    port = listener.getsockname()[1]
+    config = Config()
+    config.bind = [f'fd://{listener.detach()}']  # hypercorn owns (and closes) the socket
+    config.graceful_timeout = 0
+    config.loglevel = 'WARNING'
+    config.h2_max_inbound_frame_size = 2 ** 20
+    # No GOAWAY after every 1000 requests: streams cut off by it are not sent again
+    config.keep_alive_max_requests = 2 ** 31
+    loop = asyncio.new_event_loop()
+    # Connections still open at shutdown are dropped; don't print their tracebacks
+    loop.set_exception_handler(lambda loop, context: None)
+    stopped = asyncio.Event()
+    thread = threading.Thread(target=loop.run_until_complete, daemon=True,
+                              args=(serve(app, config, shutdown_trigger=stopped.wait),))
+    thread.start()
+    
+    def stop():
+        loop.call_soon_threadsafe(stopped.set)
+        thread.join(10)
+    
+    return f'http://127.0.0.1:{port}/edit', ports, stop
+
+
+def bench_transport(requests_count: int, concurrency: int, payload_kb: int) -> Optional[Dict[str, Dict[str, float]]]:
+    """Concurrent uploads over the pooled HTTP/1.1 and the HTTP/2 transport to a local server."""
+    try:
+        import hypercorn  # noqa: F401
+        import h2  # noqa: F401
+        import httpx  # noqa: F401
+    except ImportError as e:
+        print(f'  skipped: {e} (pip install hypercorn "httpx[http2]")')
+        return None
+    
+    from http_transport import Http1Transport, Http2Transport
+    
+    body = json.dumps({'image': 'A' * (payload_kb * 1024)}).encode('utf-8')
+    headers = {'Content-Type': 'application/json'}
+    results = {}
+    url, ports, stop = _start_echo_server()
+    try:
+        for transport in (Http1Transport(pool_size=concurrency), Http2Transport()):
+            def post(_):
+                started = time.perf_counter()
+                transport.post(url, body, headers, 10, 60)
+                return time.perf_counter() - started
+            
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(post, range(concurrency)))  # warm up connections
+                ports.clear()
+                started = time.perf_counter()
+                latencies = sorted(executor.map(post, range(requests_count)))
+                wall = time.perf_counter() - started
+            results[transport.name] = {
+                'requests_per_second': requests_count / wall,
+                'megabytes_per_second': requests_count * len(body) * 2 / wall / 1e6,
+                'p50_ms': latencies[len(latencies) // 2] * 1000,
+                'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+                'connections': len(ports),
+            }
+    finally:
+        stop()
+    return results
+
+
+def bench_json(payload_mb: float, runs: int) -> Dict[str, float]:
+    """
+    CPU milliseconds per request spent building the JSON body and finding
+    the result image in the response (base64 decoding, the same for both, excluded).
+    """
+    from json_codec import encode_body, extract_string, orjson
+    
+    image_base64 = base64.b64encode(os.urandom(int(payload_mb * 1024 * 1024 * 3 / 4)))
+    fields = {'edit_type': 'retouch', 'smooth': 0.8, 'whiten': 0.6}
+    response = json.dumps({'image': image_base64.decode('ascii')}).encode('utf-8')
+    
+    def generic():
+        # json.dumps/json.loads over the whole base64 text, as requests' json= and response.json() do
+        body = json.dumps({'image': image_base64.decode('utf-8'), **fields}).encode('utf-8')
+        return body, json.loads(response)['image'].encode('ascii')
+    
+    def spliced():
+        return encode_body(image_base64, fields), extract_string(response, 'image')
+    
+    (generic_body, generic_image), (spliced_body, spliced_image) = generic(), spliced()
+    assert json.loads(generic_body) == json.loads(bytes(spliced_body)) and generic_image == bytes(spliced_image)
+    results = {}
+    for name, handle in (('stdlib json', generic), ('json_codec', spliced)):
+        samples = []
+        for _ in range(runs):
+            started = time.process_time()
+            handle()
+            samples.append(time.process_time() - started)
+        results[name] = statistics.median(samples) * 1000
+    results['orjson'] = orjson is not None
+    return results
+
+
+def _payload_length(data) -> int:
+    return len(data)
+
+
+def _handoff_length(handoff_path: str) -> int:
+    import mmap
+    with open(handoff_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return len(data)
+
+
+def bench_payload(payload_mb: float, runs: int) -> Dict[str, float]:
+    """
+    Request body assembly (peak Python memory per request) and result
+    handoff to a process pool (milliseconds per result), before and after
+    the zero-copy paths.
+    """
+    import mmap
+    import tracemalloc
+    from concurrent.futures import ProcessPoolExecutor
+    from buffers import remove_handoff, write_handoff
+    from json_codec import encode_body
+    
+    size = int(payload_mb * 1024 * 1024)
+    fd, source_path = tempfile.mkstemp(suffix='.png')
+    with open(fd, 'wb') as f:
+        f.write(os.urandom(size))
+    fields = {'edit_type': 'retouch', 'smooth': 0.8, 'whiten': 0.6}
+    
+    def read_and_join():
+        with open(source_path, 'rb') as f:
+            image_base64 = base64.b64encode(f.read())
+        return b''.join((b'{"image":"', image_base64, b'",', json.dumps(fields).encode('utf-8')[1:]))
+    
+    def mapped_chain():
+        with open(source_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+            image_base64 = base64.b64encode(view)
+        return encode_body(image_base64, fields)
+    
+    results = {}
+    try:
+        for name, build in (('body_peak_mb_before', read_and_join), ('body_peak_mb_after', mapped_chain)):
+            tracemalloc.start()
+            body = build()
+            results[name] = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+            del body
+    finally:
+        os.remove(source_path)
+    
+    data = os.urandom(size)
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        executor.submit(_payload_length, b'').result()  # start the worker process
+        
+        def pickled():
+            return executor.submit(_payload_length, data).result()
+        
+        def mapped():
+            handoff_path = write_handoff(data)
+            try:
+                return executor.submit(_handoff_length, handoff_path).result()
+            finally:
+                remove_handoff(handoff_path)
+        
+        for name, handoff in (('handoff_ms_pickled', pickled), ('handoff_ms_mapped', mapped)):
+            samples = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                assert handoff() == size
+                samples.append(time.perf_counter() - started)
+            results[name] = statistics.median(samples) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite')
+    parser.add_argument('--runs', type=int, default=5, help='runs per benchmark (median is reported)')
+    parser.add_argument('--save', help='write results as JSON, for tracking across versions')
+    parser.add_argument('--requests', type=int, default=400, help='uploads per transport benchmark')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent uploads (worker threads)')
+    parser.add_argument('--payload-kb', type=int, default=256, help='size of each upload')
+    parser.add_argument('--json-mb', type=float, default=8, help='base64 image size for the JSON benchmark')
+    args = parser.parse_args()
+    
+    results = {}
+    
+    print('=' * 60)
+    print('Startup (time to interactive)')
+    print('=' * 60)
+    results['startup'] = bench_startup(args.runs)
+    for name, seconds in results['startup'].items():
+        print(f'  {name:<16} {seconds * 1000:8.1f} ms')
+    
+    print()
+    print('=' * 60)
+    print(f'JSON handling per request ({args.json_mb:g} MB base64 image each way)')
+    print('=' * 60)
+    results['json'] = bench_json(args.json_mb, max(args.runs, 5))
+    for name in ('stdlib json', 'json_codec'):
+        print(f"  {name:<12} {results['json'][name]:8.2f} ms CPU")
+    print(f"  orjson installed: {'yes' if results['json']['orjson'] else 'no'}")
+    
+    print()
+    print('=' * 60)
+    print(f'Payload buffers ({args.json_mb:g} MB image)')
+    print('=' * 60)
+    results['payload'] = bench_payload(args.json_mb, max(args.runs, 5))
+    payload = results['payload']
+    print(f"  request body peak memory  {payload['body_peak_mb_before']:7.1f} MB read + join   "
+          f"{payload['body_peak_mb_after']:7.1f} MB mmap + buffer chain")
+    print(f"  result handoff            {payload['handoff_ms_pickled']:7.1f} ms pickled       "
+          f"{payload['handoff_ms_mapped']:7.1f} ms memory-mapped file")
+    
+    print()
+    print('=' * 60)
+    print(f'Transport ({args.requests} x {args.payload_kb} KB uploads, {args.concurrency} concurrent, local echo server)')
+    print('=' * 60)
+    transport = bench_transport(args.requests, args.concurrency, args.payload_kb)
+    if transport is not None:
+        results['transport'] = transport
+        for name, row in transport.items():
+            print(f"  {name:<9} {row['requests_per_second']:7.1f} req/s  {row['megabytes_per_second']:6.1f} MB/s  "
+                  f"p50 {row['p50_ms']:6.1f} ms  p99 {row['p99_ms']:6.1f} ms  {row['connections']} connections")
+    
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nSaved to {args.save}')
+    
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Request payloads are multi-megabyte base64 images. They travel from the
+# source file to the socket as buffer views, and results reach the
+# transcoding processes through memory-mapped files, so that each image is
+# copied as few times as possible. CopyStats counts the copies that remain.
+
+# Memory-backed directory for the files handed to the transcoding processes
+HANDOFF_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Size of the chunks a BufferChain is streamed in
+CHUNK_SIZE = 256 * 1024
+
+
+class BufferChain:
+    """
+    Several buffers sent as one request body, without joining them.
+    
+    Behaves as a read-only file for requests (which then sends views of the
+    buffers straight to the socket) and can be streamed in chunks.
+    """
+    
+    def __init__(self, buffers: Sequence):
+        self._views = [memoryview(buffer).cast('B') for buffer in buffers]
+        self._length = sum(len(view) for view in self._views)
+        self._position = 0
+    
+    def __len__(self) -> int:
+        return self._length
+    
+    def __bytes__(self) -> bytes:
+        return b''.join(self._views)
+    
+    def read(self, size: int = -1) -> memoryview:
+        """Return up to size bytes (from a single buffer) as a view."""
+        offset = self._position
+        for view in self._views:
+            if offset < len(view):
+                end = len(view) if size is None or size < 0 else min(len(view), offset + size)
+                self._position += end - offset
+                return view[offset:end]
+            offset -= len(view)
+        return memoryview(b'')
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def seek(self, position: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            position += self._position
+        elif whence == os.SEEK_END:
+            position += self._length
+        self._position = max(0, min(position, self._length))
+        return self._position
+    
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+        """Views of the whole body, at most size bytes each."""
+        for view in self._views:
+            for start in range(0, len(view), size):
+                yield view[start:start + size]
+
+
+def write_handoff(data) -> str:
+    """
+    Put bytes in a memory-mapped temp file for another process.
+    
+    This is the one copy of the handoff; pickling the bytes into a process
+    pool would copy them into the pipe and again out of it. The caller
+    deletes the file once the other process is done with it.
+    """
+    import tempfile
+    
+    fd, path = tempfile.mkstemp(prefix='aixiutu-', suffix='.bin', dir=HANDOFF_DIR)
+    try:
+        with open(fd, 'wb') as f:
+            f.write(data)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+def remove_handoff(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class CopyStats:
+    """
+    Counts full copies of each image's data, per stage, for the end-of-batch
+    report.
+    
+    Copies are declared where they happen: 'encode' from the source (or an
+    earlier result) to the base64 payload, 'send' from the payload to the
+    socket, 'handoff' from a result to a transcoding process.
+    """
+    
+    STAGES = ('encode', 'send', 'handoff')
+    
+    def __init__(self):
+        self._counts: Dict[Tuple[str, str], List[int]] = {}  # (stage, path) -> [events, copies]
+        self._lock = threading.Lock()
+    
+    def record(self, stage: str, path: str, copies: int):
+        with self._lock:
+            counts = self._counts.setdefault((stage, path), [0, 0])
+            counts[0] += 1
+            counts[1] += copies
+    
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+    
+    def summary(self) -> Optional[str]:
+        """Mean copies per stage, e.g. '... encode 1.00 (source file 120x 1.00); send 0.00 (HTTP/1.1 240x 0.00)'."""
+        with self._lock:
+            counts = {key: tuple(value) for key, value in self._counts.items()}
+        if not counts:
+            return None
+        parts = []
+        for stage in self.STAGES:
+            rows = sorted((path, events, copies) for (row_stage, path), (events, copies) in counts.items()
+                          if row_stage == stage)
+            if not rows:
+                continue
+            events = sum(row[1] for row in rows)
+            copies = sum(row[2] for row in rows)
+            detail = ', '.join(f'{path} {n}x {c / n:.2f}' for path, n, c in rows)
+            parts.append(f'{stage} {copies / events:.2f} ({detail})')
+        return 'Payload copies (mean per image and stage): ' + '; '.join(parts)
+
+
+copy_stats = CopyStats()
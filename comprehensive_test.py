@@ -57,9 +57,14 @@ def check_module_structure():
         },
         'api_clients.py': {
             'expected_classes': ['DoubaoClient', 'BananaClient'],
-            'expected_imports': ['base64', 'requests', 'PIL'],
+            'expected_imports': ['base64', 'http_transport', 'json_codec'],
             'description': 'API client implementations'
         },
+        'http_transport.py': {
+            'expected_classes': ['TransportError', 'Http1Transport', 'Http2Transport'],
+            'expected_imports': ['requests', 'httpx'],
+            'description': 'HTTP transports'
+        },
         'worker_threads.py': {
             'expected_classes': ['ProcessingTask', 'WorkerThread', 'TaskManager'],
             'expected_imports': ['queue', 'threading', 'PyQt6'],
@@ -115,7 +120,8 @@ def check_file_dependencies():
         'main.py': ['config_manager', 'ui_components'],
         'ui_components.py': ['config_manager', 'worker_threads'],
         'worker_threads.py': ['api_clients'],
-        'api_clients.py': [],
+        'api_clients.py': ['http_transport'],
+        'http_transport.py': [],
         'config_manager.py': []
     }
     
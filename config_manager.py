@@ -1,6 +1,8 @@
 import os
 from dotenv import load_dotenv
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+
+from tiling import DEFAULT_TILE_SIZE, DEFAULT_TILE_OVERLAP
 
 
 class ConfigManager:
@@ -12,7 +14,19 @@ class ConfigManager:
             'doubao_api_key': '',
             'banana_api_url': '',
             'banana_api_key': '',
-            'banana_model_key': ''
+            'banana_model_key': '',
+            'doubao_tile_size': str(DEFAULT_TILE_SIZE),
+            'doubao_tile_overlap': str(DEFAULT_TILE_OVERLAP),
+            'banana_tile_size': str(DEFAULT_TILE_SIZE),
+            'banana_tile_overlap': str(DEFAULT_TILE_OVERLAP),
+            'doubao_key_rpm': '0',
+            'banana_key_rpm': '0',
+            'doubao_http2': '',
+            'banana_http2': '',
+            'doubao_workers': '5',
+            'banana_workers': '5',
+            'doubao_rpm': '0',
+            'banana_rpm': '0'
         }
         self._load_from_env()
     
@@ -25,6 +39,18 @@ class ConfigManager:
         self.config['banana_api_url'] = os.getenv('BANANA_API_URL', '')
         self.config['banana_api_key'] = os.getenv('BANANA_API_KEY', '')
         self.config['banana_model_key'] = os.getenv('BANANA_MODEL_KEY', '')
+        self.config['doubao_tile_size'] = os.getenv('DOUBAO_TILE_SIZE', str(DEFAULT_TILE_SIZE))
+        self.config['doubao_tile_overlap'] = os.getenv('DOUBAO_TILE_OVERLAP', str(DEFAULT_TILE_OVERLAP))
+        self.config['banana_tile_size'] = os.getenv('BANANA_TILE_SIZE', str(DEFAULT_TILE_SIZE))
+        self.config['banana_tile_overlap'] = os.getenv('BANANA_TILE_OVERLAP', str(DEFAULT_TILE_OVERLAP))
+        self.config['doubao_key_rpm'] = os.getenv('DOUBAO_KEY_RPM', '0')
+        self.config['banana_key_rpm'] = os.getenv('BANANA_KEY_RPM', '0')
+        self.config['doubao_http2'] = os.getenv('DOUBAO_HTTP2', '')
+        self.config['banana_http2'] = os.getenv('BANANA_HTTP2', '')
+        self.config['doubao_workers'] = os.getenv('DOUBAO_WORKERS', '5')
+        self.config['banana_workers'] = os.getenv('BANANA_WORKERS', '5')
+        self.config['doubao_rpm'] = os.getenv('DOUBAO_RPM', '0')
+        self.config['banana_rpm'] = os.getenv('BANANA_RPM', '0')
     
     def update_config(self, config_dict: Dict[str, str]):
         """Update configuration from dictionary."""
@@ -34,10 +60,20 @@ class ConfigManager:
         """Get current configuration."""
         return self.config.copy()
     
+    def get_tile_settings(self, model_type: str) -> Tuple[int, int]:
+        """Get (tile_size, overlap) in pixels for a model."""
+        try:
+            tile_size = int(self.config.get(f'{model_type}_tile_size') or DEFAULT_TILE_SIZE)
+            overlap = int(self.config.get(f'{model_type}_tile_overlap') or DEFAULT_TILE_OVERLAP)
+        except ValueError:
+            return DEFAULT_TILE_SIZE, DEFAULT_TILE_OVERLAP
+        return max(256, tile_size), max(0, overlap)
+    
     def save_to_env(self, config_dict: Dict[str, str]):
         """Save configuration to .env file."""
         env_content = """# AI Batch Image Editor - API Configuration
 
+# Several URLs and keys may be given, separated by commas
 # Doubao (豆包) API Configuration
 DOUBAO_API_URL={doubao_api_url}
 DOUBAO_API_KEY={doubao_api_key}
@@ -46,7 +82,29 @@ DOUBAO_API_KEY={doubao_api_key}
 BANANA_API_URL={banana_api_url}
 BANANA_API_KEY={banana_api_key}
 BANANA_MODEL_KEY={banana_model_key}
-""".format(**config_dict)
+
+# Tiling of large images (pixels)
+DOUBAO_TILE_SIZE={doubao_tile_size}
+DOUBAO_TILE_OVERLAP={doubao_tile_overlap}
+BANANA_TILE_SIZE={banana_tile_size}
+BANANA_TILE_OVERLAP={banana_tile_overlap}
+
+# Requests per minute allowed per API key (0 = unlimited)
+DOUBAO_KEY_RPM={doubao_key_rpm}
+BANANA_KEY_RPM={banana_key_rpm}
+
+# URLs to use HTTP/2 with (comma separated, or 'all'); needs httpx[http2]
+DOUBAO_HTTP2={doubao_http2}
+BANANA_HTTP2={banana_http2}
+
+# Concurrent requests per model; each model has its own workers and queue
+DOUBAO_WORKERS={doubao_workers}
+BANANA_WORKERS={banana_workers}
+
+# Requests per minute allowed per model, over all its keys (0 = unlimited)
+DOUBAO_RPM={doubao_rpm}
+BANANA_RPM={banana_rpm}
+""".format(**{**self.config, **config_dict})
         
         with open('.env', 'w', encoding='utf-8') as f:
             f.write(env_content)
@@ -0,0 +1,219 @@
+import os
+import hashlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from PyQt6.QtCore import QObject, pyqtSignal
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default maximum Hamming distance (out of 64 bits) for near-duplicates
+DEFAULT_NEAR_THRESHOLD = 6
+
+# Images whose downscaled luminance varies less than this carry no usable hash
+FLAT_IMAGE_RANGE = 8
+
+
+def file_digest(path: str) -> Optional[str]:
+    """Hash a file's contents; None if it cannot be read."""
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except OSError as e:
+        logger.warning(f"Cannot hash {path}: {str(e)}")
+        return None
+    return digest.hexdigest()
+
+
+def perceptual_hash(path: str) -> Optional[int]:
+    """
+    64-bit difference hash (dHash) of an image.
+    
+    Re-encoded, resized or lightly edited copies of a photo get hashes that
+    differ in only a few bits.
+    """
+    from PIL import Image
+    
+    try:
+        with Image.open(path) as img:
+            # Let the JPEG decoder downscale while decoding
+            img.draft('L', (64, 64))
+            pixels = list(img.convert('L').resize((9, 8), Image.Resampling.BILINEAR).getdata())
+    except Exception as e:
+        logger.warning(f"Cannot compute perceptual hash of {path}: {str(e)}")
+        return None
+    
+    if max(pixels) - min(pixels) < FLAT_IMAGE_RANGE:
+        # Nearly uniform images all hash alike; never treat them as near-duplicates
+        return None
+    
+    value = 0
+    for row in range(8):
+        for column in range(8):
+            value = (value << 1) | (pixels[row * 9 + column] > pixels[row * 9 + column + 1])
+    return value
+
+
+class DedupReport:
+    """Result of a dedup pass: one representative per group of identical inputs."""
+    
+    def __init__(self, representatives: List[str], duplicates: Dict[str, List[str]],
+                 exact_count: int, near_count: int):
+        self.representatives = representatives
+        self.duplicates = duplicates  # representative -> member paths
+        self.exact_count = exact_count
+        self.near_count = near_count
+        self.calls_per_image = 1  # API calls each image would have cost
+    
+    @property
+    def duplicate_count(self) -> int:
+        return self.exact_count + self.near_count
+    
+    @property
+    def calls_saved(self) -> int:
+        """API calls not made because duplicates reuse their representative's result."""
+        return self.duplicate_count * self.calls_per_image
+    
+    def summary(self) -> str:
+        """One-line report for the UI."""
+        if not self.duplicate_count:
+            return '去重：未发现重复图片'
+        parts = []
+        if self.exact_count:
+            parts.append(f'{self.exact_count} 张完全相同')
+        if self.near_count:
+            parts.append(f'{self.near_count} 张近似重复')
+        return f"去重：{'，'.join(parts)}，节省 {self.calls_saved} 次 API 调用"
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+    
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+    
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            # Keep the earliest image as the group's representative
+            self.parent[max(a, b)] = min(a, b)
+
+
+def _near_duplicate_pairs(hashes: List[Optional[int]], threshold: int) -> Iterable[tuple]:
+    """
+    Yield index pairs whose hashes differ in at most threshold bits.
+    
+    By the pigeonhole principle, two such hashes agree exactly on at least
+    one of threshold + 1 bands, so only images sharing a band are compared.
+    """
+    bands = threshold + 1
+    band_bits = [64 * i // bands for i in range(bands + 1)]
+    compared = set()
+    for band in range(bands):
+        low, high = band_bits[band], band_bits[band + 1]
+        mask = ((1 << (high - low)) - 1) << low
+        buckets = defaultdict(list)
+        for index, value in enumerate(hashes):
+            if value is not None:
+                buckets[value & mask].append(index)
+        for members in buckets.values():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) not in compared:
+                        compared.add((a, b))
+                        if bin(hashes[a] ^ hashes[b]).count('1') <= threshold:
+                            yield a, b
+
+
+def find_duplicates(paths: Iterable[str], near_threshold: Optional[int] = None,
+                    max_workers: int = 8) -> DedupReport:
+    """
+    Group byte-identical files, and optionally near-duplicate images.
+    
+    Only files whose sizes collide are hashed. Near-duplicate detection
+    compares perceptual hashes of the remaining unique files.
+    
+    Args:
+        paths: Images to process, in list order (the first of a group represents it)
+        near_threshold: Max Hamming distance for near-duplicates, or None for exact only
+        max_workers: Threads used for hashing
+    """
+    paths = list(paths)
+    groups = _UnionFind(len(paths))
+    
+    by_size = defaultdict(list)
+    for index, path in enumerate(paths):
+        try:
+            by_size[os.path.getsize(path)].append(index)
+        except OSError:
+            continue
+    candidates = [index for members in by_size.values() if len(members) > 1 for index in members]
+    
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='Dedup') as executor:
+        digests = dict(zip(candidates, executor.map(file_digest, (paths[i] for i in candidates))))
+        first_with_digest: Dict[str, int] = {}
+        for index in sorted(candidates):
+            digest = digests[index]
+            if digest is None:
+                continue
+            if digest in first_with_digest:
+                groups.union(first_with_digest[digest], index)
+            else:
+                first_with_digest[digest] = index
+        exact_count = sum(1 for index in range(len(paths)) if groups.find(index) != index)
+        
+        near_count = 0
+        if near_threshold is not None:
+            unique = [index for index in range(len(paths)) if groups.find(index) == index]
+            hashes = list(executor.map(perceptual_hash, (paths[i] for i in unique)))
+            for a, b in _near_duplicate_pairs(hashes, near_threshold):
+                if groups.find(unique[a]) != groups.find(unique[b]):
+                    groups.union(unique[a], unique[b])
+                    near_count += 1
+    
+    representatives = []
+    duplicates: Dict[str, List[str]] = {}
+    for index, path in enumerate(paths):
+        root = groups.find(index)
+        if root == index:
+            representatives.append(path)
+        else:
+            duplicates.setdefault(paths[root], []).append(path)
+    
+    logger.info(f"Dedup: {len(paths)} images, {exact_count} identical, {near_count} near-duplicates")
+    return DedupReport(representatives, duplicates, exact_count, near_count)
+
+
+class DuplicateFinder(QObject):
+    """Runs find_duplicates on a background thread, so the UI stays responsive."""
+    
+    # Signals
+    finished = pyqtSignal(object)  # DedupReport
+    
+    def __init__(self, paths: List[str], near_threshold: Optional[int] = None):
+        super().__init__()
+        self.paths = list(paths)
+        self.near_threshold = near_threshold
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start hashing on a background thread."""
+        self._thread = threading.Thread(target=self._run, name='DuplicateFinder', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        try:
+            report = find_duplicates(self.paths, self.near_threshold)
+        except Exception as e:
+            # Nothing is deduplicated rather than the batch not starting
+            logger.error(f"Dedup failed: {str(e)}")
+            report = DedupReport(self.paths, {}, 0, 0)
+        self.finished.emit(report)
@@ -0,0 +1,331 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Timeouts in seconds. Read timeouts bound the wait for the API's answer and
+# are derived from the latencies observed on each endpoint once there are
+# MIN_LATENCY_SAMPLES: p99 latency x TIMEOUT_FACTOR, scaled to the request size
+CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+MIN_READ_TIMEOUT = 5.0
+MAX_READ_TIMEOUT = 600.0
+TIMEOUT_FACTOR = 3.0
+MIN_LATENCY_SAMPLES = 20
+
+# A task may use this many read timeouts in total, over failovers and retries
+TASK_DEADLINE_FACTOR = 3.0
+
+# Megapixels that cost as much as the fixed overhead of a request
+OVERHEAD_MEGAPIXELS = 1.0
+
+MODEL_NAMES = {
+    'doubao': '豆包',
+    'banana': 'Banana'
+}
+
+
+def size_scale(megapixels: float) -> float:
+    """Expected latency of a request of this size relative to a 1 MP request."""
+    return (OVERHEAD_MEGAPIXELS + max(0.0, megapixels)) / (OVERHEAD_MEGAPIXELS + 1.0)
+
+
+class LatencyWindow:
+    """Recent successful latencies of one endpoint, normalized to a 1 MP request."""
+    
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def add(self, seconds: float, megapixels: float):
+        self._samples.append(seconds / size_scale(megapixels))
+    
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self._samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def split_values(value: str) -> List[str]:
+    """Split a config value holding several comma/newline separated entries."""
+    return [item.strip() for item in value.replace('\n', ',').split(',') if item.strip()]
+
+
+class KeyQuota:
+    """Sliding one-minute request budget of one API key (shared by all its endpoints) or of a whole model."""
+    
+    def __init__(self, requests_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute  # 0 means unlimited
+        self._sent = deque()
+    
+    def _expire(self, now: float):
+        while self._sent and now - self._sent[0] >= 60.0:
+            self._sent.popleft()
+    
+    def wait_time(self, now: float) -> float:
+        """Seconds until a request may be sent with this key (0 if now)."""
+        if not self.requests_per_minute:
+            return 0.0
+        self._expire(now)
+        if len(self._sent) < self.requests_per_minute:
+            return 0.0
+        return 60.0 - (now - self._sent[0])
+    
+    def record(self, now: float):
+        if self.requests_per_minute:
+            self._sent.append(now)
+    
+    @property
+    def used(self) -> int:
+        self._expire(time.monotonic())
+        return len(self._sent)
+
+
+class Endpoint:
+    """One (URL, key) route of a model, with its observed health."""
+    
+    # Weight of the newest sample in the latency / error moving averages
+    SMOOTHING = 0.2
+    MAX_COOLDOWN = 60.0
+    
+    def __init__(self, url: str, api_key: str, quota: KeyQuota, model_key: str = '', http2: bool = False):
+        self.url = url
+        self.api_key = api_key
+        self.model_key = model_key
+        self.http2 = http2  # cleared if the endpoint turns out not to support it
+        self.quota = quota
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.latency: Optional[float] = None  # moving average of successful requests
+        self.error_rate = 0.0  # moving average of faults
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.latencies = LatencyWindow()
+        self.timeouts = 0  # requests that hit their read timeout
+        self.timeout_total = 0.0  # sum of the read timeouts chosen, for the report
+    
+    @property
+    def label(self) -> str:
+        """URL plus the last characters of the key, safe to show and log."""
+        return f"{self.url} (key …{self.api_key[-4:]})"
+    
+    def is_down(self, now: float) -> bool:
+        return now < self.down_until
+    
+    def score(self, default_latency: float) -> float:
+        """Expected cost of sending the next request here; lower is better."""
+        latency = self.latency if self.latency is not None else default_latency
+        return latency * (self.in_flight + 1) / max(0.05, 1.0 - self.error_rate)
+    
+    def read_timeout(self, megapixels: float) -> Tuple[float, str]:
+        """
+        Read timeout for a request of this size, and what it was based on.
+        
+        Until enough latencies have been observed the default applies,
+        stretched (never shortened) for large requests.
+        """
+        p99 = self.latencies.percentile(0.99)
+        if p99 is None:
+            timeout, basis = DEFAULT_READ_TIMEOUT * max(1.0, size_scale(megapixels)), 'default'
+        else:
+            timeout, basis = p99 * TIMEOUT_FACTOR * size_scale(megapixels), f'p99 {p99:.1f}s/MP'
+        return min(MAX_READ_TIMEOUT, max(MIN_READ_TIMEOUT, timeout)), basis
+    
+    def record(self, success: bool, latency: float, fault: bool, now: float,
+               megapixels: float = 1.0, timed_out: bool = False):
+        self.in_flight -= 1
+        self.requests += 1
+        self.timeouts += timed_out
+        if success:
+            self.total_latency += latency
+            self.latencies.add(latency, megapixels)
+            self.latency = latency if self.latency is None else (
+                self.latency + self.SMOOTHING * (latency - self.latency)
+            )
+        else:
+            self.failures += 1
+        
+        self.error_rate += self.SMOOTHING * ((1.0 if fault else 0.0) - self.error_rate)
+        if fault:
+            # Take the endpoint out of rotation, backing off exponentially
+            self.consecutive_failures += 1
+            self.down_until = now + min(self.MAX_COOLDOWN, 2.0 ** self.consecutive_failures)
+        else:
+            self.consecutive_failures = 0
+            self.down_until = 0.0
+
+
+class EndpointPool:
+    """
+    All endpoints and keys configured for one model.
+    
+    Requests go to the endpoint with the lowest expected cost, weighing its
+    observed latency by its current load and error rate. Endpoints that
+    time out, refuse connections, reject the key or return 429/5xx are
+    skipped for a growing cooldown, and the request fails over to another.
+    """
+    
+    def __init__(self, model_type: str, endpoints: List[Endpoint], quota: Optional[KeyQuota] = None):
+        self.model_type = model_type
+        self.endpoints = endpoints
+        self.quota = quota or KeyQuota()  # budget of the model as a whole, over all keys
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, str], model_type: str) -> 'EndpointPool':
+        """
+        Build the pool from '<model>_api_url' and '<model>_api_key' entries.
+        
+        Both may list several comma separated values; every URL is used with
+        every key. '<model>_key_rpm' limits requests per minute per key,
+        '<model>_rpm' those of the model over all keys. '<model>_http2' lists
+        the URLs to be sent HTTP/2, or is 'all'.
+        """
+        urls = split_values(config.get(f'{model_type}_api_url', ''))
+        keys = split_values(config.get(f'{model_type}_api_key', ''))
+        model_key = config.get(f'{model_type}_model_key', '')
+        http2_urls = split_values(config.get(f'{model_type}_http2', ''))
+        try:
+            requests_per_minute = int(config.get(f'{model_type}_key_rpm') or 0)
+        except ValueError:
+            requests_per_minute = 0
+        try:
+            model_requests_per_minute = int(config.get(f'{model_type}_rpm') or 0)
+        except ValueError:
+            model_requests_per_minute = 0
+        
+        quotas = {key: KeyQuota(requests_per_minute) for key in keys}
+        endpoints = [Endpoint(url, key, quotas[key], model_key, 'all' in http2_urls or url in http2_urls)
+                     for key in keys for url in urls]
+        return cls(model_type, endpoints, KeyQuota(model_requests_per_minute))
+    
+    def acquire(self, exclude: Optional[Set[Endpoint]] = None,
+                deadline: Optional[float] = None) -> Optional[Endpoint]:
+        """
+        Pick the endpoint for the next request, waiting while the model or
+        every key is at its quota.
+        
+        Args:
+            exclude: Endpoints not to use
+            deadline: time.monotonic() after which waiting for quota gives up
+        
+        Returns:
+            The endpoint (to be passed back to release), or None if all have been excluded
+        
+        Raises:
+            TimeoutError: if the quota does not allow a request before the deadline
+        """
+        exclude = exclude or set()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+                if not candidates:
+                    return None
+                
+                model_wait = self.quota.wait_time(now)
+                ready = [endpoint for endpoint in candidates if endpoint.quota.wait_time(now) == 0.0]
+                if ready and model_wait == 0.0:
+                    # Prefer healthy endpoints; if all are cooling down, use the one back soonest
+                    healthy = [endpoint for endpoint in ready if not endpoint.is_down(now)]
+                    if healthy:
+                        known = [endpoint.latency for endpoint in healthy if endpoint.latency is not None]
+                        # Untried endpoints are assumed as fast as the best known one
+                        default_latency = min(known) if known else 1.0
+                        endpoint = min(healthy, key=lambda item: item.score(default_latency))
+                    else:
+                        endpoint = min(ready, key=lambda item: item.down_until)
+                    endpoint.in_flight += 1
+                    endpoint.quota.record(now)
+                    self.quota.record(now)
+                    return endpoint
+                
+                wait = max(model_wait, min(endpoint.quota.wait_time(now) for endpoint in candidates))
+            
+            if deadline is not None and now + wait > deadline:
+                raise TimeoutError(f"{self.model_type} quota allows no request within the task deadline")
+            logger.info(f"{self.model_type} {'at its' if model_wait else 'keys at'} quota, waiting {wait:.1f}s")
+            time.sleep(min(wait, 1.0))
+    
+    def read_timeout(self, endpoint: Endpoint, megapixels: float) -> Tuple[float, str]:
+        """Read timeout for a request of this size to one endpoint (see Endpoint.read_timeout)."""
+        with self._lock:
+            timeout, basis = endpoint.read_timeout(megapixels)
+            endpoint.timeout_total += timeout
+            return timeout, basis
+    
+    def task_deadline(self, megapixels: float) -> float:
+        """Seconds a task of this size may spend on requests, over all failovers and retries."""
+        with self._lock:
+            timeouts = [endpoint.read_timeout(megapixels)[0] for endpoint in self.endpoints]
+        return TASK_DEADLINE_FACTOR * max(timeouts, default=DEFAULT_READ_TIMEOUT)
+    
+    def release(self, endpoint: Endpoint, success: bool, latency: float, fault: bool = False,
+                megapixels: float = 1.0, timed_out: bool = False):
+        """Record the outcome of a request sent to an endpoint."""
+        with self._lock:
+            endpoint.record(success, latency, fault, time.monotonic(), megapixels, timed_out)
+            if fault:
+                logger.warning(f"Endpoint {endpoint.label} failed, "
+                               f"cooling down for {endpoint.down_until - time.monotonic():.0f}s")
+    
+    def report(self) -> List[Dict]:
+        """Per-endpoint traffic share, latency and error counts."""
+        with self._lock:
+            total = sum(endpoint.requests for endpoint in self.endpoints)
+            rows = []
+            for endpoint in self.endpoints:
+                successes = endpoint.requests - endpoint.failures
+                rows.append({
+                    'endpoint': endpoint.label,
+                    'protocol': 'HTTP/2' if endpoint.http2 else 'HTTP/1.1',
+                    'requests': endpoint.requests,
+                    'share': endpoint.requests / total if total else 0.0,
+                    'mean_latency': endpoint.total_latency / successes if successes else None,
+                    'failures': endpoint.failures,
+                    'timeouts': endpoint.timeouts,
+                    'mean_timeout': endpoint.timeout_total / endpoint.requests if endpoint.requests else None,
+                    'p99_latency': endpoint.latencies.percentile(0.99),
+                    'key_used_last_minute': endpoint.quota.used
+                })
+            return rows
+    
+    def format_report(self) -> List[str]:
+        """Report lines for the UI and the log."""
+        lines = []
+        for row in self.report():
+            if not row['requests']:
+                continue
+            latency = f"{row['mean_latency']:.2f}s" if row['mean_latency'] is not None else '-'
+            lines.append(
+                f"{MODEL_NAMES.get(self.model_type, self.model_type)} {row['endpoint']} [{row['protocol']}]: "
+                f"{row['share']:.0%} 流量, 平均延迟 {latency}, 失败 {row['failures']}/{row['requests']}"
+                + (f", 超时 {row['timeouts']}" if row['timeouts'] else '')
+            )
+        return lines
+    
+    def format_timeout_report(self) -> List[str]:
+        """Timeouts chosen and hit per endpoint, for tuning (log only)."""
+        lines = []
+        for row in self.report():
+            if not row['requests']:
+                continue
+            p99 = f"{row['p99_latency']:.2f}s/MP" if row['p99_latency'] is not None else 'too few samples'
+            lines.append(
+                f"Timeouts {self.model_type} {row['endpoint']}: mean read timeout {row['mean_timeout']:.1f}s, "
+                f"p99 latency {p99}, {row['timeouts']}/{row['requests']} timed out"
+            )
+        return lines
+
+
+def build_endpoint_pools(config: Dict[str, str], model_types: Iterable[str] = MODEL_NAMES) -> Dict[str, EndpointPool]:
+    """Create one pool per model from the API configuration."""
+    return {model_type: EndpointPool.from_config(config, model_type) for model_type in model_types}
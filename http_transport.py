@@ -0,0 +1,246 @@
+import threading
+from typing import Dict, Optional, Set, Union
+import logging
+
+from buffers import BufferChain, copy_stats
+
+# requests and httpx are imported when the first request is sent, so that
+# importing the API clients does not slow down application startup
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per origin by the HTTP/1.1 transport (one per in-flight request)
+HTTP1_POOL_SIZE = 32
+
+
+class TransportError(Exception):
+    """A request that got no usable response."""
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, timed_out: bool = False,
+                 connection_failed: bool = False):
+        super().__init__(message)
+        self.status_code = status_code  # HTTP error status, if the server answered
+        self.timed_out = timed_out
+        self.connection_failed = connection_failed  # refused, dropped or connect timeout
+
+
+class Http1Transport:
+    """
+    HTTP/1.1 through one shared requests session.
+    
+    Connections are pooled and reused, but each in-flight request still
+    needs a connection of its own.
+    """
+    
+    name = 'HTTP/1.1'
+    # A BufferChain body is written to the socket from views of its buffers
+    BODY_COPIES = 0
+    
+    def __init__(self, pool_size: int = HTTP1_POOL_SIZE):
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+    
+    def post(self, url: str, body: Union[bytes, BufferChain], headers: Dict[str, str],
+             connect_timeout: float, read_timeout: float) -> bytes:
+        """POST body and return the response body; raises TransportError."""
+        import requests
+        
+        if isinstance(body, BufferChain):
+            body.seek(0)
+        
+        try:
+            response = self._session.post(url, data=body, headers=headers, timeout=(connect_timeout, read_timeout))
+            response.raise_for_status()
+        except requests.exceptions.ConnectTimeout as e:
+            raise TransportError(str(e), timed_out=True, connection_failed=True) from e
+        except requests.exceptions.Timeout as e:
+            raise TransportError(str(e), timed_out=True) from e
+        except requests.exceptions.ConnectionError as e:
+            raise TransportError(str(e), connection_failed=True) from e
+        except requests.exceptions.HTTPError as e:
+            raise TransportError(str(e), status_code=e.response.status_code) from e
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e)) from e
+        return response.content
+
+
+class Http2Transport:
+    """
+    HTTP/2 through httpx: concurrent requests to one origin are multiplexed
+    as streams over a single connection.
+    
+    https endpoints negotiate the protocol, so servers without HTTP/2 are
+    spoken to in HTTP/1.1. Plain http endpoints are sent HTTP/2 directly
+    (prior knowledge); send() falls back to HTTP/1.1 if they drop it.
+    
+    The connections are driven by an event loop on a thread of its own;
+    worker threads hand it their requests and wait for the response. (The
+    synchronous httpx client stalls when several threads share one
+    HTTP/2 connection.)
+    """
+    
+    name = 'HTTP/2'
+    # DATA frames are assembled from copies of the body
+    BODY_COPIES = 1
+    
+    def __init__(self):
+        import asyncio
+        import httpx
+        
+        self._loop = asyncio.new_event_loop()
+        # Raises ImportError if the h2 package is missing
+        self._tls = httpx.AsyncClient(http2=True)
+        self._cleartext = httpx.AsyncClient(http1=False, http2=True)
+        threading.Thread(target=self._loop.run_forever, name='HTTP2', daemon=True).start()
+    
+    async def _post(self, client, url: str, body: Union[bytes, BufferChain], headers: Dict[str, str], timeout):
+        import httpx
+        
+        if isinstance(body, BufferChain):
+            headers = {**headers, 'Content-Length': str(len(body))}
+        for attempt in range(2):
+            stream_ids, sent = [], []
+            
+            async def trace(name: str, info: Dict):
+                if name == 'http2.send_request_headers.started':
+                    stream_ids.append(info['stream_id'])
+                elif name == 'http2.send_request_body.complete':
+                    sent.append(True)
+            
+            try:
+                response = await client.post(url, content=_content(body), headers=headers, timeout=timeout,
+                                             extensions={'trace': trace})
+            except httpx.RemoteProtocolError as e:
+                # Requests are billed: one is only sent again if the server
+                # provably did not process it
+                if attempt or not _unprocessed(e, stream_ids[-1] if stream_ids else None, bool(sent)):
+                    raise
+                continue
+            response.raise_for_status()
+            return response
+    
+    def post(self, url: str, body: Union[bytes, BufferChain], headers: Dict[str, str],
+             connect_timeout: float, read_timeout: float) -> bytes:
+        """POST body and return the response body; raises TransportError."""
+        import asyncio
+        import httpx
+        
+        client = self._cleartext if url.startswith('http://') else self._tls
+        timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        try:
+            request = self._post(client, url, body, headers, timeout)
+            response = asyncio.run_coroutine_threadsafe(request, self._loop).result()
+        except httpx.ConnectTimeout as e:
+            raise TransportError(str(e), timed_out=True, connection_failed=True) from e
+        except httpx.TimeoutException as e:
+            raise TransportError(str(e), timed_out=True) from e
+        except httpx.HTTPStatusError as e:
+            raise TransportError(str(e), status_code=e.response.status_code) from e
+        except httpx.RemoteProtocolError as e:
+            # Reset after the server may have processed the request: not an
+            # endpoint fault, so it is not sent to another endpoint either
+            raise TransportError(str(e) or type(e).__name__) from e
+        except httpx.TransportError as e:
+            raise TransportError(str(e) or type(e).__name__, connection_failed=True) from e
+        except httpx.HTTPError as e:
+            raise TransportError(str(e)) from e
+        return response.content
+
+
+def _unprocessed(error: Exception, stream_id: Optional[int], body_sent: bool) -> bool:
+    """
+    Whether an HTTP/2 protocol error proves the server did not process the
+    request: its stream was refused, or the connection was closed (GOAWAY)
+    below its stream id (RFC 9113, section 8.7) or before the whole body,
+    and with it the end of the stream, was sent.
+    
+    (httpcore itself sends streams above a GOAWAY's last stream id again,
+    except when that id is 0.)
+    """
+    import h2.errors
+    import h2.events
+    
+    cause = error.__cause__
+    event = cause.args[0] if cause is not None and cause.args else None
+    if isinstance(event, h2.events.StreamReset):
+        return event.error_code == h2.errors.ErrorCodes.REFUSED_STREAM
+    if isinstance(event, h2.events.ConnectionTerminated):
+        if not body_sent:
+            return True
+        return stream_id is not None and event.last_stream_id is not None and stream_id > event.last_stream_id
+    return False
+
+
+def _content(body: Union[bytes, BufferChain]):
+    """Request content for httpx, streaming a BufferChain in chunks."""
+    if not isinstance(body, BufferChain):
+        return body
+    
+    async def chunks():
+        for chunk in body.chunks():
+            yield chunk
+    return chunks()
+
+
+_transports: Dict[str, object] = {}
+_transports_lock = threading.Lock()
+
+# URLs that have answered over HTTP/2 at least once
+_http2_confirmed: Set[str] = set()
+
+
+def http1_transport() -> Http1Transport:
+    """The process-wide HTTP/1.1 transport."""
+    with _transports_lock:
+        if 'http1' not in _transports:
+            _transports['http1'] = Http1Transport()
+        return _transports['http1']
+
+
+def http2_transport() -> Optional[Http2Transport]:
+    """The process-wide HTTP/2 transport, or None if httpx[http2] is not installed."""
+    with _transports_lock:
+        if 'http2' not in _transports:
+            try:
+                _transports['http2'] = Http2Transport()
+            except ImportError as e:
+                logger.warning(f"HTTP/2 unavailable, using HTTP/1.1 (pip install 'httpx[http2]'): {str(e)}")
+                _transports['http2'] = None
+        return _transports['http2']
+
+
+def send(endpoint, body: Union[bytes, BufferChain], headers: Dict[str, str],
+         connect_timeout: float, read_timeout: float) -> bytes:
+    """
+    POST to an endpoint over the protocol configured for it.
+    
+    Endpoints set to HTTP/2 fall back to HTTP/1.1 for good if HTTP/2 is not
+    available locally, or if the server drops HTTP/2 connections but
+    answers the same request over HTTP/1.1 before HTTP/2 ever worked.
+    """
+    if endpoint.http2:
+        transport = http2_transport()
+        if transport is not None:
+            copy_stats.record('send', transport.name, transport.BODY_COPIES)
+            try:
+                content = transport.post(endpoint.url, body, headers, connect_timeout, read_timeout)
+            except TransportError as e:
+                if endpoint.url in _http2_confirmed or e.timed_out or not e.connection_failed:
+                    raise
+                transport = http1_transport()
+                copy_stats.record('send', transport.name, transport.BODY_COPIES)
+                content = transport.post(endpoint.url, body, headers, connect_timeout, read_timeout)
+                logger.warning(f"{endpoint.url} does not accept HTTP/2, falling back to HTTP/1.1: {str(e)}")
+                endpoint.http2 = False
+                return content
+            _http2_confirmed.add(endpoint.url)
+            return content
+        endpoint.http2 = False
+    transport = http1_transport()
+    copy_stats.record('send', transport.name, transport.BODY_COPIES)
+    return transport.post(endpoint.url, body, headers, connect_timeout, read_timeout)
@@ -0,0 +1,213 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+from PyQt6.QtCore import QObject, pyqtSignal
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+# EXIF orientations that swap width and height when displayed
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """Identify an image format from its first bytes."""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'JPEG'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'PNG'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+class ImageInfo:
+    """Header-level metadata of an image file."""
+    
+    def __init__(self, path: str, width: int, height: int, format: str,
+                 orientation: int = 1, file_size: int = 0):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.format = format
+        self.orientation = orientation
+        self.file_size = file_size
+    
+    @property
+    def megapixels(self) -> float:
+        return self.width * self.height / 1e6
+    
+    @property
+    def display_size(self) -> tuple:
+        """(width, height) after applying the EXIF orientation."""
+        if self.orientation in TRANSPOSED_ORIENTATIONS:
+            return self.height, self.width
+        return self.width, self.height
+
+
+def probe_image(path: str) -> Optional[ImageInfo]:
+    """
+    Read format, dimensions and orientation from the file header only.
+    
+    Returns:
+        ImageInfo, or None if the file is not a supported image
+    """
+    from PIL import Image
+    
+    try:
+        with open(path, 'rb') as f:
+            image_format = sniff_format(f.read(12))
+            if image_format is None:
+                return None
+            f.seek(0)
+            # Image.open only parses headers; pixel data is never decoded here
+            with Image.open(f) as img:
+                width, height = img.size
+                orientation = 1
+                if image_format in ('JPEG', 'WEBP'):
+                    orientation = img.getexif().get(0x0112, 1)
+            file_size = os.fstat(f.fileno()).st_size
+        return ImageInfo(path, width, height, image_format, orientation, file_size)
+    except Exception as e:
+        logger.warning(f"Failed to probe {path}: {str(e)}")
+        return None
+
+
+def iter_image_files(root: str) -> Iterator[str]:
+    """Walk a directory tree with os.scandir, yielding image files as found."""
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot scan {directory}: {str(e)}")
+            continue
+        
+        subdirectories = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield entry.path
+            except OSError:
+                continue
+        # Reversed so directories are visited in name order
+        pending.extend(reversed(subdirectories))
+
+
+class ImageMetadataStore:
+    """Thread-safe map of probed image metadata, shared across the app."""
+    
+    def __init__(self):
+        self._infos: Dict[str, ImageInfo] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, path: str) -> Optional[ImageInfo]:
+        with self._lock:
+            return self._infos.get(path)
+    
+    def put(self, info: ImageInfo):
+        with self._lock:
+            self._infos[info.path] = info
+    
+    def clear(self):
+        with self._lock:
+            self._infos.clear()
+
+
+# Metadata probed at import time, reused by the scheduler and encode stage
+metadata_store = ImageMetadataStore()
+
+
+class ImageImporter(QObject):
+    """
+    Scans a folder (or takes a list of files) and probes headers in parallel.
+    
+    Paths are reported in batches as soon as they have been validated, so
+    the image list fills in while a large tree is still being scanned.
+    """
+    
+    # Signals
+    images_found = pyqtSignal(list)  # batch of image paths
+    finished = pyqtSignal(int)  # number of images found
+    
+    CHUNK_SIZE = 64
+    
+    def __init__(self, root: Optional[str] = None, paths: Optional[List[str]] = None,
+                 store: ImageMetadataStore = metadata_store, max_workers: int = 8):
+        super().__init__()
+        self.root = root
+        self.paths = paths
+        self.store = store
+        self.max_workers = max_workers
+        self._cancelled = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """Start scanning on a background thread."""
+        self._thread = threading.Thread(target=self._run, name='ImageImporter', daemon=True)
+        self._thread.start()
+    
+    def cancel(self):
+        """Stop scanning; batches already emitted stay valid."""
+        self._cancelled.set()
+    
+    def is_running(self) -> bool:
+        """Whether the scan (or probe) is still going."""
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _source(self) -> Iterable[str]:
+        if self.paths is not None:
+            return self.paths
+        return iter_image_files(self.root)
+    
+    def _chunks(self) -> Iterator[List[str]]:
+        chunk = []
+        for path in self._source():
+            chunk.append(path)
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def _probe_chunk(self, chunk: List[str]) -> List[str]:
+        found = []
+        for path in chunk:
+            if self._cancelled.is_set():
+                break
+            info = probe_image(path)
+            if info is not None:
+                self.store.put(info)
+                found.append(path)
+        return found
+    
+    def _run(self):
+        total = 0
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='Probe') as executor:
+            for chunk in self._chunks():
+                if self._cancelled.is_set():
+                    break
+                in_flight.append(executor.submit(self._probe_chunk, chunk))
+                # Bound read-ahead and emit in scan order
+                while len(in_flight) > self.max_workers * 2 or (in_flight and in_flight[0].done()):
+                    total += self._emit(in_flight.popleft().result())
+            
+            while in_flight:
+                total += self._emit(in_flight.popleft().result())
+        
+        logger.info(f"Import finished: {total} images")
+        self.finished.emit(total)
+    
+    def _emit(self, found: List[str]) -> int:
+        if found and not self._cancelled.is_set():
+            self.images_found.emit(found)
+        return len(found)
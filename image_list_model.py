@@ -0,0 +1,284 @@
+import os
+import bisect
+from array import array
+from collections import OrderedDict
+from itertools import accumulate, islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt6.QtGui import QColor, QIcon, QImage, QPixmap
+
+from thumbnail_cache import ThumbnailLoader
+
+
+class PathStore:
+    """
+    Compact, append-only sequence of file paths.
+    
+    Paths are kept UTF-8 encoded in one contiguous buffer with an offset
+    array, instead of one Python string object per image.
+    """
+    
+    def __init__(self, paths: Iterable[str] = ()):
+        self._blob = bytearray()
+        self._offsets = array('Q', [0])
+        self._rows_by_hash: Dict[int, int] = {}
+        self.extend(paths)
+    
+    def extend(self, paths: Iterable[str]):
+        """Append paths to the store."""
+        paths = list(paths)
+        first_row = len(self)
+        encoded = [path.encode('utf-8', 'surrogateescape') for path in paths]
+        base = self._offsets[-1]
+        self._blob += b''.join(encoded)
+        self._offsets.extend(islice(accumulate((len(item) for item in encoded), initial=base), 1, None))
+        self._rows_by_hash.update((hash(path), first_row + i) for i, path in enumerate(paths))
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def __getitem__(self, row: int) -> str:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return self._blob[self._offsets[row]:self._offsets[row + 1]].decode('utf-8', 'surrogateescape')
+    
+    def __iter__(self) -> Iterator[str]:
+        for row in range(len(self)):
+            yield self[row]
+    
+    def __bool__(self) -> bool:
+        return len(self) > 0
+    
+    def index(self, path: str) -> int:
+        """Find the row of a path (raises ValueError if absent)."""
+        row = self._rows_by_hash.get(hash(path))
+        if row is not None and self[row] == path:
+            return row
+        # Hash collision between two paths: fall back to a scan
+        for row in range(len(self)):
+            if self[row] == path:
+                return row
+        raise ValueError(path)
+    
+    def nbytes(self) -> int:
+        """Approximate memory used by the path data and offsets."""
+        return len(self._blob) + self._offsets.itemsize * len(self._offsets)
+
+
+class ImageListModel(QAbstractListModel):
+    """List model over a PathStore with a processing status per row."""
+    
+    STATUS_PENDING = 0
+    STATUS_RUNNING = 1
+    STATUS_DONE = 2
+    STATUS_FAILED = 3
+    
+    STATUS_NAMES = {
+        STATUS_PENDING: '待处理',
+        STATUS_RUNNING: '处理中',
+        STATUS_DONE: '已完成',
+        STATUS_FAILED: '失败'
+    }
+    STATUS_COLORS = {
+        STATUS_RUNNING: QColor('#1565c0'),
+        STATUS_DONE: QColor('#2e7d32'),
+        STATUS_FAILED: QColor('#c62828')
+    }
+    
+    PathRole = Qt.ItemDataRole.UserRole
+    StatusRole = Qt.ItemDataRole.UserRole + 1
+    
+    # Thumbnails kept as icons; older ones are reloaded from the disk cache
+    MAX_THUMBNAIL_ICONS = 2000
+    
+    def __init__(self, thumbnail_loader: Optional[ThumbnailLoader] = None,
+                 placeholder_icon: Optional[QIcon] = None, parent=None):
+        super().__init__(parent)
+        self.paths = PathStore()
+        self._statuses = bytearray()
+        self._visible_rows: Optional[array] = None  # None means no filter
+        self._status_filter: Optional[int] = None
+        self._thumbnail_loader = thumbnail_loader
+        self._placeholder_icon = placeholder_icon
+        self._icons: 'OrderedDict[int, QIcon]' = OrderedDict()
+        
+        if self._thumbnail_loader is not None:
+            self._thumbnail_loader.thumbnail_ready.connect(self._on_thumbnail_ready)
+    
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        if self._visible_rows is not None:
+            return len(self._visible_rows)
+        return len(self.paths)
+    
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.source_row(index.row())
+        if row is None:
+            return None
+        
+        if role == Qt.ItemDataRole.DisplayRole:
+            return os.path.basename(self.paths[row])
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._thumbnail_icon(row)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{self.paths[row]}\n{self.STATUS_NAMES[self._statuses[row]]}"
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return self.STATUS_COLORS.get(self._statuses[row])
+        if role == self.PathRole:
+            return self.paths[row]
+        if role == self.StatusRole:
+            return self._statuses[row]
+        return None
+    
+    def set_paths(self, paths: Iterable[str]):
+        """Replace all paths; every row starts as pending."""
+        self.beginResetModel()
+        if self._thumbnail_loader is not None:
+            self._thumbnail_loader.cancel_pending()
+        self.paths = PathStore(paths)
+        self._statuses = bytearray(len(self.paths))
+        self._icons.clear()
+        self._rebuild_filter()
+        self.endResetModel()
+    
+    def append_paths(self, paths: List[str]):
+        """Add paths at the end, e.g. while a folder scan is still running."""
+        if not paths:
+            return
+        first_row = len(self.paths)
+        if self._visible_rows is None:
+            self.beginInsertRows(QModelIndex(), first_row, first_row + len(paths) - 1)
+        self.paths.extend(paths)
+        self._statuses.extend(bytes(len(paths)))
+        if self._visible_rows is None:
+            self.endInsertRows()
+        elif self._status_filter == self.STATUS_PENDING:
+            view_row = len(self._visible_rows)
+            self.beginInsertRows(QModelIndex(), view_row, view_row + len(paths) - 1)
+            self._visible_rows.extend(range(first_row, first_row + len(paths)))
+            self.endInsertRows()
+    
+    def source_row(self, view_row: int) -> Optional[int]:
+        """Map a row in the (possibly filtered) view to a PathStore row."""
+        if self._visible_rows is not None:
+            if 0 <= view_row < len(self._visible_rows):
+                return self._visible_rows[view_row]
+            return None
+        return view_row if 0 <= view_row < len(self.paths) else None
+    
+    def view_row(self, row: int) -> Optional[int]:
+        """Map a PathStore row to its row in the view, if visible."""
+        if self._visible_rows is None:
+            return row
+        position = bisect.bisect_left(self._visible_rows, row)
+        if position < len(self._visible_rows) and self._visible_rows[position] == row:
+            return position
+        return None
+    
+    def path_at(self, view_row: int) -> Optional[str]:
+        """Get the path shown at a view row."""
+        row = self.source_row(view_row)
+        return None if row is None else self.paths[row]
+    
+    def status_of(self, image_path: str) -> Optional[int]:
+        """Processing status of one image, None if it is not in the list."""
+        try:
+            return self._statuses[self.paths.index(image_path)]
+        except ValueError:
+            return None
+    
+    def set_status(self, image_path: str, status: int):
+        """Update the processing status of one image in place."""
+        try:
+            row = self.paths.index(image_path)
+        except ValueError:
+            return
+        self.set_row_status(row, status)
+    
+    def set_row_status(self, row: int, status: int):
+        """Update the processing status of one PathStore row in place."""
+        if self._statuses[row] == status:
+            return
+        self._statuses[row] = status
+        
+        if self._visible_rows is None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+            return
+        
+        view_row = self.view_row(row)
+        if view_row is not None and status != self._status_filter:
+            self.beginRemoveRows(QModelIndex(), view_row, view_row)
+            del self._visible_rows[view_row]
+            self.endRemoveRows()
+        elif view_row is None and status == self._status_filter:
+            position = bisect.bisect_left(self._visible_rows, row)
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._visible_rows.insert(position, row)
+            self.endInsertRows()
+    
+    def reset_statuses(self):
+        """Mark every image as pending again."""
+        if self._visible_rows is None:
+            # Keep the view (and its current selection) intact
+            self._statuses = bytearray(len(self.paths))
+            if len(self.paths):
+                self.dataChanged.emit(self.index(0), self.index(len(self.paths) - 1))
+            return
+        self.beginResetModel()
+        self._statuses = bytearray(len(self.paths))
+        self._rebuild_filter()
+        self.endResetModel()
+    
+    def status_counts(self) -> Dict[int, int]:
+        """Number of images per status."""
+        return {status: self._statuses.count(status) for status in self.STATUS_NAMES}
+    
+    def set_status_filter(self, status: Optional[int]):
+        """Show only rows with the given status, or all rows for None."""
+        self.beginResetModel()
+        self._status_filter = status
+        self._rebuild_filter()
+        self.endResetModel()
+    
+    def _rebuild_filter(self):
+        if self._status_filter is None:
+            self._visible_rows = None
+            return
+        statuses = self._statuses
+        marker = bytes([self._status_filter])
+        rows = array('Q')
+        position = statuses.find(marker)
+        while position != -1:
+            rows.append(position)
+            position = statuses.find(marker, position + 1)
+        self._visible_rows = rows
+    
+    def _thumbnail_icon(self, row: int) -> Optional[QIcon]:
+        icon = self._icons.get(row)
+        if icon is not None:
+            self._icons.move_to_end(row)
+            return icon
+        if self._thumbnail_loader is not None:
+            # Only rows being painted ask for data, so this stays lazy
+            self._thumbnail_loader.request(self.paths[row])
+        return self._placeholder_icon
+    
+    def _on_thumbnail_ready(self, image_path: str, thumbnail: QImage):
+        try:
+            row = self.paths.index(image_path)
+        except ValueError:
+            return
+        self._icons[row] = QIcon(QPixmap.fromImage(thumbnail))
+        while len(self._icons) > self.MAX_THUMBNAIL_ICONS:
+            self._icons.popitem(last=False)
+        
+        view_row = self.view_row(row)
+        if view_row is not None:
+            index = self.index(view_row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
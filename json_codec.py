@@ -0,0 +1,76 @@
+import re
+import json
+from typing import Any, Dict, Optional, Union
+
+from buffers import BufferChain
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Request and response bodies carry one image as a multi-megabyte base64
+# string next to a few small fields. The image buffer becomes part of the
+# request body as it is and is sliced out of the response body as raw
+# bytes; only the small fields go through a JSON serializer.
+
+_BODY_HEAD = b'{"image":"'
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_body(image_base64: bytes, fields: Dict[str, Any]) -> BufferChain:
+    """
+    Build {"image": image_base64, **fields} as a JSON body.
+    
+    The base64 alphabet needs no escaping in JSON, so the image buffer is
+    sent as it is: neither serialized as a string nor copied.
+    """
+    rest = dumps(fields)
+    tail = b'"}' if rest == b'{}' else b'",' + rest[1:]
+    return BufferChain((_BODY_HEAD, image_base64, tail))
+
+
+def extract_string(data: bytes, key: str) -> Optional[memoryview]:
+    """
+    Find a string field of a JSON object by scanning for its key.
+    
+    Meant for flat objects with one huge value, such as a response image:
+    nothing is parsed or copied.
+    
+    Returns:
+        A view of the value's raw bytes, or None if the key is not there or
+        the value contains escapes (parse the whole body instead)
+    """
+    match = _string_field(key).search(data)
+    if match is None:
+        return None
+    start = match.end()
+    end = data.find(b'"', start)
+    if end == -1 or data.find(b'\\', start, end) != -1:
+        return None
+    return memoryview(data)[start:end]
+
+
+_field_patterns: Dict[str, re.Pattern] = {}
+
+
+def _string_field(key: str) -> re.Pattern:
+    pattern = _field_patterns.get(key)
+    if pattern is None:
+        # Not preceded by a backslash, i.e. not inside another string
+        pattern = re.compile(rb'(?<!\\)"' + re.escape(key.encode('utf-8')) + rb'"\s*:\s*"')
+        _field_patterns[key] = pattern
+    return pattern
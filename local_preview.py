@@ -0,0 +1,116 @@
+from typing import Optional, Tuple
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage
+import logging
+
+# numpy is imported where used (and preloaded in the background), so that
+# importing this module does not slow down application startup
+
+logger = logging.getLogger(__name__)
+
+# Longest side, in pixels, of the copy previews are rendered on
+PREVIEW_MAX_DIMENSION = 512
+
+# Centre and half-widths of skin tones in the Cb/Cr plane (0-1 scale)
+SKIN_CB, SKIN_CB_RANGE = 0.40, 0.10
+SKIN_CR, SKIN_CR_RANGE = 0.60, 0.08
+
+
+def _box_mean(values, radius: int):
+    """Mean over a (2 * radius + 1)² window around every pixel, one axis at a time."""
+    import numpy as np
+    
+    size = 2 * radius + 1
+    padded = np.pad(values, ((radius + 1, radius), (radius + 1, radius), (0, 0)), mode='edge')
+    # Running sums restart for each axis, which keeps them small enough for float32
+    sums = padded.cumsum(axis=1, dtype=np.float32)
+    rows = sums[:, size:] - sums[:, :-size]
+    sums = rows.cumsum(axis=0)
+    return (sums[size:] - sums[:-size]) * (1.0 / (size * size))
+
+
+def skin_mask(rgb):
+    """Soft (0-1) mask of skin-coloured pixels, from their chroma."""
+    import numpy as np
+    
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    cb = 0.5 - 0.1687 * r - 0.3313 * g + 0.5 * b
+    cr = 0.5 + 0.5 * r - 0.4187 * g - 0.0813 * b
+    distance = ((cb - SKIN_CB) / SKIN_CB_RANGE) ** 2 + ((cr - SKIN_CR) / SKIN_CR_RANGE) ** 2
+    return np.clip(1.0 - distance, 0.0, 1.0)[..., None]
+
+
+def smooth_skin(rgb, mask, smooth: float):
+    """
+    Edge-preserving smoothing (a self-guided filter), applied to skin.
+    
+    Flat areas such as skin are averaged over the window; edges, where the
+    local variance exceeds the threshold, are kept. The filter coefficients
+    vary slowly, so they are computed at half resolution and upsampled.
+    """
+    import numpy as np
+    
+    height, width = rgb.shape[:2]
+    radius = max(1, round(max(height, width) * 0.003 * (0.5 + smooth)))
+    threshold = (0.02 + 0.08 * smooth) ** 2
+    small = rgb[::2, ::2]
+    # Both statistics, then both coefficients, are averaged in one pass
+    moments = _box_mean(np.concatenate((small, small * small), axis=2), radius)
+    mean, variance = moments[..., :3], moments[..., 3:] - moments[..., :3] ** 2
+    gain = variance / (variance + threshold)
+    coefficients = _box_mean(np.concatenate((gain, mean - gain * mean), axis=2), radius)
+    coefficients = coefficients.repeat(2, axis=0).repeat(2, axis=1)[:height, :width]
+    smoothed = coefficients[..., :3] * rgb + coefficients[..., 3:]
+    return rgb + smooth * mask * (smoothed - rgb)
+
+
+def whiten_skin(rgb, mask, whiten: float):
+    """Lift midtones with a log curve, fully on skin and lightly elsewhere."""
+    import numpy as np
+    
+    beta = 1.0 + 4.0 * whiten
+    lifted = np.log1p(rgb * (beta - 1.0)) / np.log(beta)
+    return rgb + (0.35 + 0.65 * mask) * (lifted - rgb)
+
+
+class LocalPreview:
+    """
+    Approximates Doubao retouching of one image on a downscaled copy, so
+    that smooth and whiten can be tuned without calling the API.
+    
+    The copy is converted once; each render takes a few tens of
+    milliseconds at PREVIEW_MAX_DIMENSION. Results only resemble the API's.
+    """
+    
+    def __init__(self, image: QImage, max_dimension: int = PREVIEW_MAX_DIMENSION):
+        import numpy as np
+        
+        if max(image.width(), image.height()) > max_dimension:
+            image = image.scaled(max_dimension, max_dimension, Qt.AspectRatioMode.KeepAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+        image = image.convertToFormat(QImage.Format.Format_RGB888)
+        width, height = image.width(), image.height()
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        # Rows are padded to 32 bits
+        rows = np.frombuffer(bits, np.uint8).reshape(height, image.bytesPerLine())
+        self._rgb = rows[:, :width * 3].reshape(height, width, 3).astype(np.float32) / 255.0
+        self._mask = skin_mask(self._rgb)
+        # The smoothing pass of the last render, reused while only whiten changes
+        self._smoothed: Optional[Tuple[float, object]] = None
+    
+    def render(self, smooth: float, whiten: float) -> QImage:
+        """The preview for these parameters (0-1 each)."""
+        import numpy as np
+        
+        if self._smoothed is None or self._smoothed[0] != smooth:
+            smoothed = smooth_skin(self._rgb, self._mask, smooth) if smooth > 0 else self._rgb
+            self._smoothed = (smooth, smoothed)
+        rgb = self._smoothed[1]
+        if whiten > 0:
+            rgb = whiten_skin(rgb, self._mask, whiten)
+        
+        pixels = np.ascontiguousarray(np.clip(rgb * 255.0 + 0.5, 0, 255).astype(np.uint8))
+        height, width = pixels.shape[:2]
+        # Copied, so the image does not point into the array
+        return QImage(pixels.data, width, height, width * 3, QImage.Format.Format_RGB888).copy()
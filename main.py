@@ -1,3 +1,5 @@
+from startup import startup_timer  # first, so startup timings include all imports
+import os
 import sys
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import Qt
@@ -5,6 +7,9 @@ import logging
 
 from config_manager import ConfigManager
 from ui_components import MainWindow
+import tracing
+
+startup_timer.mark('imports')
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,6 +20,11 @@ logger = logging.getLogger(__name__)
 
 def main():
     """Main entry point for the AI Batch Image Editor."""
+    # Opt-in timeline tracing (AIXIUTU_TRACE / AIXIUTU_PROFILE_WINDOW)
+    tracing.configure_from_env()
+    # Opt-in startup timings (AIXIUTU_STARTUP_TIMING)
+    startup_timer.configure_from_env()
+    
     # Create QApplication
     app = QApplication(sys.argv)
     app.setApplicationName('AI 批量图片修改工具')
@@ -25,11 +35,17 @@ def main():
         Qt.HighDpiScaleFactorRoundingPolicy.PassThrough
     )
     
+    startup_timer.mark('app_created')
+    
     # Initialize configuration manager
     config_manager = ConfigManager()
     
     # Create and show main window
     window = MainWindow(config_manager)
+    window.startup_finished.connect(startup_timer.report)
+    if os.getenv('AIXIUTU_EXIT_AFTER_STARTUP'):
+        # Used by benchmark.py to time startup
+        window.startup_finished.connect(app.quit)
     window.show()
     
     logger.info('Application started')
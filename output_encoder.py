@@ -0,0 +1,179 @@
+import os
+import mmap
+import shutil
+import threading
+from io import BytesIO
+from concurrent.futures import Future
+from typing import Optional
+import logging
+
+from buffers import copy_stats, remove_handoff, write_handoff
+
+logger = logging.getLogger(__name__)
+
+# Output format key -> (PIL format name, file extension)
+OUTPUT_FORMATS = {
+    'png': ('PNG', '.png'),
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp')
+}
+
+# Magic bytes -> format key, used to decide whether transcoding is needed
+_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+)
+
+
+def detect_format(data: bytes) -> Optional[str]:
+    """Get the OUTPUT_FORMATS key of encoded image bytes, if recognised."""
+    for signature, key in _SIGNATURES:
+        if data.startswith(signature):
+            return key
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def atomic_write(path: str, data: bytes):
+    """Write a file via a temp file and rename, so readers never see partial output."""
+    # Unique per process and thread; created with open() so the umask applies
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_copy(source_path: str, path: str):
+    """Copy a finished output file to another path, atomically."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def transcode(data, output_format: str, quality: int) -> bytes:
+    """Re-encode image bytes (or a readable file such as an mmap) into another format."""
+    from PIL import Image
+    
+    pil_format = OUTPUT_FORMATS[output_format][0]
+    with Image.open(data if hasattr(data, 'read') else BytesIO(data)) as img:
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            # JPEG has no alpha: flatten onto white
+            rgba = img.convert('RGBA')
+            flattened = Image.new('RGB', rgba.size, (255, 255, 255))
+            flattened.paste(rgba, mask=rgba.getchannel('A'))
+            img = flattened
+        buffer = BytesIO()
+        if pil_format == 'PNG':
+            img.save(buffer, format=pil_format, optimize=False)
+        else:
+            img.save(buffer, format=pil_format, quality=quality)
+        return buffer.getvalue()
+
+
+def transcode_and_write(handoff_path: str, output_path: str, output_format: str, quality: int) -> str:
+    """
+    Process pool entry point: transcode a result handed over in a file and
+    write it, without shipping bytes back.
+    
+    The file is memory-mapped, so the decoder reads the parent's copy.
+    """
+    with open(handoff_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        atomic_write(output_path, transcode(data, output_format, quality))
+    return output_path
+
+
+class OutputEncoder:
+    """
+    Output stage: optionally transcodes API results and writes them atomically.
+    
+    Transcoding runs on a process pool so that CPU-heavy encoding does not
+    compete with the network worker threads for the GIL. Results reach the
+    pool through memory-mapped files rather than being pickled.
+    """
+    
+    def __init__(self, output_format: Optional[str] = 'png', quality: int = 90,
+                 max_processes: Optional[int] = None):
+        """
+        Args:
+            output_format: Key of OUTPUT_FORMATS, or None to keep whatever the API returned
+            quality: JPEG/WebP quality (1-100)
+            max_processes: Size of the transcoding pool (default: half the CPUs)
+        """
+        if output_format is not None and output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.output_format = output_format
+        self.quality = quality
+        self.max_processes = max_processes or max(1, (os.cpu_count() or 2) // 2)
+        self._executor = None  # ProcessPoolExecutor, created on first transcode
+        self._lock = threading.Lock()
+    
+    def target_format(self, data: bytes) -> str:
+        """Format the output file will have."""
+        return self.output_format or detect_format(data) or 'png'
+    
+    def output_path_for(self, image_path: str, output_dir: str, data: bytes) -> str:
+        """Build '<name>_processed.<ext>' for an input image."""
+        base_name = os.path.splitext(os.path.basename(image_path))[0]
+        extension = OUTPUT_FORMATS[self.target_format(data)][1]
+        return os.path.join(output_dir, f"{base_name}_processed{extension}")
+    
+    def needs_transcode(self, data: bytes) -> bool:
+        """Whether the bytes have to be re-encoded to match the target format."""
+        return detect_format(data) != self.target_format(data)
+    
+    def write(self, data: bytes, output_path: str) -> Optional[Future]:
+        """
+        Write a result, transcoding it first if needed.
+        
+        Returns:
+            None if the file was written synchronously (pass-through), or a
+            Future that resolves once the process pool has written it
+        """
+        if not self.needs_transcode(data):
+            atomic_write(output_path, data)
+            return None
+        
+        with self._lock:
+            if self._executor is None:
+                # Imported here: multiprocessing is only needed once transcoding starts
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Spawned, not forked: a fork of this multi-threaded (Qt) process
+                # may inherit locks held by other threads and deadlock
+                self._executor = ProcessPoolExecutor(max_workers=self.max_processes,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            executor = self._executor
+        handoff_path = write_handoff(data)
+        copy_stats.record('handoff', 'transcoder', 1)
+        try:
+            future = executor.submit(
+                transcode_and_write, handoff_path, output_path, self.target_format(data), self.quality
+            )
+        except BaseException:
+            remove_handoff(handoff_path)
+            raise
+        # Freed as soon as the transcoder is done with it, whatever the outcome
+        future.add_done_callback(lambda _: remove_handoff(handoff_path))
+        return future
+    
+    def shutdown(self):
+        """Release the process pool once no more results are expected."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,145 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from PyQt6.QtCore import QObject, pyqtSignal, Qt, QSize
+from PyQt6.QtGui import QImage
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CachedImage:
+    """A decoded image plus progressively halved copies of it."""
+    
+    # Stop building levels once the image is this small
+    MIN_LEVEL_DIMENSION = 256
+    
+    def __init__(self, image: QImage, full_resolution: bool = False):
+        self.full_resolution = full_resolution
+        self.levels: List[QImage] = [image]
+        level = image
+        while min(level.width(), level.height()) // 2 >= self.MIN_LEVEL_DIMENSION:
+            level = level.scaled(
+                level.width() // 2, level.height() // 2,
+                Qt.AspectRatioMode.IgnoreAspectRatio,
+                Qt.TransformationMode.SmoothTransformation
+            )
+            self.levels.append(level)
+        self.nbytes = sum(level.sizeInBytes() for level in self.levels)
+    
+    @property
+    def size(self) -> QSize:
+        """Size of the largest cached level."""
+        return self.levels[0].size()
+    
+    def covers(self, target: QSize) -> bool:
+        """Whether the cached image has enough pixels to fill the target size."""
+        if self.full_resolution:
+            return True
+        fitted = self.levels[0].size().scaled(target, Qt.AspectRatioMode.KeepAspectRatio)
+        return self.levels[0].width() >= fitted.width() and self.levels[0].height() >= fitted.height()
+    
+    def level_for(self, target: QSize) -> QImage:
+        """Get the smallest level that still covers the target size."""
+        fitted = self.levels[0].size().scaled(target, Qt.AspectRatioMode.KeepAspectRatio)
+        best = self.levels[0]
+        for level in self.levels[1:]:
+            if level.width() < fitted.width() or level.height() < fitted.height():
+                break
+            best = level
+        return best
+    
+    def scaled_to(self, target: QSize, smooth: bool = True) -> QImage:
+        """Scale to fit the target size, starting from the closest level."""
+        mode = (Qt.TransformationMode.SmoothTransformation if smooth
+                else Qt.TransformationMode.FastTransformation)
+        return self.level_for(target).scaled(target, Qt.AspectRatioMode.KeepAspectRatio, mode)
+
+
+class PreviewCache(QObject):
+    """LRU cache of decoded preview images, bounded by total memory."""
+    
+    # Signals
+    usage_changed = pyqtSignal(int, int)  # (used_bytes, max_bytes)
+    
+    # Larger images are shrunk before caching; previews never need more
+    MAX_CACHED_DIMENSION = 4096
+    
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, CachedImage]' = OrderedDict()
+        self._used_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[CachedImage]:
+        """Look up an entry and mark it most recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: str, image: QImage, full_resolution: bool = False) -> CachedImage:
+        """
+        Cache a decoded image, evicting least recently used entries as needed.
+        
+        Returns:
+            The cache entry (also returned when it is too large to be kept)
+        """
+        if max(image.width(), image.height()) > self.MAX_CACHED_DIMENSION:
+            image = image.scaled(
+                self.MAX_CACHED_DIMENSION, self.MAX_CACHED_DIMENSION,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation
+            )
+            full_resolution = True
+        entry = CachedImage(image, full_resolution)
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._used_bytes -= old.nbytes
+            if entry.nbytes <= self.max_bytes:
+                self._entries[key] = entry
+                self._used_bytes += entry.nbytes
+                while self._used_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._used_bytes -= evicted.nbytes
+                    self.evictions += 1
+            used = self._used_bytes
+        
+        self.usage_changed.emit(used, self.max_bytes)
+        return entry
+    
+    def remove(self, key: str):
+        """Drop an entry, e.g. when the file on disk has been rewritten."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            self._used_bytes -= entry.nbytes
+            used = self._used_bytes
+        self.usage_changed.emit(used, self.max_bytes)
+    
+    def memory_usage(self) -> int:
+        """Total bytes held by cached images."""
+        return self._used_bytes
+    
+    def stats(self) -> Dict[str, int]:
+        """Get cache counters for display and logging."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'used_bytes': self._used_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,103 @@
+import itertools
+import threading
+from queue import PriorityQueue, Empty
+from typing import Dict, List
+from PyQt6.QtCore import QObject, pyqtSignal, QSize
+from PyQt6.QtGui import QImage, QImageReader
+import logging
+
+from thumbnail_cache import read_scaled_image
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewLoader(QObject):
+    """
+    Decodes preview images on background threads.
+    
+    Requests are grouped by slot (e.g. 'original', 'processed', 'prefetch').
+    A new request for a slot supersedes everything still queued for it, so
+    quickly moving through the image list only decodes what is shown last.
+    """
+    
+    # Signals
+    image_loaded = pyqtSignal(str, str, QImage, bool)  # (slot, image_path, image, full_resolution)
+    load_failed = pyqtSignal(str, str)  # (slot, image_path)
+    
+    PRIORITY_DISPLAY = 0
+    PRIORITY_PREFETCH = 1
+    
+    def __init__(self, max_workers: int = 2):
+        super().__init__()
+        self.max_workers = max_workers
+        self._queue = PriorityQueue()
+        self._sequence = itertools.count()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._threads_started = False
+    
+    def request(self, slot: str, image_path: str, target_size: QSize):
+        """Decode one image for display, cancelling older requests for the slot."""
+        self.request_many(slot, [image_path], target_size, self.PRIORITY_DISPLAY)
+    
+    def prefetch(self, image_paths: List[str], target_size: QSize):
+        """Decode images likely to be shown next, behind any display requests."""
+        self.request_many('prefetch', image_paths, target_size, self.PRIORITY_PREFETCH)
+    
+    def request_many(self, slot: str, image_paths: List[str], target_size: QSize, priority: int):
+        """Queue several images under one slot generation."""
+        with self._lock:
+            generation = self._generations.get(slot, 0) + 1
+            self._generations[slot] = generation
+        
+        self._ensure_threads()
+        for image_path in image_paths:
+            self._queue.put((priority, next(self._sequence), slot, generation,
+                             image_path, QSize(target_size)))
+    
+    def cancel(self, slot: str):
+        """Drop queued requests for a slot."""
+        with self._lock:
+            self._generations[slot] = self._generations.get(slot, 0) + 1
+    
+    def _is_current(self, slot: str, generation: int) -> bool:
+        with self._lock:
+            return self._generations.get(slot) == generation
+    
+    def _ensure_threads(self):
+        if self._threads_started:
+            return
+        self._threads_started = True
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'Preview-{i + 1}', daemon=True)
+            thread.start()
+    
+    def _worker_loop(self):
+        """Preview decoder main loop."""
+        while True:
+            try:
+                _, _, slot, generation, image_path, target_size = self._queue.get(timeout=1.0)
+            except Empty:
+                continue
+            
+            if not self._is_current(slot, generation):
+                continue
+            
+            try:
+                original_size = QImageReader(image_path).size()
+                image = read_scaled_image(image_path, target_size)
+            except Exception as e:
+                logger.warning(f"Preview decode failed for {image_path}: {str(e)}")
+                image = QImage()
+            
+            if not self._is_current(slot, generation):
+                continue
+            
+            if image.isNull():
+                self.load_failed.emit(slot, image_path)
+                continue
+            
+            full_resolution = (not original_size.isValid()
+                               or (original_size.width() <= target_size.width()
+                                   and original_size.height() <= target_size.height()))
+            self.image_loaded.emit(slot, image_path, image, full_resolution)
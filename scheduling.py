@@ -0,0 +1,154 @@
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Policy key -> UI name
+SCHEDULING_POLICIES = {
+    'fifo': '按导入顺序',
+    'sjf': '小图优先（尽快看到结果）',
+    'ljf': '大图优先（总耗时最短）'
+}
+
+# Rough megapixels per byte of a compressed photo, used when an image was not probed
+MEGAPIXELS_PER_BYTE = 1 / 300_000
+
+# Assumed request time before any has been observed: seconds = overhead + rate * megapixels
+PRIOR_OVERHEAD = 1.0
+PRIOR_SECONDS_PER_MEGAPIXEL = 2.0
+
+
+def estimate_megapixels(image_path: str, image_info=None, tile=None) -> float:
+    """Size of the work a task sends, in megapixels."""
+    if tile is not None:
+        return tile.width * tile.height / 1e6
+    if image_info is not None:
+        return image_info.megapixels
+    try:
+        return os.path.getsize(image_path) * MEGAPIXELS_PER_BYTE
+    except OSError:
+        return 1.0
+
+
+class _LinearFit:
+    """
+    Fit of seconds = overhead + rate * megapixels from observed requests.
+    
+    Until the observed sizes vary enough for a least-squares fit, the prior
+    line is scaled to match the mean observation instead.
+    """
+    
+    # Minimum spread (standard deviation) of observed megapixels for a full fit
+    MIN_SPREAD = 0.1
+    
+    def __init__(self):
+        self.n = 0
+        self.sum_x = self.sum_y = self.sum_xx = self.sum_xy = 0.0
+    
+    def add(self, x: float, y: float):
+        self.n += 1
+        self.sum_x += x
+        self.sum_y += y
+        self.sum_xx += x * x
+        self.sum_xy += x * y
+    
+    def coefficients(self) -> Tuple[float, float]:
+        if not self.n:
+            return PRIOR_OVERHEAD, PRIOR_SECONDS_PER_MEGAPIXEL
+        mean_x, mean_y = self.sum_x / self.n, self.sum_y / self.n
+        variance = self.sum_xx / self.n - mean_x ** 2
+        if variance < self.MIN_SPREAD ** 2:
+            scale = mean_y / (PRIOR_OVERHEAD + PRIOR_SECONDS_PER_MEGAPIXEL * mean_x)
+            return PRIOR_OVERHEAD * scale, PRIOR_SECONDS_PER_MEGAPIXEL * scale
+        rate = max(0.0, (self.sum_xy / self.n - mean_x * mean_y) / variance)
+        overhead = max(0.0, mean_y - rate * mean_x)
+        return overhead, rate
+
+
+class CostModel:
+    """
+    Estimates request time per model from the megapixels sent.
+    
+    Starts from a prior and is refined with every completed request, so
+    both the queue order of new tasks and the remaining-time estimate
+    follow the latency actually observed during the run.
+    """
+    
+    def __init__(self):
+        self._fits: Dict[str, _LinearFit] = {}
+        self._lock = threading.Lock()
+    
+    def estimate(self, model_type: str, megapixels: float) -> float:
+        """Expected seconds for one request."""
+        with self._lock:
+            fit = self._fits.get(model_type) or _LinearFit()
+            overhead, rate = fit.coefficients()
+        return overhead + rate * megapixels
+    
+    def observe(self, model_type: str, megapixels: float, seconds: float):
+        """Learn from a completed request."""
+        with self._lock:
+            self._fits.setdefault(model_type, _LinearFit()).add(megapixels, seconds)
+    
+    def describe(self) -> Dict[str, Tuple[float, float]]:
+        """(overhead seconds, seconds per megapixel) per observed model."""
+        with self._lock:
+            return {model_type: fit.coefficients() for model_type, fit in self._fits.items()}
+
+
+class RemainingWork:
+    """Requests still to be made, summed per model, for remaining-time estimates."""
+    
+    def __init__(self):
+        self._requests: Dict[str, int] = {}
+        self._megapixels: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, steps: Iterable[str], megapixels: float, count: int = 1):
+        """Add count requests per model in steps, sending megapixels in total."""
+        with self._lock:
+            for model_type in steps:
+                self._requests[model_type] = self._requests.get(model_type, 0) + count
+                self._megapixels[model_type] = self._megapixels.get(model_type, 0.0) + megapixels
+    
+    def remove(self, steps: Iterable[str], megapixels: float, count: int = 1):
+        self.add(steps, -megapixels, -count)
+    
+    @property
+    def model_types(self) -> List[str]:
+        """Models with requests still to be made."""
+        with self._lock:
+            return [model_type for model_type, count in self._requests.items() if count > 0]
+    
+    def eta(self, cost_model: CostModel, workers: Dict[str, int]) -> Optional[float]:
+        """
+        Seconds until all remaining requests are done, given each model's
+        number of parallel workers.
+        
+        Models run side by side on workers of their own, so the slowest
+        model's backlog decides.
+        """
+        with self._lock:
+            work = [(model_type, count, self._megapixels[model_type])
+                    for model_type, count in self._requests.items() if count > 0]
+        if not work:
+            return None
+        seconds = 0.0
+        for model_type, count, megapixels in work:
+            overhead = cost_model.estimate(model_type, 0.0)
+            per_megapixel = cost_model.estimate(model_type, 1.0) - overhead
+            model_seconds = overhead * count + per_megapixel * max(0.0, megapixels)
+            seconds = max(seconds, model_seconds / max(1, workers.get(model_type, 1)))
+        return seconds
+
+
+def format_duration(seconds: float) -> str:
+    """Short Chinese duration, e.g. '1分05秒'."""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f'{seconds // 3600}小时{seconds % 3600 // 60:02d}分'
+    if seconds >= 60:
+        return f'{seconds // 60}分{seconds % 60:02d}秒'
+    return f'{seconds}秒'
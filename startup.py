@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import threading
+import importlib
+from typing import Callable, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Imported as early as possible by main.py, so this is close to process start
+_ORIGIN = time.perf_counter()
+
+# Modules that are not needed to show the window, loaded once it is visible
+BACKGROUND_MODULES = ('requests', 'PIL.Image', 'numpy', 'worker_threads')
+
+
+class StartupTimer:
+    """
+    Records named milestones of application startup, relative to main.py's first import.
+    
+    Enabled with AIXIUTU_STARTUP_TIMING=1 (log the report) or
+    AIXIUTU_STARTUP_TIMING=<path.json> (also write it as JSON).
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.output_path: Optional[str] = None
+        self.marks: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+    
+    def configure_from_env(self):
+        value = os.getenv('AIXIUTU_STARTUP_TIMING', '')
+        self.enabled = bool(value)
+        self.output_path = value if value and value != '1' else None
+    
+    def mark(self, name: str):
+        """Record a milestone (always cheap; only reported when enabled)."""
+        with self._lock:
+            self.marks.append((name, time.perf_counter() - _ORIGIN))
+    
+    def elapsed(self, name: str) -> Optional[float]:
+        """Seconds from start to a milestone, if reached."""
+        with self._lock:
+            for mark_name, seconds in self.marks:
+                if mark_name == name:
+                    return seconds
+        return None
+    
+    def report(self):
+        """Log the milestones and write them to the output file, if set."""
+        if not self.enabled:
+            return
+        with self._lock:
+            marks = list(self.marks)
+        previous = 0.0
+        for name, seconds in marks:
+            logger.info(f"Startup {name}: {seconds * 1000:.1f} ms (+{(seconds - previous) * 1000:.1f} ms)")
+            previous = seconds
+        if self.output_path:
+            with open(self.output_path, 'w', encoding='utf-8') as f:
+                json.dump({name: seconds for name, seconds in marks}, f, indent=2)
+
+
+# Global startup timer
+startup_timer = StartupTimer()
+
+
+def preload_in_background(modules: Iterable[str] = BACKGROUND_MODULES,
+                          on_done: Optional[Callable[[], None]] = None) -> threading.Thread:
+    """Import heavy modules on a daemon thread, so the first batch does not wait for them."""
+    def run():
+        for name in modules:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.warning(f"Background import of {name} failed: {str(e)}")
+        startup_timer.mark('modules_loaded')
+        if on_done is not None:
+            on_done()
+    
+    thread = threading.Thread(target=run, name='Preload', daemon=True)
+    thread.start()
+    return thread
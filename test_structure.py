@@ -24,7 +24,25 @@ def main():
         'config_manager.py',
         'api_clients.py',
         'worker_threads.py',
-        'ui_components.py'
+        'ui_components.py',
+        'tracing.py',
+        'thumbnail_cache.py',
+        'preview_cache.py',
+        'preview_loader.py',
+        'image_list_model.py',
+        'image_import.py',
+        'output_encoder.py',
+        'tiling.py',
+        'dedup.py',
+        'endpoint_pool.py',
+        'scheduling.py',
+        'startup.py',
+        'benchmark.py',
+        'validation.py',
+        'http_transport.py',
+        'json_codec.py',
+        'buffers.py',
+        'local_preview.py'
     ]
     
     print("Checking Python file syntax...")
@@ -0,0 +1,167 @@
+import os
+import hashlib
+import threading
+from queue import LifoQueue, Empty
+from typing import Optional, Set
+from PyQt6.QtCore import QObject, pyqtSignal, Qt, QSize, QBuffer, QByteArray, QIODevice
+from PyQt6.QtGui import QImage, QImageReader
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'aixiutu', 'thumbnails')
+
+# Side, in pixels, of the thumbnails shown in the image list
+THUMBNAIL_SIZE = 48
+
+
+def read_scaled_image(image_path: str, max_size: QSize) -> QImage:
+    """
+    Decode an image directly at a reduced size.
+    
+    QImageReader scales during decoding where the format supports it
+    (e.g. JPEG DCT scaling), so a 50 MP photo never gets fully decoded.
+    
+    Returns:
+        The decoded image, or a null QImage on failure
+    """
+    return _read_scaled(QImageReader(image_path), max_size, image_path)
+
+
+def decode_scaled_image(data: bytes, max_size: QSize) -> QImage:
+    """Like read_scaled_image, for an encoded image held in memory."""
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    return _read_scaled(QImageReader(buffer), max_size, 'image data')
+
+
+def _read_scaled(reader: QImageReader, max_size: QSize, name: str) -> QImage:
+    reader.setAutoTransform(True)
+    original_size = reader.size()
+    if original_size.isValid() and (original_size.width() > max_size.width()
+                                    or original_size.height() > max_size.height()):
+        reader.setScaledSize(original_size.scaled(max_size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        logger.debug(f"Failed to decode {name}: {reader.errorString()}")
+    return image
+
+
+class ThumbnailCache:
+    """Persistent on-disk thumbnail cache keyed by path, mtime and file size."""
+    
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, thumbnail_size: int = THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir
+        self.thumbnail_size = thumbnail_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def cache_path(self, image_path: str) -> Optional[str]:
+        """Get the cache file for an image, or None if the image is unreadable."""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.thumbnail_size}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.png")
+    
+    def load(self, cache_path: str) -> Optional[QImage]:
+        """Load a cached thumbnail if present."""
+        if not os.path.exists(cache_path):
+            return None
+        image = QImage(cache_path)
+        return None if image.isNull() else image
+    
+    def store(self, cache_path: str, image: QImage):
+        """Write a thumbnail to the cache (atomically, safe across threads)."""
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        if image.save(temp_path, 'PNG'):
+            os.replace(temp_path, cache_path)
+    
+    def get_or_create(self, image_path: str) -> Optional[QImage]:
+        """Return a thumbnail from the cache, generating it on a miss."""
+        cache_path = self.cache_path(image_path)
+        if cache_path is None:
+            return None
+        
+        image = self.load(cache_path)
+        if image is not None:
+            return image
+        
+        image = read_scaled_image(image_path, QSize(self.thumbnail_size, self.thumbnail_size))
+        if image.isNull():
+            return None
+        try:
+            self.store(cache_path, image)
+        except OSError as e:
+            logger.warning(f"Failed to cache thumbnail for {image_path}: {str(e)}")
+        return image
+
+
+class ThumbnailLoader(QObject):
+    """Generates thumbnails on background threads, most recent request first."""
+    
+    # Signals
+    thumbnail_ready = pyqtSignal(str, QImage)  # (image_path, thumbnail)
+    
+    def __init__(self, cache: Optional[ThumbnailCache] = None, max_workers: int = 2):
+        super().__init__()
+        self.cache = cache or ThumbnailCache()
+        self.max_workers = max_workers
+        self._queue = LifoQueue()
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._threads_started = False
+    
+    def request(self, image_path: str):
+        """Queue a thumbnail; rows requested last (currently visible) load first."""
+        with self._lock:
+            if image_path in self._pending:
+                return
+            self._pending.add(image_path)
+            generation = self._generation
+        
+        self._ensure_threads()
+        self._queue.put((generation, image_path))
+    
+    def cancel_pending(self):
+        """Drop all queued requests, e.g. when the image list is replaced."""
+        with self._lock:
+            self._generation += 1
+            self._pending.clear()
+    
+    def _ensure_threads(self):
+        if self._threads_started:
+            return
+        self._threads_started = True
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'Thumbnail-{i + 1}', daemon=True)
+            thread.start()
+    
+    def _worker_loop(self):
+        """Thumbnail worker main loop."""
+        while True:
+            try:
+                generation, image_path = self._queue.get(timeout=1.0)
+            except Empty:
+                continue
+            
+            with self._lock:
+                if generation != self._generation:
+                    continue
+            
+            try:
+                image = self.cache.get_or_create(image_path)
+            except Exception as e:
+                logger.warning(f"Thumbnail generation failed for {image_path}: {str(e)}")
+                image = None
+            
+            with self._lock:
+                self._pending.discard(image_path)
+                stale = generation != self._generation
+            
+            if image is not None and not stale:
+                self.thumbnail_ready.emit(image_path, image)
@@ -0,0 +1,183 @@
+import math
+import threading
+from io import BytesIO
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default (tile_size, overlap) in pixels when a model has no configured value
+DEFAULT_TILE_SIZE = 2048
+DEFAULT_TILE_OVERLAP = 128
+
+
+class Tile:
+    """One rectangle of a tiled image, with the overlap shared with earlier tiles."""
+    
+    def __init__(self, index: int, x: int, y: int, width: int, height: int,
+                 blend_left: int = 0, blend_top: int = 0):
+        self.index = index
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.blend_left = blend_left  # overlap with the tile to the left
+        self.blend_top = blend_top  # overlap with the tile above
+    
+    @property
+    def box(self) -> tuple:
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+
+def _spans(length: int, tile_size: int, overlap: int) -> List[tuple]:
+    """Split one axis into evenly spread (start, end) spans that overlap."""
+    if length <= tile_size:
+        return [(0, length)]
+    count = math.ceil((length - overlap) / (tile_size - overlap))
+    stride = (length - tile_size) / (count - 1)
+    starts = [round(i * stride) for i in range(count)]
+    return [(start, start + tile_size) for start in starts]
+
+
+def plan_tiles(width: int, height: int, tile_size: int, overlap: int) -> List[Tile]:
+    """
+    Cover an image with overlapping tiles of at most tile_size pixels, in raster order.
+    
+    Tiles are spread evenly, so actual overlaps are at least the requested one.
+    """
+    overlap = max(0, min(overlap, tile_size // 2))
+    columns = _spans(width, tile_size, overlap)
+    rows = _spans(height, tile_size, overlap)
+    
+    tiles = []
+    for row, (top, bottom) in enumerate(rows):
+        for column, (left, right) in enumerate(columns):
+            blend_left = columns[column - 1][1] - left if column > 0 else 0
+            blend_top = rows[row - 1][1] - top if row > 0 else 0
+            tiles.append(Tile(len(tiles), left, top, right - left, bottom - top, blend_left, blend_top))
+    return tiles
+
+
+def needs_tiling(width: int, height: int, tile_size: int) -> bool:
+    """Whether an image is too large to be sent in one request."""
+    return max(width, height) > tile_size
+
+
+def feather_mask(tile: Tile):
+    """
+    Paste mask for a tile: ramps from 0 to 255 across the overlaps with the
+    tiles to the left and above (already on the canvas), opaque elsewhere.
+    """
+    from PIL import Image, ImageChops
+    
+    mask = Image.new('L', (tile.width, tile.height), 255)
+    if tile.blend_left:
+        ramp = bytes(int(255 * (i + 0.5) / tile.blend_left) for i in range(tile.blend_left))
+        row = Image.frombytes('L', (tile.width, 1), ramp + b'\xff' * (tile.width - tile.blend_left))
+        mask = ImageChops.multiply(mask, row.resize((tile.width, tile.height), Image.Resampling.NEAREST))
+    if tile.blend_top:
+        ramp = bytes(int(255 * (i + 0.5) / tile.blend_top) for i in range(tile.blend_top))
+        column = Image.frombytes('L', (1, tile.height), ramp + b'\xff' * (tile.height - tile.blend_top))
+        mask = ImageChops.multiply(mask, column.resize((tile.width, tile.height), Image.Resampling.NEAREST))
+    return mask
+
+
+class TiledImage:
+    """
+    Splits one large image into tiles and stitches the processed tiles back.
+    
+    The source is decoded once and released after the last tile has been
+    cut from it. Results are blended into the output canvas as soon as all
+    tiles before them in raster order have arrived, so only tiles that
+    finished out of order are held in memory.
+    """
+    
+    def __init__(self, image_path: str, width: int, height: int, tile_size: int, overlap: int):
+        self.image_path = image_path
+        self.width = width
+        self.height = height
+        self.tiles = plan_tiles(width, height, tile_size, overlap)
+        self.failed = False
+        self.mode = 'RGB'  # of the output: 'RGBA' for sources with transparency
+        self._source = None
+        self._tiles_read = 0
+        self._canvas = None
+        self._next_index = 0
+        self._pending: Dict[int, object] = {}
+        self._source_lock = threading.Lock()
+        self._stitch_lock = threading.Lock()
+    
+    def read_tile(self, tile: Tile) -> memoryview:
+        """Cut one tile from the source image as PNG data (a view of the encoder's buffer)."""
+        from PIL import Image
+        
+        with self._source_lock:
+            if self._source is None:
+                with Image.open(self.image_path) as img:
+                    img.load()
+                    self.mode = 'RGBA' if 'A' in img.getbands() else 'RGB'
+                    self._source = img if img.mode in ('RGB', 'RGBA', 'L') else img.convert(self.mode)
+            region = self._source.crop(tile.box)
+            self._tiles_read += 1
+            if self._tiles_read >= len(self.tiles):
+                self._source = None
+        
+        buffer = BytesIO()
+        region.save(buffer, format='PNG', compress_level=1)
+        return buffer.getbuffer()
+    
+    def fail(self) -> bool:
+        """
+        Mark the image as failed.
+        
+        Returns:
+            True for the first failure, which is the one to report
+        """
+        with self._stitch_lock:
+            first = not self.failed
+            self.failed = True
+            self._pending.clear()
+            self._canvas = None
+        with self._source_lock:
+            self._source = None
+        return first
+    
+    def add_result(self, tile: Tile, data: bytes) -> Optional[bytes]:
+        """
+        Blend a processed tile into the output.
+        
+        Returns:
+            The stitched image as PNG bytes once every tile has been added, else None
+        """
+        from PIL import Image
+        
+        with Image.open(BytesIO(data)) as img:
+            result = img.convert(self.mode)
+        if result.size != (tile.width, tile.height):
+            result = result.resize((tile.width, tile.height), Image.Resampling.LANCZOS)
+        
+        with self._stitch_lock:
+            if self.failed:
+                return None
+            self._pending[tile.index] = result
+            while self._next_index in self._pending:
+                self._paste(self.tiles[self._next_index], self._pending.pop(self._next_index))
+                self._next_index += 1
+            if self._next_index < len(self.tiles):
+                return None
+            canvas, self._canvas = self._canvas, None
+        
+        buffer = BytesIO()
+        canvas.save(buffer, format='PNG', compress_level=1)
+        logger.info(f"Stitched {len(self.tiles)} tiles for {self.image_path}")
+        return buffer.getvalue()
+    
+    def _paste(self, tile: Tile, result):
+        from PIL import Image
+        
+        if self._canvas is None:
+            self._canvas = Image.new(self.mode, (self.width, self.height))
+        if tile.blend_left or tile.blend_top:
+            self._canvas.paste(result, (tile.x, tile.y), feather_mask(tile))
+        else:
+            self._canvas.paste(result, (tile.x, tile.y))
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Tracer:
+    """Records per-thread timing spans and exports them as Chrome trace events.
+    
+    Tracing is opt-in: while disabled every recording call returns immediately,
+    so the instrumentation can stay in the hot paths of the worker threads.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.output_path: Optional[str] = None
+        self._events: List[Dict[str, Any]] = []
+        self._pending_async: Dict[Any, float] = {}
+        self._thread_names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self.profiler: Optional['SamplingProfiler'] = None
+    
+    def enable(self, output_path: Optional[str] = None):
+        """Start recording spans, discarding anything recorded before."""
+        with self._lock:
+            self._events = []
+            self._pending_async = {}
+            self._thread_names = {}
+            self._origin = time.perf_counter()
+        self.output_path = output_path
+        self.enabled = True
+        logger.info(f"Tracing enabled, output: {output_path or '(not set)'}")
+    
+    def disable(self):
+        """Stop recording spans."""
+        self.enabled = False
+    
+    def _ts(self, t: float) -> float:
+        """Convert a perf_counter timestamp to trace microseconds."""
+        return (t - self._origin) * 1e6
+    
+    def _record(self, event: Dict[str, Any]):
+        tid = event.setdefault('tid', threading.get_ident())
+        event['pid'] = self._pid
+        with self._lock:
+            if tid not in self._thread_names:
+                self._thread_names[tid] = threading.current_thread().name
+            self._events.append(event)
+    
+    @contextmanager
+    def span(self, name: str, category: str = 'task', **args):
+        """Record the enclosed block as a complete span on the current thread."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), category, args)
+    
+    def add_span(self, name: str, start: float, end: float,
+                 category: str = 'task', args: Optional[Dict] = None):
+        """Record a span from explicit perf_counter timestamps."""
+        if not self.enabled:
+            return
+        self._record({
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': self._ts(start),
+            'dur': (end - start) * 1e6,
+            'args': args or {}
+        })
+    
+    def add_async_span(self, name: str, key: Any, start: float, end: float,
+                       category: str = 'async', args: Optional[Dict] = None):
+        """Record a span that crosses threads (e.g. queue wait, signal delivery).
+        
+        Async spans get their own track in the viewer, so they may overlap
+        freely with the spans of the thread that happens to record them.
+        """
+        if not self.enabled:
+            return
+        event_id = str(id(key)) if not isinstance(key, (str, int)) else str(key)
+        base = {'name': name, 'cat': category, 'id': event_id}
+        self._record(dict(base, ph='b', ts=self._ts(start), args=args or {}))
+        self._record(dict(base, ph='e', ts=self._ts(end)))
+    
+    def begin_async(self, name: str, key: Any):
+        """Remember the start of an async span that is finished elsewhere."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending_async[(name, key)] = time.perf_counter()
+    
+    def end_async(self, name: str, key: Any, category: str = 'async', **args):
+        """Finish an async span started with begin_async."""
+        if not self.enabled:
+            return
+        with self._lock:
+            start = self._pending_async.pop((name, key), None)
+        if start is not None:
+            self.add_async_span(name, key, start, time.perf_counter(), category, args)
+    
+    def instant(self, name: str, category: str = 'task', **args):
+        """Record a zero-duration marker on the current thread."""
+        if not self.enabled:
+            return
+        self._record({
+            'name': name,
+            'cat': category,
+            'ph': 'i',
+            's': 't',
+            'ts': self._ts(time.perf_counter()),
+            'args': args
+        })
+    
+    def export_chrome_trace(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Write recorded events as Chrome trace-event JSON.
+        
+        The file can be opened in chrome://tracing or https://ui.perfetto.dev.
+        
+        Returns:
+            The path written, or None if there was nothing to write to
+        """
+        path = path or self.output_path
+        if not path:
+            return None
+        
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        
+        metadata = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+             'args': {'name': thread_name}}
+            for tid, thread_name in thread_names.items()
+        ]
+        trace = {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms'
+        }
+        if self.profiler is not None:
+            trace.update(self.profiler.to_trace_samples(self))
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        
+        logger.info(f"Wrote {len(events)} trace events to {path}")
+        return path
+    
+    def start_profiler(self, interval: float = 0.005) -> 'SamplingProfiler':
+        """Attach a sampling profiler to all threads until stop_profiler()."""
+        self.stop_profiler()
+        self.profiler = SamplingProfiler(interval)
+        self.profiler.start()
+        return self.profiler
+    
+    def stop_profiler(self):
+        """Stop the sampling profiler if one is running."""
+        if self.profiler is not None and self.profiler.is_alive():
+            self.profiler.stop()
+    
+    def profile_window(self, delay: float, duration: float, interval: float = 0.005):
+        """Profile the window [delay, delay + duration] seconds from now."""
+        def _begin():
+            self.start_profiler(interval)
+            end_timer = threading.Timer(duration, self._end_window)
+            end_timer.daemon = True
+            end_timer.start()
+        
+        timer = threading.Timer(delay, _begin)
+        timer.daemon = True
+        timer.start()
+    
+    def _end_window(self):
+        self.stop_profiler()
+        if self.profiler is not None and self.output_path:
+            self.profiler.write_collapsed(os.path.splitext(self.output_path)[0] + '.folded')
+
+
+class SamplingProfiler(threading.Thread):
+    """Periodically samples the Python stacks of every other thread."""
+    
+    def __init__(self, interval: float = 0.005):
+        super().__init__(name='SamplingProfiler', daemon=True)
+        self.interval = interval
+        self.samples: List[tuple] = []  # (perf_counter, thread_id, stack)
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            now = time.perf_counter()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.append((now, thread_id, tuple(stack)))
+    
+    def stop(self):
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._stop_event.set()
+        self.join()
+    
+    def collapsed_stacks(self) -> Counter:
+        """Aggregate samples into 'frame;frame;frame' -> count."""
+        return Counter(';'.join(stack) for _, _, stack in self.samples)
+    
+    def write_collapsed(self, path: str):
+        """Write samples in the folded format used by flamegraph tools."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.collapsed_stacks().most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Wrote {len(self.samples)} profiler samples to {path}")
+    
+    def to_trace_samples(self, tracer: Tracer) -> Dict[str, Any]:
+        """Convert samples to the stackFrames/samples sections of a trace."""
+        frame_ids: Dict[tuple, int] = {}
+        stack_frames: Dict[str, Dict[str, Any]] = {}
+        samples = []
+        
+        for t, thread_id, stack in self.samples:
+            parent = None
+            for depth in range(len(stack)):
+                key = stack[:depth + 1]
+                if key not in frame_ids:
+                    frame_ids[key] = len(frame_ids)
+                    node = {'name': stack[depth]}
+                    if parent is not None:
+                        node['parent'] = str(parent)
+                    stack_frames[str(frame_ids[key])] = node
+                parent = frame_ids[key]
+            if parent is None:
+                continue
+            samples.append({
+                'cpu': 0,
+                'tid': thread_id,
+                'ts': tracer._ts(t),
+                'name': 'sample',
+                'sf': str(parent),
+                'weight': 1
+            })
+        
+        return {'stackFrames': stack_frames, 'samples': samples}
+
+
+# Process-wide tracer used by the worker threads, API clients and UI.
+tracer = Tracer()
+
+
+def configure_from_env():
+    """
+    Enable tracing when requested through the environment.
+    
+    AIXIUTU_TRACE=<path.json>           record spans and export them to <path.json>
+    AIXIUTU_PROFILE_WINDOW=<start>:<len> sample stacks from <start>s after each
+                                         batch starts, for <len> seconds
+    """
+    output_path = os.getenv('AIXIUTU_TRACE', '')
+    if output_path:
+        tracer.enable(output_path)
+
+
+def schedule_profile_window():
+    """Start the profiler window configured by AIXIUTU_PROFILE_WINDOW, if any."""
+    window = os.getenv('AIXIUTU_PROFILE_WINDOW', '')
+    if not tracer.enabled or not window:
+        return
+    try:
+        start, duration = (float(part) for part in window.split(':', 1))
+    except ValueError:
+        logger.error(f"Invalid AIXIUTU_PROFILE_WINDOW '{window}', expected <start>:<duration>")
+        return
+    tracer.profile_window(start, duration)
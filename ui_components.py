@@ -1,16 +1,38 @@
 import os
+import itertools
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QSplitter, QVBoxLayout, QHBoxLayout,
-    QPushButton, QListWidget, QLabel, QComboBox, QLineEdit,
+    QPushButton, QListView, QLabel, QComboBox, QLineEdit,
     QProgressBar, QDialog, QFormLayout, QDialogButtonBox,
-    QMessageBox, QFrame
+    QMessageBox, QFrame, QSpinBox, QCheckBox
 )
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QPixmap, QImage
-from typing import Optional, List, Dict
+from PyQt6.QtCore import Qt, pyqtSignal, QSize, QTimer, QModelIndex
+from PyQt6.QtGui import QPixmap, QImage, QIcon
+from typing import TYPE_CHECKING, Optional, List, Dict, Tuple
+import logging
 
 from config_manager import ConfigManager
-from worker_threads import ProcessingTask, TaskManager
+from tracing import tracer
+from startup import startup_timer, preload_in_background
+from thumbnail_cache import ThumbnailLoader, THUMBNAIL_SIZE
+from preview_cache import PreviewCache, CachedImage
+from preview_loader import PreviewLoader
+from image_list_model import ImageListModel, PathStore
+from image_import import ImageImporter, metadata_store
+from output_encoder import OutputEncoder
+from validation import ResultValidator
+from tiling import DEFAULT_TILE_SIZE, DEFAULT_TILE_OVERLAP
+from dedup import DedupReport, DEFAULT_NEAR_THRESHOLD, DuplicateFinder
+from scheduling import SCHEDULING_POLICIES, format_duration
+from endpoint_pool import MODEL_NAMES
+from local_preview import LocalPreview, PREVIEW_MAX_DIMENSION
+
+if TYPE_CHECKING:
+    # The processing engine (and requests/PIL behind it) is imported on
+    # first use, or in the background once the window has been painted
+    from worker_threads import TaskManager, TaskResult, TaskSpec, ProgressBatch, PoolStatus
+
+logger = logging.getLogger(__name__)
 
 
 class ApiConfigDialog(QDialog):
@@ -24,7 +46,7 @@ class ApiConfigDialog(QDialog):
     
     def _init_ui(self):
         self.setWindowTitle('API 配置')
-        self.setFixedSize(400, 300)
+        self.setFixedSize(400, 380)
         
         layout = QVBoxLayout(self)
         
@@ -36,6 +58,9 @@ class ApiConfigDialog(QDialog):
         self.doubao_key_input = QLineEdit(self.config.get('doubao_api_key', ''))
         self.doubao_key_input.setEchoMode(QLineEdit.EchoMode.Password)
         
+        for line_edit in (self.doubao_url_input, self.doubao_key_input):
+            line_edit.setToolTip('可填写多个，用逗号分隔；请求会在所有地址和 Key 间负载均衡并自动故障切换')
+        
         form_layout.addRow('豆包 API 地址:', self.doubao_url_input)
         form_layout.addRow('豆包 API Key:', self.doubao_key_input)
         
@@ -45,10 +70,21 @@ class ApiConfigDialog(QDialog):
         self.banana_key_input.setEchoMode(QLineEdit.EchoMode.Password)
         self.banana_model_key_input = QLineEdit(self.config.get('banana_model_key', ''))
         
+        for line_edit in (self.banana_url_input, self.banana_key_input):
+            line_edit.setToolTip('可填写多个，用逗号分隔；请求会在所有地址和 Key 间负载均衡并自动故障切换')
+        
         form_layout.addRow('Banana API 地址:', self.banana_url_input)
         form_layout.addRow('Banana API Key:', self.banana_key_input)
         form_layout.addRow('Banana 模型 Key:', self.banana_model_key_input)
         
+        # Tiling of large images, per model
+        self.doubao_tile_size_spin, self.doubao_tile_overlap_spin = self._add_tile_row(
+            form_layout, '豆包分块 尺寸/重叠:', 'doubao'
+        )
+        self.banana_tile_size_spin, self.banana_tile_overlap_spin = self._add_tile_row(
+            form_layout, 'Banana 分块 尺寸/重叠:', 'banana'
+        )
+        
         layout.addLayout(form_layout)
         
         # Dialog buttons
@@ -59,6 +95,26 @@ class ApiConfigDialog(QDialog):
         buttons.rejected.connect(self.reject)
         layout.addWidget(buttons)
     
+    def _add_tile_row(self, form_layout: QFormLayout, label: str, model_type: str):
+        """Add tile size and overlap inputs for one model."""
+        size_spin = QSpinBox()
+        size_spin.setRange(256, 16384)
+        size_spin.setSingleStep(256)
+        size_spin.setSuffix(' px')
+        size_spin.setValue(int(self.config.get(f'{model_type}_tile_size') or DEFAULT_TILE_SIZE))
+        
+        overlap_spin = QSpinBox()
+        overlap_spin.setRange(0, 1024)
+        overlap_spin.setSingleStep(16)
+        overlap_spin.setSuffix(' px')
+        overlap_spin.setValue(int(self.config.get(f'{model_type}_tile_overlap') or DEFAULT_TILE_OVERLAP))
+        
+        row_layout = QHBoxLayout()
+        row_layout.addWidget(size_spin)
+        row_layout.addWidget(overlap_spin)
+        form_layout.addRow(label, row_layout)
+        return size_spin, overlap_spin
+    
     def _on_ok(self):
         """Validate and save configuration."""
         result = {
@@ -66,7 +122,11 @@ class ApiConfigDialog(QDialog):
             'doubao_api_key': self.doubao_key_input.text().strip(),
             'banana_api_url': self.banana_url_input.text().strip(),
             'banana_api_key': self.banana_key_input.text().strip(),
-            'banana_model_key': self.banana_model_key_input.text().strip()
+            'banana_model_key': self.banana_model_key_input.text().strip(),
+            'doubao_tile_size': str(self.doubao_tile_size_spin.value()),
+            'doubao_tile_overlap': str(self.doubao_tile_overlap_spin.value()),
+            'banana_tile_size': str(self.banana_tile_size_spin.value()),
+            'banana_tile_overlap': str(self.banana_tile_overlap_spin.value())
         }
         
         # Basic validation
@@ -81,10 +141,31 @@ class ApiConfigDialog(QDialog):
 class PreviewPanel(QWidget):
     """Panel for displaying before/after image preview."""
     
-    def __init__(self, parent=None):
+    # Delay after the last resize event before re-rendering smoothly
+    RESIZE_SETTLE_MS = 150
+    
+    PROCESSED_TITLE = '处理后效果图'
+    LOCAL_PREVIEW_NOTE = '本地近似预览，未调用 API'
+    
+    def __init__(self, parent=None, cache: Optional[PreviewCache] = None):
         super().__init__(parent)
         self.current_original_path: Optional[str] = None
         self.current_processed_path: Optional[str] = None
+        self.processed_preview: Optional[QImage] = None  # low-resolution proxy or local preview
+        # (smooth, whiten) shown as a local approximation, while it is shown
+        self.local_preview_params: Optional[Tuple[float, float]] = None
+        self._local_preview: Optional[LocalPreview] = None
+        self._local_preview_path: Optional[str] = None
+        self.cache = cache or PreviewCache()
+        self.loader = PreviewLoader()
+        self.loader.image_loaded.connect(self._on_image_loaded)
+        self.loader.load_failed.connect(self._on_load_failed)
+        
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(self.RESIZE_SETTLE_MS)
+        self._resize_timer.timeout.connect(self._refresh_images)
+        
         self._init_ui()
     
     def _init_ui(self):
@@ -119,9 +200,9 @@ class PreviewPanel(QWidget):
         processed_layout = QVBoxLayout(processed_frame)
         processed_layout.setContentsMargins(5, 5, 5, 5)
         
-        processed_label = QLabel('处理后效果图')
-        processed_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        processed_label.setStyleSheet('font-weight: bold; padding: 5px;')
+        self.processed_title = QLabel(self.PROCESSED_TITLE)
+        self.processed_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.processed_title.setStyleSheet('font-weight: bold; padding: 5px;')
         
         self.processed_image_label = QLabel()
         self.processed_image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -129,7 +210,7 @@ class PreviewPanel(QWidget):
         self.processed_image_label.setMinimumSize(200, 200)
         self.processed_image_label.setText('等待处理...')
         
-        processed_layout.addWidget(processed_label)
+        processed_layout.addWidget(self.processed_title)
         processed_layout.addWidget(self.processed_image_label, 1)
         
         # Add frames to splitter
@@ -143,35 +224,165 @@ class PreviewPanel(QWidget):
     def set_original_image(self, image_path: str):
         """Display original image."""
         self.current_original_path = image_path
-        self._display_image(self.original_image_label, image_path)
+        self._show_or_load('original', self.original_image_label, image_path)
     
-    def set_processed_image(self, image_path: str):
-        """Display processed image."""
+    def set_processed_image(self, image_path: str, preview: Optional[QImage] = None):
+        """
+        Display processed image.
+        
+        preview, if given, is the result already decoded at processed_decode_size();
+        the file is only read back if the label needs more pixels than it has.
+        """
+        # Output files are rewritten by every run, so never trust a cached copy
+        self.cache.remove(image_path)
+        if preview is not None and not preview.isNull():
+            target = self.processed_decode_size()
+            # Smaller than the decode size both ways: it was not downscaled
+            full_resolution = preview.width() < target.width() and preview.height() < target.height()
+            self.cache.put(image_path, preview, full_resolution)
         self.current_processed_path = image_path
-        self._display_image(self.processed_image_label, image_path)
+        self.local_preview_params = None
+        self._set_processed_preview(None)
+        self._show_or_load('processed', self.processed_image_label, image_path)
     
-    def _display_image(self, label: QLabel, image_path: str):
-        """Load and display image on label."""
-        try:
-            pixmap = QPixmap(image_path)
-            if pixmap.isNull():
-                label.setText('无法加载图片')
+    def set_processed_proxy(self, image: QImage):
+        """Display a low-resolution proxy result until the final output is shown."""
+        self.loader.cancel('processed')
+        self.current_processed_path = None
+        self.local_preview_params = None
+        self._set_processed_preview(image)
+        self._display_preview()
+    
+    def show_local_preview(self, smooth: float, whiten: float):
+        """
+        Display a local approximation of Doubao retouching of the original.
+        
+        Rendered from the decoded original (as soon as it is loaded) at
+        preview size; nothing is sent to the API.
+        """
+        self.local_preview_params = (smooth, whiten)
+        self._render_local_preview()
+    
+    def _render_local_preview(self):
+        if self.local_preview_params is None or not self.current_original_path:
+            return
+        if self._local_preview_path != self.current_original_path:
+            entry = self.cache.get(self.current_original_path)
+            if entry is None:
+                # Rendered once the original has been decoded
                 return
-            
+            try:
+                self._local_preview = LocalPreview(entry.level_for(QSize(PREVIEW_MAX_DIMENSION, PREVIEW_MAX_DIMENSION)))
+            except ImportError as e:
+                logger.warning(f"Local preview unavailable (pip install numpy): {str(e)}")
+                self.local_preview_params = None
+                return
+            self._local_preview_path = self.current_original_path
+        with tracer.span('local_preview'):
+            image = self._local_preview.render(*self.local_preview_params)
+        self.loader.cancel('processed')
+        self.current_processed_path = None
+        self._set_processed_preview(image, self.LOCAL_PREVIEW_NOTE)
+        self._display_preview()
+    
+    def _set_processed_preview(self, image: Optional[QImage], note: str = '低分辨率预览'):
+        self.processed_preview = image
+        self.processed_title.setText(self.PROCESSED_TITLE if image is None else f'{self.PROCESSED_TITLE}（{note}）')
+    
+    def _display_preview(self, smooth: bool = True):
+        mode = Qt.TransformationMode.SmoothTransformation if smooth else Qt.TransformationMode.FastTransformation
+        scaled_image = self.processed_preview.scaled(
+            self.processed_image_label.size(), Qt.AspectRatioMode.KeepAspectRatio, mode
+        )
+        self.processed_image_label.setPixmap(QPixmap.fromImage(scaled_image))
+    
+    def prefetch(self, image_paths: List[str]):
+        """Decode images in the background so selecting them later is instant."""
+        missing = [path for path in image_paths if self.cache.get(path) is None]
+        if missing:
+            self.loader.prefetch(missing, self._decode_size(self.original_image_label))
+    
+    def processed_decode_size(self) -> QSize:
+        """Pixel size processed results have to be decoded at to fill their label."""
+        return self._decode_size(self.processed_image_label)
+    
+    def _decode_size(self, label: QLabel) -> QSize:
+        """Pixel size an image has to be decoded at to fill the label."""
+        ratio = label.devicePixelRatioF()
+        max_dimension = PreviewCache.MAX_CACHED_DIMENSION
+        return QSize(min(int(label.width() * ratio), max_dimension),
+                     min(int(label.height() * ratio), max_dimension))
+    
+    def _show_or_load(self, slot: str, label: QLabel, image_path: str):
+        """Show the cached image if any, and decode a sharper one if needed."""
+        entry = self.cache.get(image_path)
+        target = self._decode_size(label)
+        if entry is not None:
+            self._display_image(label, entry)
+        else:
+            label.clear()
+            label.setText('加载中...')
+    
+        if entry is None or not entry.covers(target):
+            self.loader.request(slot, image_path, target)
+    
+    def _on_image_loaded(self, slot: str, image_path: str, image: QImage, full_resolution: bool):
+        """Store an image decoded in the background and show it if still current."""
+        existing = self.cache.get(image_path)
+        if existing is not None and existing.covers(image.size()):
+            entry = existing
+        else:
+            entry = self.cache.put(image_path, image, full_resolution)
+        
+        if slot == 'original' and image_path == self.current_original_path:
+            self._display_image(self.original_image_label, entry)
+            if self.local_preview_params is not None:
+                # Render again from the sharper decode
+                self._local_preview_path = None
+                self._render_local_preview()
+        elif slot == 'processed' and image_path == self.current_processed_path:
+            self._display_image(self.processed_image_label, entry)
+    
+    def _on_load_failed(self, slot: str, image_path: str):
+        """Report images that could not be decoded."""
+        if slot == 'original' and image_path == self.current_original_path:
+            self.original_image_label.setText('无法加载图片')
+        elif slot == 'processed' and image_path == self.current_processed_path:
+            self.processed_image_label.setText('无法加载图片')
+    
+    def _display_image(self, label: QLabel, entry: CachedImage, smooth: bool = True):
+        """Display a cached image on label."""
+        try:
             # Scale image to fit label while maintaining aspect ratio
-            scaled_pixmap = pixmap.scaled(
-                label.size(),
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            label.setPixmap(scaled_pixmap)
+            scaled_image = entry.scaled_to(label.size(), smooth)
+            label.setPixmap(QPixmap.fromImage(scaled_image))
             
         except Exception as e:
             label.setText(f'加载失败: {str(e)}')
     
+    def _refresh_images(self, smooth: bool = True):
+        """Re-render the current images at the current label sizes."""
+        for slot, label, image_path in (
+            ('original', self.original_image_label, self.current_original_path),
+            ('processed', self.processed_image_label, self.current_processed_path)
+        ):
+            if not image_path:
+                continue
+            entry = self.cache.get(image_path)
+            if entry is not None:
+                self._display_image(label, entry, smooth)
+            # Once resizing has settled, decode again if the label outgrew the image
+            if smooth and (entry is None or not entry.covers(self._decode_size(label))):
+                self.loader.request(slot, image_path, self._decode_size(label))
+        if self.processed_preview is not None:
+            self._display_preview(smooth)
+    
     def clear_processed(self):
         """Clear processed image display."""
+        self.loader.cancel('processed')
         self.current_processed_path = None
+        self.local_preview_params = None
+        self._set_processed_preview(None)
         self.processed_image_label.clear()
         self.processed_image_label.setText('等待处理...')
     
@@ -179,11 +390,10 @@ class PreviewPanel(QWidget):
         """Handle resize event to update image display."""
         super().resizeEvent(event)
         
-        if self.current_original_path:
-            self._display_image(self.original_image_label, self.current_original_path)
-        
-        if self.current_processed_path:
-            self._display_image(self.processed_image_label, self.current_processed_path)
+        # Fast scaling from cached levels while the user is dragging,
+        # then one smooth pass once resizing has settled
+        self._refresh_images(smooth=False)
+        self._resize_timer.start()
 
 
 class ConfigPanel(QWidget):
@@ -191,13 +401,21 @@ class ConfigPanel(QWidget):
     
     # Signals
     import_clicked = pyqtSignal()
+    import_folder_clicked = pyqtSignal()
     api_config_clicked = pyqtSignal()
     output_dir_clicked = pyqtSignal()
     start_processing = pyqtSignal()
+    image_selected = pyqtSignal(int)  # view row
+    doubao_params_changed = pyqtSignal()
+    
+    THUMBNAIL_SIZE = THUMBNAIL_SIZE
+    
+    # Separates the values of one parameter in sweep mode
+    SWEEP_SEPARATOR = ';'
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.image_paths: List[str] = []
+        self._thumbnail_loader = ThumbnailLoader()
         self._init_ui()
     
     def _init_ui(self):
@@ -216,12 +434,34 @@ class ConfigPanel(QWidget):
         import_label.setStyleSheet('font-weight: bold;')
         layout.addWidget(import_label)
         
+        import_buttons = QHBoxLayout()
         self.import_btn = QPushButton('导入图片')
         self.import_btn.clicked.connect(self.import_clicked.emit)
-        layout.addWidget(self.import_btn)
-        
-        self.image_list = QListWidget()
-        self.image_list.currentRowChanged.connect(self._on_image_selected)
+        import_buttons.addWidget(self.import_btn)
+        
+        self.import_folder_btn = QPushButton('导入文件夹')
+        self.import_folder_btn.clicked.connect(self.import_folder_clicked.emit)
+        import_buttons.addWidget(self.import_folder_btn)
+        layout.addLayout(import_buttons)
+        
+        self.status_filter_combo = QComboBox()
+        self.status_filter_combo.addItem('全部', None)
+        for status, name in ImageListModel.STATUS_NAMES.items():
+            self.status_filter_combo.addItem(name, status)
+        self.status_filter_combo.currentIndexChanged.connect(self._on_status_filter_changed)
+        layout.addWidget(self.status_filter_combo)
+        
+        # Shared blank icon keeps row heights stable until thumbnails arrive
+        placeholder = QPixmap(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE)
+        placeholder.fill(Qt.GlobalColor.transparent)
+        self.image_model = ImageListModel(self._thumbnail_loader, QIcon(placeholder), self)
+        
+        # Model/view list: only rows on screen are ever laid out or painted
+        self.image_list = QListView()
+        self.image_list.setModel(self.image_model)
+        self.image_list.setIconSize(QSize(self.THUMBNAIL_SIZE, self.THUMBNAIL_SIZE))
+        self.image_list.setUniformItemSizes(True)
+        self.image_list.selectionModel().currentRowChanged.connect(self._on_current_row_changed)
         layout.addWidget(self.image_list)
         
         # Separator
@@ -232,8 +472,14 @@ class ConfigPanel(QWidget):
         model_label.setStyleSheet('font-weight: bold;')
         layout.addWidget(model_label)
         
+        # Each entry holds the jobs to run, each a chain of models in order;
+        # several jobs run side by side, every model on workers of its own
         self.model_combo = QComboBox()
-        self.model_combo.addItems(['豆包修图模型', 'Banana 风格模型'])
+        self.model_combo.addItem('豆包修图模型', [['doubao']])
+        self.model_combo.addItem('Banana 风格模型', [['banana']])
+        self.model_combo.addItem('豆包修图 → Banana 风格 (串联)', [['doubao', 'banana']])
+        self.model_combo.addItem('Banana 风格 → 豆包修图 (串联)', [['banana', 'doubao']])
+        self.model_combo.addItem('豆包修图 + Banana 风格 (同时)', [['doubao'], ['banana']])
         self.model_combo.currentIndexChanged.connect(self._on_model_changed)
         layout.addWidget(self.model_combo)
         
@@ -256,6 +502,15 @@ class ConfigPanel(QWidget):
         self.whiten_input = QLineEdit('0.6')
         doubao_layout.addWidget(self.whiten_input)
         
+        self.local_preview_check = QCheckBox('本地实时预览磨皮/美白效果')
+        self.local_preview_check.setChecked(True)
+        self.local_preview_check.setToolTip('修改强度时在本地用近似算法即时显示选中图片的效果，不调用 API；'
+                                            '实际效果以处理结果为准')
+        doubao_layout.addWidget(self.local_preview_check)
+        self.smooth_input.textChanged.connect(lambda text: self.doubao_params_changed.emit())
+        self.whiten_input.textChanged.connect(lambda text: self.doubao_params_changed.emit())
+        self.local_preview_check.toggled.connect(lambda checked: self.doubao_params_changed.emit())
+        
         layout.addWidget(self.doubao_panel)
         
         # Banana parameters panel (hidden by default)
@@ -269,6 +524,43 @@ class ConfigPanel(QWidget):
         
         layout.addWidget(self.banana_panel)
         
+        # Chain option (hidden unless a multi-step chain is selected)
+        self.save_intermediate_check = QCheckBox('保存中间结果')
+        self.save_intermediate_check.setVisible(False)
+        layout.addWidget(self.save_intermediate_check)
+        
+        self.sweep_check = QCheckBox(f'参数扫描（多个取值用 {self.SWEEP_SEPARATOR} 分隔）')
+        self.sweep_check.setToolTip('对每组参数组合各处理一遍，结果按组合分目录保存；每张图片只编码一次')
+        layout.addWidget(self.sweep_check)
+        
+        self.proxy_check = QCheckBox('先发送低分辨率预览')
+        self.proxy_check.setToolTip('开始处理时先以低分辨率发送选中的图片和前几张图片，几秒内显示近似效果，再处理原图；'
+                                    '低分辨率结果只用于预览，不会保存')
+        layout.addWidget(self.proxy_check)
+        
+        self.tiling_check = QCheckBox('大图分块处理')
+        self.tiling_check.setToolTip('超过分块尺寸的图片拆成重叠的小块并发处理，再羽化拼接（分块尺寸在 API 配置中按模型设置）')
+        layout.addWidget(self.tiling_check)
+        
+        dedup_layout = QHBoxLayout()
+        self.dedup_check = QCheckBox('跳过重复图片')
+        self.dedup_check.setToolTip('完全相同的文件只调用一次 API，结果复制给所有副本')
+        self.dedup_check.toggled.connect(self._on_dedup_toggled)
+        dedup_layout.addWidget(self.dedup_check)
+        
+        self.near_duplicate_check = QCheckBox('含近似重复')
+        self.near_duplicate_check.setToolTip('按感知哈希识别重新导出、缩放过的同一张照片；阈值为 64 位哈希中允许不同的位数 (0-16)')
+        self.near_duplicate_check.setEnabled(False)
+        self.near_duplicate_check.toggled.connect(self._on_dedup_toggled)
+        dedup_layout.addWidget(self.near_duplicate_check)
+        
+        self.near_threshold_spin = QSpinBox()
+        self.near_threshold_spin.setRange(0, 16)
+        self.near_threshold_spin.setValue(DEFAULT_NEAR_THRESHOLD)
+        self.near_threshold_spin.setEnabled(False)
+        dedup_layout.addWidget(self.near_threshold_spin)
+        layout.addLayout(dedup_layout)
+        
         # Separator
         self._add_separator(layout)
         
@@ -286,6 +578,38 @@ class ConfigPanel(QWidget):
         self.output_dir_label.setStyleSheet('padding: 5px; background-color: #f5f5f5; border: 1px solid #ddd;')
         layout.addWidget(self.output_dir_label)
         
+        output_format_layout = QHBoxLayout()
+        output_format_layout.addWidget(QLabel('输出格式:'))
+        self.output_format_combo = QComboBox()
+        self.output_format_combo.addItem('PNG', 'png')
+        self.output_format_combo.addItem('JPEG', 'jpeg')
+        self.output_format_combo.addItem('WebP', 'webp')
+        self.output_format_combo.addItem('保持 API 返回格式', None)
+        self.output_format_combo.currentIndexChanged.connect(self._on_output_format_changed)
+        output_format_layout.addWidget(self.output_format_combo, 1)
+        
+        output_format_layout.addWidget(QLabel('质量:'))
+        self.output_quality_spin = QSpinBox()
+        self.output_quality_spin.setRange(1, 100)
+        self.output_quality_spin.setValue(90)
+        self.output_quality_spin.setEnabled(False)
+        output_format_layout.addWidget(self.output_quality_spin)
+        layout.addLayout(output_format_layout)
+        
+        self.full_validation_check = QCheckBox('完整解码校验结果')
+        self.full_validation_check.setToolTip('写入前完整解码 API 返回的图片，能发现文件头校验发现不了的损坏数据，'
+                                              '但会占用更多 CPU；无效结果会自动重新请求')
+        layout.addWidget(self.full_validation_check)
+        
+        scheduling_layout = QHBoxLayout()
+        scheduling_layout.addWidget(QLabel('处理顺序:'))
+        self.scheduling_combo = QComboBox()
+        for policy, name in SCHEDULING_POLICIES.items():
+            self.scheduling_combo.addItem(name, policy)
+        self.scheduling_combo.setToolTip('按图片像素数和实际观测到的接口耗时估算每张图片的处理时间')
+        scheduling_layout.addWidget(self.scheduling_combo, 1)
+        layout.addLayout(scheduling_layout)
+        
         # Spacer
         layout.addStretch()
         
@@ -299,6 +623,12 @@ class ConfigPanel(QWidget):
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
     
+        # Busy workers, queue and utilization of each model during a run
+        self.pool_status_label = QLabel()
+        self.pool_status_label.setStyleSheet('color: gray;')
+        self.pool_status_label.setVisible(False)
+        layout.addWidget(self.pool_status_label)
+    
     def _add_separator(self, layout: QVBoxLayout):
         """Add a separator line to the layout."""
         line = QFrame()
@@ -307,40 +637,164 @@ class ConfigPanel(QWidget):
         layout.addWidget(line)
         layout.addSpacing(5)
     
-    def _on_image_selected(self, row: int):
+    def _on_current_row_changed(self, current: QModelIndex, previous: QModelIndex):
         """Handle image selection in list."""
-        if 0 <= row < len(self.image_paths):
-            pass  # Signal will be handled by parent
+        self.image_selected.emit(current.row() if current.isValid() else -1)
+    
+    def _on_status_filter_changed(self, index: int):
+        """Show only images with the selected processing status."""
+        self.image_model.set_status_filter(self.status_filter_combo.itemData(index))
     
     def _on_model_changed(self, index: int):
         """Handle model selection change."""
-        if index == 0:  # Doubao
-            self.doubao_panel.setVisible(True)
-            self.banana_panel.setVisible(False)
-        else:  # Banana
-            self.doubao_panel.setVisible(False)
-            self.banana_panel.setVisible(True)
+        jobs = self.model_combo.itemData(index)
+        models = [model_type for chain in jobs for model_type in chain]
+        self.doubao_panel.setVisible('doubao' in models)
+        self.banana_panel.setVisible('banana' in models)
+        self.save_intermediate_check.setVisible(any(len(chain) > 1 for chain in jobs))
+        self.doubao_params_changed.emit()
+    
+    @property
+    def image_paths(self) -> PathStore:
+        """All imported image paths, regardless of the status filter."""
+        return self.image_model.paths
+    
+    def _on_output_format_changed(self, index: int):
+        """Quality only applies to lossy output formats."""
+        self.output_quality_spin.setEnabled(self.output_format_combo.itemData(index) in ('jpeg', 'webp'))
+    
+    def is_full_validation_enabled(self) -> bool:
+        """Whether results are fully decoded, not only header-checked, before being written."""
+        return self.full_validation_check.isChecked()
+    
+    def get_output_options(self) -> Dict:
+        """Get output format (None keeps the API's format) and quality."""
+        return {
+            'output_format': self.output_format_combo.currentData(),
+            'quality': self.output_quality_spin.value()
+        }
     
     def set_image_paths(self, paths: List[str]):
         """Update image list."""
-        self.image_paths = paths
-        self.image_list.clear()
-        for path in paths:
-            self.image_list.addItem(os.path.basename(path))
+        self.image_model.set_paths(paths)
+    
+    def append_image_paths(self, paths: List[str]):
+        """Add images to the end of the list."""
+        self.image_model.append_paths(paths)
+    
+    def get_image_status(self, image_path: str) -> Optional[int]:
+        """Processing status shown for an image."""
+        return self.image_model.status_of(image_path)
+    
+    def set_image_status(self, image_path: str, status: int):
+        """Update the processing status shown for an image."""
+        self.image_model.set_status(image_path, status)
+    
+    def reset_image_statuses(self):
+        """Mark all images as pending before a new run."""
+        self.image_model.reset_statuses()
+    
+    def set_current_row(self, row: int):
+        """Select a row of the image list."""
+        self.image_list.setCurrentIndex(self.image_model.index(row))
+    
+    def get_image_path_at(self, row: int) -> Optional[str]:
+        """Get the image path shown at a list row."""
+        return self.image_model.path_at(row)
     
     def set_output_directory(self, path: str):
         """Set output directory label."""
         self.output_dir_label.setText(path)
     
-    def get_current_model(self) -> str:
-        """Get selected model type."""
-        index = self.model_combo.currentIndex()
-        return 'doubao' if index == 0 else 'banana'
+    def get_model_types(self) -> List[str]:
+        """Get every model used by the selected jobs, once each, in order."""
+        return list(dict.fromkeys(model_type for chain in self.model_combo.currentData() for model_type in chain))
     
-    def get_model_params(self) -> Dict:
-        """Get current model parameters."""
-        model_type = self.get_current_model()
-        
+    def get_job_steps(self) -> List[List[Tuple[str, Dict]]]:
+        """Get each selected job as a chain of (model_type, model_params) steps."""
+        return [[(model_type, self._get_params_for(model_type)) for model_type in chain]
+                for chain in self.model_combo.currentData()]
+    
+    def get_local_preview_params(self) -> Optional[Tuple[float, float]]:
+        """
+        (smooth, whiten) to preview locally, or None if the local preview is
+        off, Doubao is not selected or the values are not valid.
+        
+        With a sweep, the first value of each parameter is previewed.
+        """
+        if not self.local_preview_check.isChecked() or 'doubao' not in self.get_model_types():
+            return None
+        try:
+            smooth = float(self._split_values(self.smooth_input.text())[0])
+            whiten = float(self._split_values(self.whiten_input.text())[0])
+        except (ValueError, IndexError):
+            return None
+        if not (0.0 <= smooth <= 1.0 and 0.0 <= whiten <= 1.0):
+            return None
+        return smooth, whiten
+    
+    def save_intermediate_results(self) -> bool:
+        """Whether results of intermediate chain steps are written too."""
+        return (any(len(chain) > 1 for chain in self.model_combo.currentData())
+                and self.save_intermediate_check.isChecked())
+    
+    def _on_dedup_toggled(self):
+        """Near-duplicate options only apply when dedup is on."""
+        enabled = self.dedup_check.isChecked()
+        self.near_duplicate_check.setEnabled(enabled)
+        self.near_threshold_spin.setEnabled(enabled and self.near_duplicate_check.isChecked())
+    
+    def is_dedup_enabled(self) -> bool:
+        """Whether duplicate images share one API call."""
+        return self.dedup_check.isChecked()
+    
+    def get_near_duplicate_threshold(self) -> Optional[int]:
+        """Max perceptual hash distance for near-duplicates, or None for exact duplicates only."""
+        if not self.near_duplicate_check.isChecked():
+            return None
+        return self.near_threshold_spin.value()
+    
+    def is_proxy_enabled(self) -> bool:
+        """Whether a low-resolution preview pass runs ahead of the full-resolution job."""
+        return self.proxy_check.isChecked()
+    
+    def is_tiling_enabled(self) -> bool:
+        """Whether oversized images are processed in tiles."""
+        return self.tiling_check.isChecked()
+    
+    def is_sweep_enabled(self) -> bool:
+        """Whether parameter fields hold lists of values to sweep over."""
+        return self.sweep_check.isChecked()
+    
+    def get_sweep_combinations(self) -> List[List[Tuple[str, Dict]]]:
+        """Get every combination of swept parameters of every job, each as a list of chain steps."""
+        from worker_threads import expand_param_grid
+        
+        combinations = []
+        for chain in self.model_combo.currentData():
+            per_step = [
+                [(model_type, params) for params in expand_param_grid(self._get_param_grid_for(model_type))]
+                for model_type in chain
+            ]
+            combinations.extend(list(steps) for steps in itertools.product(*per_step))
+        return combinations
+    
+    def _split_values(self, text: str) -> List[str]:
+        return [value.strip() for value in text.split(self.SWEEP_SEPARATOR) if value.strip()]
+    
+    def _get_param_grid_for(self, model_type: str) -> Dict[str, List]:
+        if model_type == 'doubao':
+            return {
+                'edit_type': [self.doubao_type_combo.currentText().split('(')[1].rstrip(')')],
+                'smooth': [float(value) for value in self._split_values(self.smooth_input.text())],
+                'whiten': [float(value) for value in self._split_values(self.whiten_input.text())]
+            }
+        else:  # banana
+            return {
+                'prompt': self._split_values(self.prompt_input.text())
+            }
+    
+    def _get_params_for(self, model_type: str) -> Dict:
         if model_type == 'doubao':
             return {
                 'edit_type': self.doubao_type_combo.currentText().split('(')[1].rstrip(')'),
@@ -352,6 +806,17 @@ class ConfigPanel(QWidget):
                 'prompt': self.prompt_input.text()
             }
     
+    def get_scheduling_policy(self) -> str:
+        """Get the selected task ordering policy."""
+        return self.scheduling_combo.currentData()
+    
+    def set_eta(self, seconds: Optional[float]):
+        """Show the estimated remaining time in the progress bar."""
+        if seconds is None:
+            self.progress_bar.setFormat('%v/%m')
+        else:
+            self.progress_bar.setFormat(f'%v/%m  剩余约 {format_duration(seconds)}')
+    
     def set_progress(self, current: int, total: int):
         """Update progress bar."""
         self.progress_bar.setVisible(True)
@@ -360,31 +825,72 @@ class ConfigPanel(QWidget):
         
         if current >= total:
             self.progress_bar.setVisible(False)
+            self.pool_status_label.setVisible(False)
+    
+    def set_pool_status(self, pools: List['PoolStatus']):
+        """Show busy workers, queued tasks and utilization of each model's pool."""
+        if not pools:
+            return
+        self.pool_status_label.setText('\n'.join(
+            f"{MODEL_NAMES.get(status.model_type, status.model_type)}: {status.active}/{status.workers} 忙碌 · "
+            f"排队 {status.queued} · 利用率 {status.utilization:.0%}"
+            for status in pools
+        ))
+        self.pool_status_label.setVisible(True)
     
     def set_processing_enabled(self, enabled: bool):
         """Enable/disable start button during processing."""
         self.start_btn.setEnabled(enabled)
         self.import_btn.setEnabled(enabled)
+        self.import_folder_btn.setEnabled(enabled)
     
     def get_selected_image_path(self) -> Optional[str]:
         """Get currently selected image path."""
-        row = self.image_list.currentRow()
-        if 0 <= row < len(self.image_paths):
-            return self.image_paths[row]
-        return None
+        index = self.image_list.currentIndex()
+        if not index.isValid():
+            return None
+        return self.image_model.path_at(index.row())
 
 
 class MainWindow(QMainWindow):
     """Main application window."""
     
+    # Emitted once modules deferred at startup have been loaded
+    startup_finished = pyqtSignal()
+    
+    # Images sent at low resolution first when the proxy preview is on
+    PROXY_IMAGE_COUNT = 3
+    
     def __init__(self, config_manager: ConfigManager):
         super().__init__()
         self.config_manager = config_manager
         self.output_directory = './output'
-        self.task_manager: Optional[TaskManager] = None
+        self.task_manager: Optional['TaskManager'] = None
+        self.importer: Optional[ImageImporter] = None
+        self.dedup_report: Optional[DedupReport] = None
+        self.dedup_finder: Optional[DuplicateFinder] = None
+        self._pending_start: Optional[tuple] = None
+        self.proxy_spec: Optional['TaskSpec'] = None
+        self.proxy_previews: Dict[str, QImage] = {}
+        self._first_painted = False
         
         self._init_ui()
         self._connect_signals()
+        startup_timer.mark('window_created')
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._first_painted:
+            self._first_painted = True
+            startup_timer.mark('first_paint')
+            # Fires when the event loop is idle again, i.e. the window accepts input
+            QTimer.singleShot(0, self._on_interactive)
+    
+    def _on_interactive(self):
+        """Load what was left out of startup, now that the window is usable."""
+        startup_timer.mark('interactive')
+        tracer.instant('interactive', 'startup')
+        preload_in_background(on_done=self.startup_finished.emit)
     
     def _init_ui(self):
         self.setWindowTitle('AI 批量图片修改工具')
@@ -412,17 +918,24 @@ class MainWindow(QMainWindow):
         
         main_layout.addWidget(splitter)
     
+        # Preview cache memory usage
+        self.cache_status_label = QLabel()
+        self.statusBar().addPermanentWidget(self.cache_status_label)
+        self._on_cache_usage_changed(0, self.preview_panel.cache.max_bytes)
+    
     def _connect_signals(self):
         """Connect signals between components."""
         self.config_panel.import_clicked.connect(self._on_import_images)
+        self.config_panel.import_folder_clicked.connect(self._on_import_folder)
         self.config_panel.api_config_clicked.connect(self._on_api_config)
         self.config_panel.output_dir_clicked.connect(self._on_select_output_dir)
         self.config_panel.start_processing.connect(self._on_start_processing)
         
+        self.preview_panel.cache.usage_changed.connect(self._on_cache_usage_changed)
+        
         # Connect image list selection to preview
-        self.config_panel.image_list.currentRowChanged.connect(
-            lambda row: self._on_image_selected(row)
-        )
+        self.config_panel.image_selected.connect(self._on_image_selected)
+        self.config_panel.doubao_params_changed.connect(self._update_local_preview)
     
     def _on_import_images(self):
         """Handle image import button click."""
@@ -436,10 +949,52 @@ class MainWindow(QMainWindow):
         )
         
         if files:
+            self._cancel_import()
             self.config_panel.set_image_paths(files)
             # Auto-select first image
             if files:
-                self.config_panel.image_list.setCurrentRow(0)
+                self.config_panel.set_current_row(0)
+            
+            # Probe headers in the background for the scheduler and encoder
+            self.importer = ImageImporter(paths=files)
+            self.importer.start()
+    
+    def _on_import_folder(self):
+        """Handle folder import button click."""
+        from PyQt6.QtWidgets import QFileDialog
+        
+        directory = QFileDialog.getExistingDirectory(self, '选择图片文件夹')
+        if not directory:
+            return
+        
+        self._cancel_import()
+        self.config_panel.set_image_paths([])
+        self.statusBar().showMessage(f'正在扫描 {directory} ...')
+        
+        self.importer = ImageImporter(root=directory)
+        self.importer.images_found.connect(self._on_images_found)
+        self.importer.finished.connect(self._on_import_finished)
+        self.importer.start()
+    
+    def _cancel_import(self):
+        """Stop a folder scan that is still running."""
+        if self.importer is not None:
+            self.importer.cancel()
+            self.importer = None
+    
+    def _on_images_found(self, paths: List[str]):
+        """Add a batch of scanned images to the list."""
+        if self.sender() is not self.importer:
+            return
+        first_batch = not self.config_panel.image_paths
+        self.config_panel.append_image_paths(paths)
+        if first_batch:
+            self.config_panel.set_current_row(0)
+    
+    def _on_import_finished(self, count: int):
+        """Report the result of a folder scan."""
+        if self.sender() is self.importer:
+            self.statusBar().showMessage(f'已导入 {count} 张图片', 5000)
     
     def _on_image_selected(self, row: int):
         """Handle image selection in list."""
@@ -447,6 +1002,36 @@ class MainWindow(QMainWindow):
         if image_path:
             self.preview_panel.set_original_image(image_path)
             self.preview_panel.clear_processed()
+            if self.task_manager is not None:
+                self.task_manager.set_preview_target(image_path, self.preview_panel.processed_decode_size())
+            self._show_or_request_proxy(image_path)
+            if self.preview_panel.processed_preview is None:
+                self._update_local_preview()
+    
+            # Warm the cache for arrow-key navigation
+            neighbours = [self.config_panel.get_image_path_at(i) for i in (row + 1, row - 1)]
+            self.preview_panel.prefetch([path for path in neighbours if path])
+    
+    def _update_local_preview(self):
+        """Preview the Doubao parameters on the selected image locally, as they are edited."""
+        params = self.config_panel.get_local_preview_params()
+        if params is not None:
+            self.preview_panel.show_local_preview(*params)
+        elif self.preview_panel.local_preview_params is not None:
+            self.preview_panel.clear_processed()
+    
+    def _show_or_request_proxy(self, image_path: str):
+        """While processing, preview the selected image at low resolution until it is done."""
+        if image_path in self.proxy_previews:
+            self.preview_panel.set_processed_proxy(self.proxy_previews[image_path])
+        elif (self.proxy_spec is not None and self.task_manager is not None and self.task_manager.is_running
+              and self.config_panel.get_image_status(image_path) == ImageListModel.STATUS_PENDING):
+            self.task_manager.add_proxies(self.proxy_spec, [image_path], metadata_store)
+    
+    def _on_cache_usage_changed(self, used_bytes: int, max_bytes: int):
+        """Show preview cache memory usage in the status bar."""
+        mb = 1024 * 1024
+        self.cache_status_label.setText(f'预览缓存: {used_bytes / mb:.0f} / {max_bytes / mb:.0f} MB')
     
     def _on_api_config(self):
         """Handle API configuration button click."""
@@ -474,61 +1059,175 @@ class MainWindow(QMainWindow):
     
     def _on_start_processing(self):
         """Handle start processing button click."""
+        from worker_threads import TaskSpec, build_sweep_specs
         # Validation
         image_paths = self.config_panel.image_paths
         if not image_paths:
             QMessageBox.warning(self, '提示', '请先导入图片！')
             return
+        if self.importer is not None and self.importer.root is not None and self.importer.is_running():
+            # The batch covers the images listed when it starts; wait for the whole folder
+            QMessageBox.warning(self, '提示', '正在扫描文件夹，请等待导入完成后再开始处理！')
+            return
         
-        # Check API configuration
+        # Check API configuration of every model in the selected jobs
         config = self.config_manager.get_config()
-        model_type = self.config_panel.get_current_model()
         
-        if model_type == 'doubao':
-            if not config['doubao_api_url'] or not config['doubao_api_key']:
-                QMessageBox.warning(self, '配置错误', '请先配置豆包 API！')
-                return
-        else:  # banana
-            if not all([config['banana_api_url'], config['banana_api_key'], config['banana_model_key']]):
-                QMessageBox.warning(self, '配置错误', '请先配置 Banana API！')
-                return
+        for model_type in self.config_panel.get_model_types():
+            if model_type == 'doubao':
+                if not config['doubao_api_url'] or not config['doubao_api_key']:
+                    QMessageBox.warning(self, '配置错误', '请先配置豆包 API！')
+                    return
+            else:  # banana
+                if not all([config['banana_api_url'], config['banana_api_key'], config['banana_model_key']]):
+                    QMessageBox.warning(self, '配置错误', '请先配置 Banana API！')
+                    return
+        
+        try:
+            if self.config_panel.is_sweep_enabled():
+                combinations = self.config_panel.get_sweep_combinations()
+            else:
+                combinations = self.config_panel.get_job_steps()
+        except ValueError:
+            QMessageBox.warning(self, '参数错误', '磨皮/美白强度必须是 0-1 之间的数字！')
+            return
+        if not combinations:
+            QMessageBox.warning(self, '参数错误', '请至少填写一组参数！')
+            return
         
         # Create output directory if not exists
         os.makedirs(self.output_directory, exist_ok=True)
         
-        # Prepare tasks
-        model_params = self.config_panel.get_model_params()
-        tasks = [
-            ProcessingTask(path, self.output_directory, model_type, model_params)
-            for path in image_paths
-        ]
+        # Tiles have to fit every model of the jobs
+        tiling = None
+        if self.config_panel.is_tiling_enabled():
+            settings = [self.config_manager.get_tile_settings(model) for model in self.config_panel.get_model_types()]
+            tiling = (min(size for size, _ in settings), max(overlap for _, overlap in settings))
+        
+        # Tasks are created as the queue drains; follow-up steps are queued as each step finishes
+        save_intermediate = self.config_panel.save_intermediate_results()
+        if self.config_panel.is_sweep_enabled() or len(combinations) > 1:
+            # Parameter combinations and side-by-side jobs each get a subdirectory;
+            # every image is encoded once per first model and shared by them
+            specs = build_sweep_specs(self.output_directory, combinations, save_intermediate, tiling)
+        else:
+            specs = [TaskSpec(self.output_directory, combinations[0], save_intermediate, tiling)]
+        
+        # Only one image per group of duplicates is sent; the others get copies.
+        # Hashing reads every file, so the batch starts once it has finished
+        self.dedup_report = None
+        self.config_panel.set_processing_enabled(False)
+        if self.config_panel.is_dedup_enabled():
+            self._pending_start = (config, specs, combinations)
+            self.dedup_finder = DuplicateFinder(image_paths, self.config_panel.get_near_duplicate_threshold())
+            self.dedup_finder.finished.connect(self._on_duplicates_found)
+            self.statusBar().showMessage('正在查找重复图片...')
+            self.dedup_finder.start()
+            return
+        self._start_batch(image_paths, config, specs)
+    
+    def _on_duplicates_found(self, report: DedupReport):
+        """Start the batch with one image per group of duplicates."""
+        if self.sender() is not self.dedup_finder:
+            return
+        self.dedup_finder = None
+        config, specs, combinations = self._pending_start
+        self._pending_start = None
+        report.calls_per_image = sum(len(steps) for steps in combinations)
+        self.dedup_report = report
+        self.statusBar().showMessage(report.summary())
+        self._start_batch(report.representatives, config, specs)
+    
+    def _start_batch(self, image_paths: List[str], config: Dict, specs: List['TaskSpec']):
+        """Create the task manager for the images and start processing."""
+        from worker_threads import TaskManager, TaskSource
+        
+        duplicates = self.dedup_report.duplicates if self.dedup_report is not None else None
+        source = TaskSource(image_paths, specs, metadata_store, duplicates)
         
         # Setup task manager
-        self.task_manager = TaskManager(max_workers=5)
+        output_encoder = OutputEncoder(**self.config_panel.get_output_options())
+        validator = ResultValidator(full_decode=self.config_panel.is_full_validation_enabled())
+        self.task_manager = TaskManager(
+            max_workers=5, output_encoder=output_encoder, policy=self.config_panel.get_scheduling_policy(),
+            validator=validator
+        )
         self.task_manager.progress_update.connect(self.config_panel.set_progress)
-        self.task_manager.task_completed.connect(self._on_task_completed)
+        self.task_manager.batch_progress.connect(self._on_progress_batch)
         self.task_manager.all_completed.connect(self._on_all_completed)
         
         # Start processing
-        self.config_panel.set_processing_enabled(False)
-        self.task_manager.add_tasks(tasks)
+        self.config_panel.reset_image_statuses()
+        self.task_manager.set_preview_target(self.config_panel.get_selected_image_path(),
+                                             self.preview_panel.processed_decode_size())
+        self.task_manager.add_source(source)
+        
+        # Downscaled copies of the selected and first images go first, for a quick look
+        self.proxy_previews = {}
+        self.proxy_spec = specs[0].make_proxy() if self.config_panel.is_proxy_enabled() else None
+        if self.proxy_spec is not None:
+            selected = self.config_panel.get_selected_image_path()
+            first = [image_paths[row] for row in range(min(self.PROXY_IMAGE_COUNT, len(image_paths)))]
+            proxy_paths = list(dict.fromkeys(path for path in [selected] + first if path))
+            self.task_manager.add_proxies(self.proxy_spec, proxy_paths, metadata_store)
         self.task_manager.start(config)
     
-    def _on_task_completed(self, image_path: str, success: bool, error_message: str):
+    def _on_progress_batch(self, batch: 'ProgressBatch'):
+        """Apply a batch of task events from the task manager."""
+        self.config_panel.set_eta(batch.eta_seconds)
+        self.config_panel.set_pool_status(batch.pools)
+        for image_path in batch.started:
+            self.config_panel.set_image_status(image_path, ImageListModel.STATUS_RUNNING)
+        
+        for result in batch.results:
+            self._on_task_completed(result)
+    
+        for proxy in batch.proxies:
+            self._on_proxy_completed(proxy)
+    
+    def _on_proxy_completed(self, result: 'TaskResult'):
+        """Show a low-resolution proxy result, unless the final output is already in."""
+        if self.config_panel.get_image_status(result.image_path) == ImageListModel.STATUS_DONE:
+            return
+        self.proxy_previews[result.image_path] = result.preview
+        if self.config_panel.get_selected_image_path() == result.image_path:
+            self.preview_panel.set_processed_proxy(result.preview)
+    
+    def _on_task_completed(self, result: 'TaskResult'):
         """Handle task completion."""
-        if success:
-            # Find output path and update preview
-            base_name = os.path.splitext(os.path.basename(image_path))[0]
-            output_path = os.path.join(self.output_directory, f"{base_name}_processed.png")
-            
-            # Update preview if this is the currently selected image
+        tracer.end_async('ui_signal', result.image_path, 'ui')
+        self.proxy_previews.pop(result.image_path, None)
+        self.config_panel.set_image_status(
+            result.image_path, ImageListModel.STATUS_DONE if result.success else ImageListModel.STATUS_FAILED
+        )
+        if result.success and result.output_path:
+            # Update preview if this is the currently selected image; the
+            # worker decoded it from memory if it was selected in time
             current_selection = self.config_panel.get_selected_image_path()
-            if current_selection == image_path:
-                self.preview_panel.set_processed_image(output_path)
+            if current_selection == result.image_path:
+                self.preview_panel.set_processed_image(result.output_path, result.preview)
     
     def _on_all_completed(self, success_count: int, failure_count: int):
         """Handle all tasks completion."""
         self.config_panel.set_processing_enabled(True)
+        self.proxy_spec = None
+        self.proxy_previews = {}
+        
+        if tracer.enabled:
+            tracer.stop_profiler()
+            tracer.export_chrome_trace()
         
         message = f'处理完成！\n成功: {success_count}\n失败: {failure_count}'
+        if self.dedup_report is not None:
+            message += '\n' + self.dedup_report.summary()
+        pools = self.task_manager.pool_status() if self.task_manager else []
+        if len(pools) > 1:
+            message += '\n\n并发池利用率：\n' + '\n'.join(
+                f"{MODEL_NAMES.get(status.model_type, status.model_type)}: {status.workers} 线程, "
+                f"{status.completed} 个任务, 利用率 {status.utilization:.0%}"
+                for status in pools
+            )
+        endpoint_lines = self.task_manager.endpoint_report() if self.task_manager else []
+        if len(endpoint_lines) > 1:
+            message += '\n\n接口负载：\n' + '\n'.join(endpoint_lines)
         QMessageBox.information(self, '批量处理完成', message)
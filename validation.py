@@ -0,0 +1,139 @@
+import os
+import time
+import threading
+from io import BytesIO
+from typing import Optional, Tuple
+import logging
+
+from output_encoder import detect_format
+
+logger = logging.getLogger(__name__)
+
+# A result may be at most this many times smaller or larger than its input, per side
+MAX_SCALE_CHANGE = 16
+
+# Allowed relative difference between the input's and the result's aspect ratio
+MAX_ASPECT_CHANGE = 0.25
+
+# End markers are looked for this far from the end, allowing for trailing padding
+_TAIL_BYTES = 4096
+
+
+def is_complete(data: bytes, image_format: str) -> bool:
+    """Whether encoded image bytes end like a whole file (cheap truncation check)."""
+    tail = data[-_TAIL_BYTES:]
+    if image_format == 'png':
+        return b'IEND\xaeB`\x82' in tail
+    if image_format == 'jpeg':
+        return b'\xff\xd9' in tail
+    if image_format == 'webp':
+        return len(data) >= int.from_bytes(data[4:8], 'little') + 8
+    return True
+
+
+def check_dimensions(size: Tuple[int, int], input_size: Optional[Tuple[int, int]]) -> Optional[str]:
+    """
+    Compare a result's dimensions with its input's.
+    
+    Models may rescale or rotate an image, but not change its shape or
+    size beyond MAX_ASPECT_CHANGE and MAX_SCALE_CHANGE.
+    
+    Returns:
+        An error message, or None if the dimensions are plausible
+    """
+    width, height = size
+    if width <= 0 or height <= 0:
+        return f'empty {width}x{height} image'
+    if input_size is None:
+        return None
+    
+    input_width, input_height = input_size
+    for expected_width, expected_height in ((input_width, input_height), (input_height, input_width)):
+        scale_x, scale_y = width / expected_width, height / expected_height
+        if (all(1 / MAX_SCALE_CHANGE <= scale <= MAX_SCALE_CHANGE for scale in (scale_x, scale_y))
+                and abs(scale_x / scale_y - 1) <= MAX_ASPECT_CHANGE):
+            return None
+    return f'{width}x{height} result for a {input_width}x{input_height} input'
+
+
+def _full_decode(data: bytes) -> Optional[str]:
+    from PIL import Image
+    
+    try:
+        with Image.open(BytesIO(data)) as img:
+            img.load()
+    except Exception as e:
+        return f'decode failed: {str(e)}'
+    return None
+
+
+class ResultValidator:
+    """
+    Checks API results before they are written.
+    
+    Signature, end marker and header dimensions are checked on the calling
+    worker thread, which costs well under a millisecond. The optional full
+    decode runs there too, but only max_workers at a time, so that a burst
+    of results cannot occupy every core. Time spent is summed for the
+    end-of-run report.
+    """
+    
+    def __init__(self, full_decode: bool = False, max_workers: Optional[int] = None):
+        self.full_decode = full_decode
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.checked = 0
+        self.rejected = 0
+        self.seconds = 0.0
+        self._decode_slots = threading.BoundedSemaphore(self.max_workers)
+        self._lock = threading.Lock()
+    
+    def validate(self, data: Optional[bytes], input_size: Optional[Tuple[int, int]] = None) -> Optional[str]:
+        """
+        Check one result.
+        
+        Args:
+            data: Encoded image returned by the API
+            input_size: (width, height) of the image that was sent, if known
+        
+        Returns:
+            Why the result is invalid, or None if it is fine
+        """
+        started = time.perf_counter()
+        error = self._check(data, input_size)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.checked += 1
+            self.rejected += error is not None
+            self.seconds += elapsed
+        return error
+    
+    def _check(self, data: Optional[bytes], input_size: Optional[Tuple[int, int]]) -> Optional[str]:
+        if not data:
+            return 'empty response'
+        image_format = detect_format(data)
+        if image_format is None:
+            # Typically an HTML or JSON error page
+            return f'not an image (starts with {data[:16]!r})'
+        if not is_complete(data, image_format):
+            return f'truncated {image_format.upper()} data ({len(data)} bytes)'
+        
+        from PIL import Image
+        
+        try:
+            with Image.open(BytesIO(data)) as img:
+                size = img.size
+        except Exception as e:
+            return f'unreadable {image_format.upper()} header: {str(e)}'
+        error = check_dimensions(size, input_size)
+        if error is not None or not self.full_decode:
+            return error
+        with self._decode_slots:
+            return _full_decode(data)
+    
+    def summary(self, api_seconds: float) -> str:
+        """Validation count, rejections and cost relative to the time spent waiting for the API."""
+        with self._lock:
+            checked, rejected, seconds = self.checked, self.rejected, self.seconds
+        per_result = seconds / checked * 1000 if checked else 0.0
+        share = f", {seconds / api_seconds:.2%} of API time" if api_seconds > 0 else ''
+        return f"Result validation: {checked} checked, {rejected} rejected, {per_result:.2f} ms each{share}"
@@ -1,101 +1,750 @@
 import os
-from queue import Queue
+import time
+import re
+import json
+import base64
+import itertools
+import threading
+from queue import PriorityQueue, Empty
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 from threading import Thread
-from typing import List, Dict, Callable, Optional
-from PyQt6.QtCore import QObject, pyqtSignal, QMutex
+from collections import deque
+from typing import List, Dict, Callable, Optional, Sequence, Tuple
+from PyQt6.QtCore import QObject, pyqtSignal, QMutex, QTimer, QSize
+from PyQt6.QtGui import QImage
 import logging
 
 from api_clients import DoubaoClient, BananaClient, image_to_base64
+from tracing import tracer, schedule_profile_window
+from buffers import copy_stats
+from image_import import ImageInfo, ImageMetadataStore, probe_image
+from output_encoder import OutputEncoder, OUTPUT_FORMATS, atomic_copy, atomic_write, detect_format
+from tiling import Tile, TiledImage, needs_tiling
+from endpoint_pool import EndpointPool, build_endpoint_pools
+from scheduling import CostModel, RemainingWork, estimate_megapixels
+from thumbnail_cache import decode_scaled_image
+from validation import ResultValidator
 
 logger = logging.getLogger(__name__)
 
+# Longest side, in pixels, of the downscaled copies sent by a proxy pass
+PROXY_MAX_DIMENSION = 512
 
-class ProcessingTask:
-    """Represents a single image processing task."""
+
+class SharedPayload:
+    """
+    Base64 payload of one image, shared by every task that sends it.
+    
+    The first task to need it encodes the image; the others reuse the same
+    buffer. It is dropped once the last task using it has taken it.
+    """
     
-    def __init__(self, image_path: str, output_dir: str, model_type: str, model_params: Dict):
+    def __init__(self, image_path: str, image_info: Optional[ImageInfo] = None, users: int = 1):
         self.image_path = image_path
+        self.image_info = image_info
+        self.users = users
+        self.encode_count = 0
+        self._payload: Optional[bytes] = None
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> bytes:
+        """Get the payload, encoding it on first use; counts as one use."""
+        with self._lock:
+            payload = self._payload
+            if payload is None:
+                payload = image_to_base64(self.image_path, self.image_info)
+                self.encode_count += 1
+            self.users -= 1
+            # Keep the buffer only while further tasks still need it
+            self._payload = payload if self.users > 0 else None
+            return payload
+
+
+def expand_param_grid(param_grid: Dict[str, List]) -> List[Dict]:
+    """Turn {'smooth': [0.6, 0.8], 'whiten': [0.5]} into one params dict per combination."""
+    keys = list(param_grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(param_grid[key] for key in keys))]
+
+
+def sweep_label(steps: List[Tuple[str, Dict]]) -> str:
+    """Directory name for one parameter combination, e.g. 'doubao_smooth-0.8_whiten-0.6'."""
+    parts = []
+    for model_type, params in steps:
+        values = '_'.join(f"{key}-{value}" for key, value in params.items())
+        parts.append(f"{model_type}_{values}" if values else model_type)
+    label = re.sub(r'[^\w.\-]+', '-', '__'.join(parts), flags=re.UNICODE).strip('-')
+    return label[:120]
+
+
+_interned_params: Dict[tuple, Dict] = {}
+_interned_lock = threading.Lock()
+
+
+def intern_params(params: Dict) -> Dict:
+    """Return one shared dict per distinct set of model parameters."""
+    try:
+        key = tuple(sorted(params.items()))
+    except TypeError:
+        # Unhashable or unorderable values: keep the dict as it is
+        return params
+    with _interned_lock:
+        return _interned_params.setdefault(key, params)
+
+
+def build_sweep_specs(output_dir: str, combinations: List[List[Tuple[str, Dict]]],
+                      save_intermediate: bool = False,
+                      tiling: Optional[Tuple[int, int]] = None) -> List['TaskSpec']:
+    """
+    Create one spec per parameter combination of a parameter sweep (or
+    per job run side by side).
+    
+    Results go to one subdirectory of output_dir per combination, listed in
+    sweep.json. Used with a TaskSource, each image is encoded once per first
+    model and its payload shared by its tasks for those combinations.
+    """
+    specs = []
+    manifest = {}
+    for index, steps in enumerate(combinations):
+        label = f"{index + 1:02d}_{sweep_label(steps)}"
+        specs.append(TaskSpec(os.path.join(output_dir, label), steps, save_intermediate, tiling))
+        manifest[label] = [{'model': model_type, 'params': params} for model_type, params in steps]
+    
+    for spec in specs:
+        os.makedirs(spec.output_dir, exist_ok=True)
+    atomic_write(os.path.join(output_dir, 'sweep.json'),
+                 json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+    return specs
+    
+
+class TaskSpec:
+    """
+    Settings shared by all tasks of a batch (or of one sweep combination).
+    
+    With proxy_size set, tasks send a copy downscaled to that many pixels
+    and their results are only previewed, never written.
+    """
+    
+    __slots__ = ('output_dir', 'steps', 'save_intermediate', 'tiling', 'proxy_size')
+    
+    def __init__(self, output_dir: str, steps: List[Tuple[str, Dict]],
+                 save_intermediate: bool = False, tiling: Optional[Tuple[int, int]] = None,
+                 proxy_size: int = 0):
         self.output_dir = output_dir
-        self.model_type = model_type
-        self.model_params = model_params
+        self.steps = tuple((model_type, intern_params(params)) for model_type, params in steps)
+        self.save_intermediate = save_intermediate
+        self.tiling = tiling
+        self.proxy_size = proxy_size
+    
+    @property
+    def model_types(self) -> List[str]:
+        return [model_type for model_type, _ in self.steps]
+    
+    def make_proxy(self, max_dimension: int = PROXY_MAX_DIMENSION) -> 'TaskSpec':
+        """Spec for a quick low-resolution preview of this spec's chain."""
+        return TaskSpec(self.output_dir, self.steps, proxy_size=max_dimension)
+
+
+class ProcessingTask:
+    """
+    Represents a single image processing task.
+    
+    A task may be one step of a chain of models: each step's result bytes
+    are handed in memory to a follow-up task for the next step, which is
+    queued as soon as the previous step finishes.
+    
+    With tiling set to (tile_size, overlap), an image larger than tile_size
+    is split by its worker into one follow-up task per tile; the tiles run
+    through the whole chain and are stitched back by the last of them.
+    
+    Tasks are slotted and keep everything they share with the rest of the
+    batch (output directory, chain, parameters) in their TaskSpec.
+    """
+    
+    __slots__ = ('spec', 'image_path', 'image_info', 'step_index', 'success', 'error_message',
+                 'output_path', 'enqueued_at', 'api_seconds', 'input_bytes', 'payload', 'result_bytes',
+                 'preview', 'follow_ups', 'tile', 'tiled_image', 'partial', 'duplicate_paths', 'duplicate_outputs')
+    
+    def __init__(self, spec: TaskSpec, image_path: str, image_info: Optional[ImageInfo] = None,
+                 step_index: int = 0):
+        self.spec = spec
+        self.image_path = image_path
+        self.image_info = image_info
         self.success = False
         self.error_message = None
         self.output_path = None
+        self.enqueued_at = 0.0
+        self.api_seconds = 0.0
+        
+        # Model chain support
+        self.step_index = step_index
+        self.input_bytes: Optional[bytes] = None
+        self.payload: Optional[SharedPayload] = None
+        self.result_bytes: Optional[bytes] = None
+        self.preview: Optional[QImage] = None  # display-sized decode of the result, if requested
+        self.follow_ups: Sequence['ProcessingTask'] = ()
+        
+        # Tiling support
+        self.tile: Optional[Tile] = None
+        self.tiled_image: Optional[TiledImage] = None
+        self.partial = False  # finished a tile without finishing the image
+    
+        # Duplicates of this image that get a copy of its result
+        self.duplicate_paths: Sequence[str] = ()
+        self.duplicate_outputs: Optional[Dict[str, Optional[str]]] = None
+    
+    @property
+    def output_dir(self) -> str:
+        return self.spec.output_dir
+    
+    @property
+    def model_type(self) -> str:
+        return self.spec.steps[self.step_index][0]
+    
+    @property
+    def model_params(self) -> Dict:
+        return self.spec.steps[self.step_index][1]
+    
+    @property
+    def save_intermediate(self) -> bool:
+        return self.spec.save_intermediate
+    
+    @property
+    def tiling(self) -> Optional[Tuple[int, int]]:
+        return self.spec.tiling
+    
+    @property
+    def is_last_step(self) -> bool:
+        return self.step_index + 1 >= len(self.spec.steps)
+    
+    @property
+    def is_proxy(self) -> bool:
+        return bool(self.spec.proxy_size)
+    
+    @property
+    def megapixels(self) -> float:
+        """Estimated size of the image (or tile) sent by this task."""
+        return estimate_megapixels(self.image_path, self.image_info, self.tile)
+    
+    @property
+    def remaining_models(self) -> List[str]:
+        """Models this task and its follow-up chain steps still have to call."""
+        return [model_type for model_type, _ in self.spec.steps[self.step_index:]]
+    
+    def make_next_task(self) -> 'ProcessingTask':
+        """Create the task for the next chain step, fed with this step's result."""
+        task = ProcessingTask(self.spec, self.image_path, self.image_info, self.step_index + 1)
+        task.input_bytes = self.result_bytes
+        task.tile = self.tile
+        task.tiled_image = self.tiled_image
+        task.duplicate_paths = self.duplicate_paths
+        return task
+    
+    def make_tile_tasks(self, tiled_image: TiledImage) -> List['ProcessingTask']:
+        """Create one task per tile of this task's image."""
+        tasks = []
+        for tile in tiled_image.tiles:
+            task = ProcessingTask(self.spec, self.image_path, self.image_info, self.step_index)
+            task.tile = tile
+            task.tiled_image = tiled_image
+            task.duplicate_paths = self.duplicate_paths
+            tasks.append(task)
+        return tasks
+
+
+class TaskSource:
+    """
+    Creates the tasks of a batch lazily, as the queue drains.
+    
+    Until its tasks are created an image costs one entry of image_paths.
+    Each first model of the specs has a cursor of its own, so every model's
+    pool is refilled at its own pace. With several specs (a parameter sweep,
+    or jobs run side by side) a model's tasks are created image by image;
+    its specs share one encoded payload, which is released soon after it
+    was encoded.
+    """
+    
+    def __init__(self, image_paths: Sequence[str], specs: List[TaskSpec],
+                 metadata: Optional[ImageMetadataStore] = None,
+                 duplicates: Optional[Dict[str, List[str]]] = None):
+        self.image_paths = image_paths
+        # Fixed when the batch starts: the list may still grow (e.g. by a folder import)
+        self._image_count = len(image_paths)
+        self.specs = specs
+        self.metadata = metadata
+        self.duplicates = duplicates or {}
+        # Specs, position and current payload per first model: a payload
+        # shared across pools would stay alive until the slowest took it
+        self._model_specs: Dict[str, List[TaskSpec]] = {}
+        for spec in specs:
+            self._model_specs.setdefault(spec.steps[0][0], []).append(spec)
+        self._positions = dict.fromkeys(self._model_specs, 0)
+        self._payloads: Dict[str, SharedPayload] = {}
+        # Indices into image_paths in the order tasks are created; None for list order
+        self._order: Optional[List[int]] = None
+    
+    @property
+    def first_models(self) -> List[str]:
+        """Models whose pools receive the tasks created by take()."""
+        return list(self._model_specs)
+    
+    @property
+    def task_count(self) -> int:
+        return self._image_count * len(self.specs)
+    
+    @property
+    def result_count(self) -> int:
+        """Results the source will deliver, duplicates included."""
+        duplicate_count = sum(len(paths) for paths in self.duplicates.values())
+        return (self._image_count + duplicate_count) * len(self.specs)
+    
+    @property
+    def exhausted(self) -> bool:
+        """Whether every task has been created."""
+        return all(self._positions[model_type] >= self._image_count * len(specs)
+                   for model_type, specs in self._model_specs.items())
+    
+    def _image_info(self, image_path: str) -> Optional[ImageInfo]:
+        return self.metadata.get(image_path) if self.metadata is not None else None
+    
+    def add_remaining_work(self, remaining_work: RemainingWork):
+        """Account for all tasks of the source, without creating them."""
+        megapixels = sum(estimate_megapixels(self.image_paths[index], self._image_info(self.image_paths[index]))
+                         for index in range(self._image_count))
+        for spec in self.specs:
+            remaining_work.add(spec.model_types, megapixels, self._image_count)
+    
+    def order_by_size(self, largest_first: bool = False):
+        """
+        Create tasks in order of image size instead of list order.
+        
+        The scheduling policy only reorders the tasks already queued, so
+        without this a large image near the end of a batch would still start
+        near the end under 'ljf'. Sizes come from the headers probed at import.
+        """
+        megapixels = [estimate_megapixels(self.image_paths[index], self._image_info(self.image_paths[index]))
+                      for index in range(self._image_count)]
+        self._order = sorted(range(self._image_count), key=megapixels.__getitem__, reverse=largest_first)
+    
+    def take(self, model_type: str, count: int) -> List[ProcessingTask]:
+        """Create up to count further tasks for a first model; an empty list once it has all."""
+        specs = self._model_specs.get(model_type, [])
+        spec_count = len(specs)
+        start = self._positions.get(model_type, 0)
+        end = min(start + count, self._image_count * spec_count)
+        tasks = []
+        for position in range(start, end):
+            image_index, spec_index = divmod(position, spec_count)
+            if self._order is not None:
+                image_index = self._order[image_index]
+            image_path = self.image_paths[image_index]
+            image_info = self._image_info(image_path)
+            payload = None
+            if spec_count > 1:
+                if spec_index == 0:
+                    self._payloads[model_type] = SharedPayload(image_path, image_info, spec_count)
+                payload = self._payloads[model_type]
+                image_info = payload.image_info
+            
+            task = ProcessingTask(specs[spec_index], image_path, image_info)
+            task.payload = payload
+            task.duplicate_paths = self.duplicates.get(image_path, ())
+            tasks.append(task)
+        if start < end:
+            self._positions[model_type] = end
+        if end >= self._image_count * spec_count:
+            self._payloads.pop(model_type, None)
+        return tasks
+
+
+class TaskResult:
+    """Outcome of a single task, as delivered to the UI."""
+    
+    def __init__(self, image_path: str, success: bool, error_message: str, output_path: Optional[str],
+                 preview: Optional[QImage] = None):
+        self.image_path = image_path
+        self.success = success
+        self.error_message = error_message
+        self.output_path = output_path  # where the worker actually wrote the result
+        self.preview = preview  # decoded by the worker at display size, if requested
+
+
+class PoolStatus:
+    """Load of one model's worker pool, as shown in the UI."""
+    
+    def __init__(self, model_type: str, workers: int, active: int, queued: int, completed: int,
+                 utilization: float):
+        self.model_type = model_type
+        self.workers = workers
+        self.active = active  # workers busy with a task
+        self.queued = queued
+        self.completed = completed
+        self.utilization = utilization  # share of worker time spent on tasks since the pool started
+    
+    @property
+    def key(self) -> Tuple:
+        """What the UI shows; a new status is only sent when it changes."""
+        return self.model_type, self.workers, self.active, self.queued, round(self.utilization * 100)
+
+
+class ModelPool:
+    """
+    Queue and worker threads of one model.
+    
+    Every model runs on workers of its own, so a backlog of slow requests
+    to one model never holds up the tasks of another.
+    """
+    
+    def __init__(self, model_type: str, workers: int):
+        self.model_type = model_type
+        self.workers = workers
+        self.queue = PriorityQueue()
+        self.completed = 0
+        self.started_at: Optional[float] = None
+        self._busy_since: Dict[int, float] = {}  # worker thread ident -> task start
+        self._busy_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def begin_task(self):
+        with self._lock:
+            self._busy_since[threading.get_ident()] = time.perf_counter()
+    
+    def end_task(self):
+        with self._lock:
+            started = self._busy_since.pop(threading.get_ident(), None)
+            if started is not None:
+                self._busy_seconds += time.perf_counter() - started
+            self.completed += 1
+    
+    def status(self) -> PoolStatus:
+        with self._lock:
+            now = time.perf_counter()
+            active = len(self._busy_since)
+            busy = self._busy_seconds + sum(now - started for started in self._busy_since.values())
+            elapsed = now - self.started_at if self.started_at is not None else 0.0
+            utilization = min(1.0, busy / (self.workers * elapsed)) if elapsed > 0 and self.workers else 0.0
+            return PoolStatus(self.model_type, self.workers, active, self.queue.qsize(), self.completed,
+                              utilization)
+
+
+class ProgressBatch:
+    """Task events coalesced between two UI updates."""
+    
+    def __init__(self, started: List[str], results: List[TaskResult],
+                 completed_count: int, total_tasks: int, eta_seconds: Optional[float] = None,
+                 proxies: Optional[List[TaskResult]] = None, pools: Optional[List[PoolStatus]] = None):
+        self.started = started
+        self.pools = pools or []  # one status per model with a worker pool
+        self.results = results
+        self.proxies = proxies or []  # low-resolution previews; not counted as completed
+        self.completed_count = completed_count
+        self.total_tasks = total_tasks
+        self.eta_seconds = eta_seconds
+        self.success_delta = sum(1 for result in results if result.success)
+        self.failure_delta = len(results) - self.success_delta
 
 
 class WorkerThread(Thread):
     """Worker thread for processing a single image."""
     
+    # Requests per task while the API returns results that fail validation
+    MAX_RESULT_ATTEMPTS = 3
+    
     def __init__(self, task: ProcessingTask, config: Dict[str, str], 
-                 progress_callback: Optional[Callable[[str, bool, Optional[str]], None]] = None):
+                 progress_callback: Optional[Callable[[ProcessingTask], None]] = None,
+                 output_encoder: Optional[OutputEncoder] = None,
+                 endpoint_pools: Optional[Dict[str, EndpointPool]] = None,
+                 preview_size: Optional[QSize] = None,
+                 validator: Optional[ResultValidator] = None,
+                 finisher: Optional[Executor] = None):
         super().__init__()
         self.task = task
+        self.finisher = finisher  # runs the completion of transcoded outputs
+        self.preview_size = preview_size  # decode a preview of the result at this size
+        self.validator = validator or ResultValidator()
         self.config = config
         self.progress_callback = progress_callback
+        self.output_encoder = output_encoder or OutputEncoder()
+        self.endpoint_pools = endpoint_pools or build_endpoint_pools(config, [task.model_type])
+        self._write_started = 0.0
+        self._deadline: Optional[float] = None
     
     def run(self):
         """Process the image according to the task specification."""
+        with tracer.span('task', image=os.path.basename(self.task.image_path)):
+            pending_write = self._run_task()
+        
+        if pending_write is not None:
+            # Transcoding continues in the process pool; this thread is free
+            pending_write.add_done_callback(self._on_output_written)
+            return
+        
+        self._notify()
+    
+    def _notify(self):
+        """Release the result buffer and report completion."""
+        self.task.result_bytes = None
+        if self.task.success and self.task.output_path and self.task.duplicate_paths:
+            self._fan_out()
+        if self.progress_callback:
+            self.progress_callback(self.task)
+    
+    def _fan_out(self):
+        """Copy the finished output to the output path of every duplicate."""
+        suffix = self.task.output_path[len(os.path.splitext(self.task.output_path)[0]):]
+        self.task.duplicate_outputs = {}
+        with tracer.span('fan_out', copies=len(self.task.duplicate_paths)):
+            for duplicate_path in self.task.duplicate_paths:
+                base_name = os.path.splitext(os.path.basename(duplicate_path))[0]
+                output_path = os.path.join(os.path.dirname(self.task.output_path), f"{base_name}_processed{suffix}")
+                try:
+                    if output_path != self.task.output_path:
+                        atomic_copy(self.task.output_path, output_path)
+                    self.task.duplicate_outputs[duplicate_path] = output_path
+                except OSError as e:
+                    logger.error(f"Failed to copy result to {output_path}: {str(e)}")
+                    self.task.duplicate_outputs[duplicate_path] = None
+    
+    def _on_output_written(self, future: Future):
+        """
+        Called when the process pool has transcoded and written the output.
+        
+        This runs on the executor's management thread, which must not be held
+        up by copies to duplicates or the completion callback: those go to
+        the finisher (or a thread of their own).
+        """
+        if self.finisher is not None:
+            self.finisher.submit(self._finish_write, future)
+        else:
+            Thread(target=self._finish_write, args=(future,), name='Finish', daemon=True).start()
+    
+    def _finish_write(self, future: Future):
+        tracer.add_async_span('transcode', self.task, self._write_started, time.perf_counter(), 'output')
         try:
-            # Convert image to base64
-            image_base64 = image_to_base64(self.task.image_path)
+            future.result()
+            logger.info(f"Successfully saved processed image: {self.task.output_path}")
+        except Exception as e:
+            self.task.success = False
+            self.task.error_message = f'Output encoding failed: {str(e)}'
+            logger.error(f"Task failed for {self.task.image_path}: {self.task.error_message}")
+        self._notify()
+    
+    def _run_task(self) -> Optional[Future]:
+        """
+        Encode, call the API and write the result.
+        
+        Returns:
+            A Future if the output is still being transcoded, else None
+        """
+        try:
+            if self.task.tiled_image is not None and self.task.tiled_image.failed:
+                # Another tile of this image failed already
+                self.task.partial = True
+                return None
             
-            # Generate output filename
-            base_name = os.path.splitext(os.path.basename(self.task.image_path))[0]
-            output_filename = f"{base_name}_processed.png"
-            self.task.output_path = os.path.join(self.task.output_dir, output_filename)
+            if self._split_into_tiles():
+                return None
             
-            # Call appropriate API based on model type
-            if self.task.model_type == 'doubao':
-                self._process_doubao(image_base64)
-            elif self.task.model_type == 'banana':
-                self._process_banana(image_base64)
-            else:
-                raise ValueError(f"Unknown model type: {self.task.model_type}")
+            # Convert image to base64; later chain steps reuse the previous
+            # step's bytes as they are, without decoding them
+            with tracer.span('encode', step=self.task.step_index):
+                if self.task.input_bytes is not None:
+                    image_base64 = base64.b64encode(self.task.input_bytes)
+                    self.task.input_bytes = None
+                    copy_stats.record('encode', 'previous step', 1)
+                elif self.task.payload is not None:
+                    image_base64 = self.task.payload.acquire()
+                    self.task.payload = None
+                elif self.task.tile is not None:
+                    tile_bytes = self.task.tiled_image.read_tile(self.task.tile)
+                    image_base64 = base64.b64encode(tile_bytes)
+                    copy_stats.record('encode', 'tile', 2)
+                else:
+                    image_base64 = image_to_base64(self.task.image_path, self.task.image_info,
+                                                   self.task.spec.proxy_size)
+            
+            # Call appropriate API based on model type; a result that is not
+            # a valid image is requested again instead of being written
+            api_started = time.perf_counter()
+            # One deadline for all failovers and retries of this task
+            pool = self.endpoint_pools.get(self.task.model_type)
+            if pool is not None:
+                self._deadline = time.monotonic() + pool.task_deadline(self._sent_megapixels())
+            for attempt in range(1, self.MAX_RESULT_ATTEMPTS + 1):
+                if self.task.model_type == 'doubao':
+                    self._process_doubao(image_base64)
+                elif self.task.model_type == 'banana':
+                    self._process_banana(image_base64)
+                else:
+                    raise ValueError(f"Unknown model type: {self.task.model_type}")
+                if not self.task.success or self._validate_result():
+                    break
+                logger.warning(f"{self.task.error_message} for {self.task.image_path} "
+                               f"(attempt {attempt}/{self.MAX_RESULT_ATTEMPTS})")
+            self.task.api_seconds = time.perf_counter() - api_started
+            
+            if self.task.tiled_image is not None and not self.task.success:
+                self._on_tile_failed()
+                return None
+            
+            if self.task.success and self.task.result_bytes and not self.task.is_last_step:
+                self._hand_over_to_next_step()
+                return None
+            
+            if self.task.is_proxy:
+                # Proxy results are handed to the UI as a preview, never written
+                if self.task.success and self.task.result_bytes:
+                    proxy_size = self.task.spec.proxy_size
+                    self._decode_preview(self.preview_size or QSize(proxy_size, proxy_size))
+                return None
+            
+            if self.task.tiled_image is not None and self.task.success:
+                with tracer.span('stitch', tile=self.task.tile.index):
+                    self.task.result_bytes = self.task.tiled_image.add_result(
+                        self.task.tile, self.task.result_bytes
+                    )
+                if self.task.result_bytes is None:
+                    self.task.partial = True
+                    return None
             
             # Save processed image
             if self.task.success and self.task.result_bytes:
-                with open(self.task.output_path, 'wb') as f:
-                    f.write(self.task.result_bytes)
+                self.task.output_path = self.output_encoder.output_path_for(
+                    self.task.image_path, self.task.output_dir, self.task.result_bytes
+                )
+                self._write_started = time.perf_counter()
+                with tracer.span('write'):
+                    pending_write = self.output_encoder.write(self.task.result_bytes, self.task.output_path)
+                if self.preview_size is not None:
+                    # Overlaps with transcoding, and spares the UI reading the file back
+                    self._decode_preview(self.preview_size)
+                # The encoder keeps its own reference while transcoding
+                self.task.result_bytes = None
+                if pending_write is not None:
+                    return pending_write
                 logger.info(f"Successfully saved processed image: {self.task.output_path}")
             
         except Exception as e:
             self.task.success = False
             self.task.error_message = str(e)
             logger.error(f"Task failed for {self.task.image_path}: {str(e)}")
+            if self.task.tiled_image is not None:
+                self._on_tile_failed()
+        return None
+    
+    def _input_size(self) -> Optional[Tuple[int, int]]:
+        """(width, height) of what was sent, for sanity checks of the result."""
+        if self.task.tile is not None:
+            return self.task.tile.width, self.task.tile.height
+        info = self.task.image_info
+        if info is None:
+            return None
+        width, height = info.width, info.height
+        proxy_size = self.task.spec.proxy_size
+        if proxy_size and max(width, height) > proxy_size:
+            scale = proxy_size / max(width, height)
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+        return width, height
+    
+    def _sent_megapixels(self) -> float:
+        input_size = self._input_size()
+        if input_size is None:
+            return self.task.megapixels
+        return input_size[0] * input_size[1] / 1e6
+    
+    def _validate_result(self) -> bool:
+        """Check the API result; an invalid one fails the task as retryable."""
+        with tracer.span('validate'):
+            error = self.validator.validate(self.task.result_bytes, self._input_size())
+        if error is None:
+            return True
+        self.task.success = False
+        self.task.error_message = f'Invalid result: {error}'
+        self.task.result_bytes = None
+        return False
+    
+    def _decode_preview(self, size: QSize):
+        """Decode the result in memory, scaled down to fit size."""
+        with tracer.span('decode_preview'):
+            preview = decode_scaled_image(self.task.result_bytes, size)
+        self.task.preview = None if preview.isNull() else preview
+    
+    def _split_into_tiles(self) -> bool:
+        """
+        Replace a task for an oversized image by one task per tile.
         
-        # Notify completion
-        if self.progress_callback:
-            self.progress_callback(self.task.image_path, self.task.success, self.task.error_message)
+        Returns:
+            True if the image was split; the tile tasks become follow-ups
+        """
+        if self.task.tiling is None or self.task.tile is not None or self.task.step_index > 0:
+            return False
+        info = self.task.image_info
+        if info is None:
+            # Started before the background probe reached the image
+            info = self.task.image_info = probe_image(self.task.image_path)
+            if info is None:
+                logger.warning(f"Cannot read the size of {self.task.image_path}; sending it without tiling")
+                return False
+        tile_size, overlap = self.task.tiling
+        if not needs_tiling(info.width, info.height, tile_size):
+            return False
+        
+        tiled_image = TiledImage(self.task.image_path, info.width, info.height, tile_size, overlap)
+        self.task.follow_ups = self.task.make_tile_tasks(tiled_image)
+        self.task.success = True
+        logger.info(f"Split {self.task.image_path} into {len(tiled_image.tiles)} tiles")
+        return True
+    
+    def _on_tile_failed(self):
+        """Fail the whole image once; later failing tiles report nothing."""
+        tiles = self.task.tiled_image.tiles
+        if self.task.tiled_image.fail():
+            self.task.error_message = (
+                f"Tile {self.task.tile.index + 1}/{len(tiles)} failed: {self.task.error_message}"
+            )
+        else:
+            self.task.partial = True
     
-    def _process_doubao(self, image_base64: str):
+    def _hand_over_to_next_step(self):
+        """Pass this step's result in memory to a task for the next step."""
+        if self.task.save_intermediate and self.task.tile is None:
+            base_name = os.path.splitext(os.path.basename(self.task.image_path))[0]
+            extension = OUTPUT_FORMATS[detect_format(self.task.result_bytes) or 'png'][1]
+            step_path = os.path.join(
+                self.task.output_dir, f"{base_name}_step{self.task.step_index + 1}_{self.task.model_type}{extension}"
+            )
+            with tracer.span('write_intermediate'):
+                atomic_write(step_path, self.task.result_bytes)
+            logger.info(f"Saved intermediate result: {step_path}")
+        
+        self.task.follow_ups = [self.task.make_next_task()]
+        self.task.result_bytes = None
+    
+    def _process_doubao(self, image_base64: bytes):
         """Process image using Doubao API."""
-        client = DoubaoClient(
-            api_url=self.config['doubao_api_url'],
-            api_key=self.config['doubao_api_key']
-        )
+        client = DoubaoClient(pool=self.endpoint_pools['doubao'])
         
         success, error_msg, image_bytes = client.edit_image(
             image_base64=image_base64,
             edit_type=self.task.model_params.get('edit_type', 'retouch'),
             smooth=float(self.task.model_params.get('smooth', 0.8)),
-            whiten=float(self.task.model_params.get('whiten', 0.6))
+            whiten=float(self.task.model_params.get('whiten', 0.6)),
+            megapixels=self._sent_megapixels(),
+            deadline=self._deadline
         )
         
         self.task.success = success
         self.task.error_message = error_msg
         self.task.result_bytes = image_bytes
     
-    def _process_banana(self, image_base64: str):
+    def _process_banana(self, image_base64: bytes):
         """Process image using Banana API."""
-        client = BananaClient(
-            api_url=self.config['banana_api_url'],
-            api_key=self.config['banana_api_key'],
-            model_key=self.config['banana_model_key']
-        )
+        client = BananaClient(pool=self.endpoint_pools['banana'])
         
         success, error_msg, image_bytes = client.apply_style(
             image_base64=image_base64,
-            prompt=self.task.model_params.get('prompt', 'convert to anime style, high detail')
+            prompt=self.task.model_params.get('prompt', 'convert to anime style, high detail'),
+            megapixels=self._sent_megapixels(),
+            deadline=self._deadline
         )
         
         self.task.success = success
@@ -104,18 +753,47 @@ class WorkerThread(Thread):
 
 
 class TaskManager(QObject):
-    """Manages task queue and worker threads."""
+    """
+    Manages task queues and worker threads.
+    
+    Each model has a pool of its own (see ModelPool): batches may mix
+    models, and a chain's next step is queued with the next model.
+    """
     
     # Signals
     progress_update = pyqtSignal(int, int)  # (completed, total)
-    task_completed = pyqtSignal(str, bool, str)  # (image_path, success, error_message)
+    batch_progress = pyqtSignal(object)  # ProgressBatch
     all_completed = pyqtSignal(int, int)  # (success_count, failure_count)
     
-    def __init__(self, max_workers: int = 5):
+    # Upper bound on how often the UI is notified, independent of task rate
+    UI_UPDATE_HZ = 30
+    
+    # Tasks created ahead of the workers from task sources; under 'sjf' and
+    # 'ljf' sources create them in order of size (see TaskSource.order_by_size)
+    LOOKAHEAD = 256
+    
+    def __init__(self, max_workers: int = 5, output_encoder: Optional[OutputEncoder] = None,
+                 policy: str = 'fifo', validator: Optional[ResultValidator] = None):
         super().__init__()
-        self.max_workers = max_workers
-        self.task_queue = Queue()
-        self.active_workers = 0
+        self.max_workers = max_workers  # per model, unless '<model>_workers' is configured
+        self.output_encoder = output_encoder or OutputEncoder()
+        self.validator = validator or ResultValidator()
+        self.api_seconds = 0.0
+        self.policy = policy
+        self.cost_model = CostModel()
+        self.remaining_work = RemainingWork()
+        self.endpoint_pools: Dict[str, EndpointPool] = {}
+        self.model_pools: Dict[str, ModelPool] = {}
+        self._pools_lock = threading.Lock()
+        self._config: Dict[str, str] = {}
+        self._sequence = itertools.count()
+        self._sources = deque()
+        self._source_lock = threading.Lock()
+        # Completes tasks whose output was transcoded in the process pool
+        self._finisher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='Finish')
+        self._proxied = set()
+        self._preview_target: Tuple[Optional[str], Optional[QSize]] = (None, None)
+        self._last_pool_keys: List[Tuple] = []
         self.mutex = QMutex()
         self.is_running = False
         
@@ -123,12 +801,130 @@ class TaskManager(QObject):
         self.success_count = 0
         self.failure_count = 0
         self.total_tasks = 0
+        
+        # Events produced by worker threads, delivered by the flush timer
+        self._pending_started: List[str] = []
+        self._pending_results: List[TaskResult] = []
+        self._pending_proxies: List[TaskResult] = []
+        self._finished = False
+        
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(1000 // self.UI_UPDATE_HZ)
+        self._flush_timer.timeout.connect(self.flush_progress)
     
-    def add_tasks(self, tasks: List[ProcessingTask]):
-        """Add tasks to the queue."""
-        self.total_tasks += len(tasks)
-        for task in tasks:
-            self.task_queue.put(task)
+    def add_source(self, source: TaskSource):
+        """Add a batch whose tasks are created as the queue drains."""
+        self.total_tasks += source.result_count
+        source.add_remaining_work(self.remaining_work)
+        if self.policy in ('sjf', 'ljf'):
+            source.order_by_size(largest_first=self.policy == 'ljf')
+        self._sources.append(source)
+        self._refill()
+    
+    def set_preview_target(self, image_path: Optional[str], size: Optional[QSize]):
+        """
+        Name the image the UI shows results for.
+        
+        Workers finishing it decode a preview at size from the result in
+        memory, delivered with its TaskResult; other results are not decoded.
+        """
+        self._preview_target = (image_path, QSize(size) if size is not None else None)
+    
+    def _preview_size_for(self, task: ProcessingTask) -> Optional[QSize]:
+        image_path, size = self._preview_target
+        if image_path is not None and (image_path == task.image_path or image_path in task.duplicate_paths):
+            return size
+        return None
+    
+    def add_proxies(self, spec: TaskSpec, image_paths: List[str],
+                    metadata: Optional[ImageMetadataStore] = None):
+        """
+        Queue low-resolution proxy tasks ahead of everything else.
+        
+        Their results arrive in ProgressBatch.proxies; each image is proxied
+        at most once per run.
+        """
+        for image_path in image_paths:
+            if image_path in self._proxied:
+                continue
+            self._proxied.add(image_path)
+            image_info = metadata.get(image_path) if metadata is not None else None
+            self._enqueue(ProcessingTask(spec, image_path, image_info))
+    
+    def _refill(self, pool: Optional[ModelPool] = None):
+        """
+        Create tasks from the sources while a pool they feed has fewer than
+        half of LOOKAHEAD queued.
+        
+        Each pool is refilled on its own, so a slow model's backlog does not
+        hold back the others. A worker passes its own pool, and returns
+        right away while that one is well stocked.
+        """
+        if not self._sources or (pool is not None and pool.queue.qsize() > self.LOOKAHEAD // 2):
+            return
+        with self._source_lock:
+            for source in list(self._sources):
+                for model_type in source.first_models:
+                    if pool is not None and model_type != pool.model_type:
+                        continue
+                    model_pool = self._pool_for(model_type)
+                    while model_pool.queue.qsize() <= self.LOOKAHEAD // 2:
+                        tasks = source.take(model_type, self.LOOKAHEAD // 2)
+                        if not tasks:
+                            break
+                        for task in tasks:
+                            self._enqueue(task)
+                if source.exhausted:
+                    self._sources.remove(source)
+    
+    def _workers_for(self, model_type: str) -> int:
+        try:
+            workers = int(self._config.get(f'{model_type}_workers') or 0)
+        except ValueError:
+            workers = 0
+        return workers if workers > 0 else self.max_workers
+    
+    def _pool_for(self, model_type: str) -> ModelPool:
+        """The pool of a model, created (and, during a run, started) on first use."""
+        with self._pools_lock:
+            pool = self.model_pools.get(model_type)
+            if pool is None:
+                pool = ModelPool(model_type, self._workers_for(model_type))
+                self.model_pools[model_type] = pool
+                if self.is_running:
+                    self._start_pool(pool)
+            return pool
+    
+    def _start_pool(self, pool: ModelPool):
+        pool.started_at = time.perf_counter()
+        for i in range(pool.workers):
+            thread = Thread(target=self._worker_loop, args=(pool,), name=f'{pool.model_type.capitalize()}-{i + 1}',
+                            daemon=True)
+            thread.start()
+    
+    def pool_status(self) -> List[PoolStatus]:
+        """Current load of every model's pool."""
+        with self._pools_lock:
+            pools = list(self.model_pools.values())
+        return [pool.status() for pool in pools]
+    
+    def _enqueue(self, task: ProcessingTask):
+        """
+        Queue a task; proxies, then later chain steps, then tiles go ahead of new images.
+        
+        Among new images the scheduling policy decides: 'sjf' runs the
+        cheapest first for early feedback, 'ljf' the most expensive first so
+        no large image starts last, 'fifo' keeps import order.
+        """
+        task.enqueued_at = time.perf_counter()
+        cost = 0.0
+        if self.policy in ('sjf', 'ljf'):
+            megapixels = task.megapixels
+            cost = sum(self.cost_model.estimate(model_type, megapixels) for model_type in task.remaining_models)
+            if self.policy == 'ljf':
+                cost = -cost
+        priority = (not task.is_proxy, -task.step_index, task.tile is None, cost)
+        self._pool_for(task.model_type).queue.put((priority, next(self._sequence), task))
     
     def start(self, config: Dict[str, str]):
         """Start processing tasks."""
@@ -139,56 +935,161 @@ class TaskManager(QObject):
         self.completed_count = 0
         self.success_count = 0
         self.failure_count = 0
+        self._finished = self.total_tasks == 0
+        # Shared by all workers so load and health are tracked across requests
+        self.endpoint_pools = build_endpoint_pools(config)
+        copy_stats.reset()
+        schedule_profile_window()
+        self._flush_timer.start()
         
-        # Start worker threads
-        for _ in range(self.max_workers):
-            thread = Thread(target=self._worker_loop, args=(config,), daemon=True)
-            thread.start()
+        # Start the worker threads of the pools queued so far; pools of
+        # models first needed later (e.g. by a chain's next step) start then
+        with self._pools_lock:
+            self._config = config
+            for pool in self.model_pools.values():
+                pool.workers = self._workers_for(pool.model_type)
+                self._start_pool(pool)
     
-    def _worker_loop(self, config: Dict[str, str]):
-        """Worker thread main loop."""
+    def _worker_loop(self, pool: ModelPool):
+        """Worker thread main loop, taking tasks from one model's queue."""
         while self.is_running:
+            self._refill(pool)
             try:
                 # Get task from queue (with timeout to allow checking is_running)
-                task = self.task_queue.get(timeout=0.1)
+                _, _, task = pool.queue.get(timeout=0.1)
+            except Empty:
+                continue
                 
-                # Process task
-                worker = WorkerThread(task, config, self._on_task_completed)
-                worker.run()
+            tracer.add_async_span('queue_wait', task, task.enqueued_at, time.perf_counter(), 'queue')
+            pool.begin_task()
+            self.mutex.lock()
+            if not task.is_proxy:
+                self._pending_started.append(task.image_path)
+                self._pending_started.extend(task.duplicate_paths)
+            self.mutex.unlock()
                 
-                # Mark task as done
-                self.task_queue.task_done()
+            # Process task
+            worker = WorkerThread(task, self._config, self._on_task_completed, self.output_encoder,
+                                  self.endpoint_pools, self._preview_size_for(task), self.validator,
+                                  self._finisher)
+            worker.run()
+            if task.api_seconds and task.success and not task.is_proxy:
+                self.cost_model.observe(task.model_type, task.megapixels, task.api_seconds)
                 
-            except:
-                # Queue empty or timeout
-                if self.task_queue.empty():
-                    self.mutex.lock()
-                    if self.active_workers == 0 and self.task_queue.empty():
-                        self.is_running = False
-                        self.all_completed.emit(self.success_count, self.failure_count)
-                    self.mutex.unlock()
-    
-    def _on_task_completed(self, image_path: str, success: bool, error_message: Optional[str]):
-        """Called when a task completes."""
-        self.mutex.lock()
+            # Mark task as done
+            pool.end_task()
+            self.mutex.lock()
+            self.api_seconds += task.api_seconds
+            self.mutex.unlock()
+            pool.queue.task_done()
+    
+    def _on_task_completed(self, task: ProcessingTask):
+        """Called on a worker thread when a task completes."""
+        if not task.is_proxy:
+            self.remaining_work.remove(task.remaining_models, task.megapixels)
+        if task.success and task.follow_ups:
+            # Next chain step or tiles of a large image: schedule them right away
+            follow_ups, task.follow_ups = task.follow_ups, ()
+            for follow_up in follow_ups:
+                if not follow_up.is_proxy:
+                    self.remaining_work.add(follow_up.remaining_models, follow_up.megapixels)
+                self._enqueue(follow_up)
+            return
+        if task.is_proxy:
+            self._on_proxy_completed(task)
+            return
+        if task.partial:
+            # One tile of an image that is not finished yet
+            return
         
-        self.completed_count += 1
-        if success:
-            self.success_count += 1
-        else:
-            self.failure_count += 1
+        results = [TaskResult(task.image_path, task.success, task.error_message or '', task.output_path, task.preview)]
+        duplicate_outputs = task.duplicate_outputs or {}
+        for duplicate_path in task.duplicate_paths:
+            output_path = duplicate_outputs.get(duplicate_path)
+            if task.success and output_path is None:
+                results.append(TaskResult(duplicate_path, False, 'Failed to copy result of duplicate', None))
+            else:
+                results.append(TaskResult(duplicate_path, task.success, task.error_message or '', output_path,
+                                          task.preview))
+        for result in results:
+            tracer.begin_async('ui_signal', result.image_path)
         
-        self.mutex.unlock()
+        self.mutex.lock()
         
-        # Emit signals
-        self.progress_update.emit(self.completed_count, self.total_tasks)
-        self.task_completed.emit(image_path, success, error_message or '')
+        for result in results:
+            self.completed_count += 1
+            if result.success:
+                self.success_count += 1
+            else:
+                self.failure_count += 1
+        self._pending_results.extend(results)
         
         # Check if all tasks completed
         if self.completed_count >= self.total_tasks:
             self.is_running = False
+            self._finished = True
+        
+        self.mutex.unlock()
+    
+    def _on_proxy_completed(self, task: ProcessingTask):
+        """Pass a proxy result to the UI, without counting it as progress."""
+        if not task.success or task.preview is None:
+            logger.warning(f"Proxy preview failed for {task.image_path}: {task.error_message}")
+            return
+        self.mutex.lock()
+        self._pending_proxies.append(TaskResult(task.image_path, True, '', None, task.preview))
+        self.mutex.unlock()
+    
+    def flush_progress(self):
+        """
+        Deliver coalesced task events to the UI.
+        
+        Runs on the thread owning the TaskManager (the GUI thread) at most
+        UI_UPDATE_HZ times per second, so a burst of fast completions costs
+        one progress update instead of one per image.
+        """
+        self.mutex.lock()
+        started, self._pending_started = self._pending_started, []
+        results, self._pending_results = self._pending_results, []
+        proxies, self._pending_proxies = self._pending_proxies, []
+        completed_count = self.completed_count
+        finished = self._finished
+        self.mutex.unlock()
+        
+        pools = self.pool_status()
+        pool_keys = [status.key for status in pools]
+        if started or results or proxies or pool_keys != self._last_pool_keys:
+            self._last_pool_keys = pool_keys
+            workers = {model_type: self._workers_for(model_type) for model_type in self.remaining_work.model_types}
+            eta_seconds = self.remaining_work.eta(self.cost_model, workers)
+            batch = ProgressBatch(started, results, completed_count, self.total_tasks, eta_seconds, proxies, pools)
+            self.batch_progress.emit(batch)
+            self.progress_update.emit(completed_count, self.total_tasks)
+        
+        if finished:
+            self._flush_timer.stop()
+            self.output_encoder.shutdown()
+            self._finisher.shutdown(wait=False)
+            logger.info(self.validator.summary(self.api_seconds))
+            copies = copy_stats.summary()
+            if copies is not None:
+                logger.info(copies)
+            for line in self.endpoint_report():
+                logger.info(line)
+            for pool in self.endpoint_pools.values():
+                for line in pool.format_timeout_report():
+                    logger.info(line)
+            for model_type, (overhead, rate) in self.cost_model.describe().items():
+                logger.info(f"Observed {model_type} latency: {overhead:.2f}s + {rate:.2f}s/MP")
+            for status in pools:
+                logger.info(f"{status.model_type} pool: {status.workers} workers, {status.completed} tasks, "
+                            f"{status.utilization:.0%} busy")
             self.all_completed.emit(self.success_count, self.failure_count)
     
+    def endpoint_report(self) -> List[str]:
+        """Traffic share, latency and failures per endpoint used in this run."""
+        return [line for pool in self.endpoint_pools.values() for line in pool.format_report()]
+    
     def stop(self):
         """Stop all processing."""
         self.is_running = False